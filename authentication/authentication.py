@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+# In the model's field order, as Model.from_db expects
+USER_CACHE_FIELDS = ('id', 'is_superuser', 'username', 'is_active', 'is_staff')
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the user's identity and active status in the cache for AUTH_USER_CACHE_TIMEOUT seconds.
+    The user is built with only USER_CACHE_FIELDS loaded, the balance and every other field are deferred and read from
+    the database when accessed
+    """
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    def load_user_values(self, user_id):
+        try:
+            return self.user_model.objects.values_list(*USER_CACHE_FIELDS).get(**{api_settings.USER_ID_FIELD: user_id})
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+    def build_user(self, values):
+        user = self.user_model.from_db(router.db_for_read(self.user_model), USER_CACHE_FIELDS, values)
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        return user
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        values = cache.get(user_cache_key(user_id))
+
+        if values is None:
+            values = self.load_user_values(user_id)
+            cache.set(user_cache_key(user_id), values, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+
+        return self.build_user(values)
+
+
+class AsyncJWTAuthentication(CachedJWTAuthentication):
+    """
+    JWT authentication for the async views, validates the token like JWTAuthentication and reads the cached user with
+    the async cache and ORM APIs
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        values = await cache.aget(user_cache_key(user_id))
+
+        if values is None:
+            try:
+                values = await self.user_model.objects.values_list(*USER_CACHE_FIELDS).aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+            await cache.aset(user_cache_key(user_id), values, timeout=settings.AUTH_USER_CACHE_TIMEOUT)
+
+        return self.build_user(values)
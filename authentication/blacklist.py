@@ -0,0 +1,83 @@
+"""
+Per process index of blacklisted refresh tokens.
+
+Refresh and logout used to ask the token_blacklist tables whether a token is blacklisted on every call. The index
+keeps the JTI and expiry of every blacklisted token that has not expired yet. It is warmed from the database on first
+use and then synced incrementally by BlacklistedToken id, so most lookups are answered from memory. Tokens
+blacklisted in this process are added right away. Other processes learn about them on their next sync. A sync happens
+every TOKEN_BLACKLIST_SYNC_INTERVAL seconds, or sooner when the shared cache holds a newer blacklisted id, so every
+lookup costs a cache get. With a cache each process keeps for itself that signal never reaches the other processes,
+the index then syncs every TOKEN_BLACKLIST_LOCAL_SYNC_INTERVAL seconds instead and skips the cache.
+"""
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+LAST_ID_KEY = 'auth:blacklist:last_id'
+# Caches that are kept per process
+LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+# Ids are allocated before commit, so a sync re-reads recent ids that may have been committed out of order
+SYNC_LOOKBACK = 1000
+
+
+class BlacklistIndex:
+    """
+    JTIs of blacklisted, unexpired refresh tokens mapped to their expiry timestamp
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.expires = {}
+        self.last_id = None
+        self.synced_at = 0
+
+    def sync(self, at_least=0):
+        with self.lock:
+            rows = BlacklistedToken.objects.filter(token__expires_at__gt=timezone.now())
+
+            if self.last_id is not None:
+                rows = rows.filter(pk__gt=self.last_id - SYNC_LOOKBACK)
+
+            last_id = max(self.last_id or 0, at_least)
+
+            for pk, jti, expires_at in rows.order_by('pk').values_list('pk', 'token__jti', 'token__expires_at'):
+                self.expires[jti] = expires_at.timestamp()
+                last_id = max(last_id, pk)
+
+            now = time.time()
+            self.expires = {jti: expires for jti, expires in self.expires.items() if expires > now}
+            self.last_id = last_id
+            self.synced_at = time.monotonic()
+
+    def add(self, jti, expires, pk):
+        with self.lock:
+            self.expires[jti] = expires
+
+        if pk > cache.get(LAST_ID_KEY, 0):
+            cache.set(LAST_ID_KEY, pk, timeout=None)
+
+    def contains(self, jti):
+        if settings.CACHES['default']['BACKEND'] in LOCAL_CACHES:
+            # No signal reaches this process, the short interval bounds how long another process' revocation is missed
+            signalled, interval = 0, settings.TOKEN_BLACKLIST_LOCAL_SYNC_INTERVAL
+
+        else:
+            signalled, interval = cache.get(LAST_ID_KEY, 0), settings.TOKEN_BLACKLIST_SYNC_INTERVAL
+
+        if self.last_id is None or signalled > self.last_id or time.monotonic() - self.synced_at > interval:
+            self.sync(at_least=signalled)
+
+        expires = self.expires.get(jti)
+        return expires is not None and expires > time.time()
+
+    def clear(self):
+        with self.lock:
+            self.expires = {}
+            self.last_id = None
+
+
+blacklist_index = BlacklistIndex()
@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding and blacklisted tokens in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--sleep', type=float, default=0, help='Seconds to pause between batches')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        last_id = 0
+        outstanding = blacklisted = 0
+
+        while True:
+            # Walk the primary key so a batch never rescans rows an earlier batch has checked
+            ids = list(
+                OutstandingToken.objects.filter(pk__gt=last_id, expires_at__lte=now)
+                .order_by('pk').values_list('pk', flat=True)[:options['batch_size']]
+            )
+
+            if not ids:
+                break
+
+            with transaction.atomic():
+                # The blacklisted rows go first, so the outstanding tokens' cascade finds nothing left to delete
+                blacklisted += BlacklistedToken.objects.filter(token_id__in=ids).delete()[0]
+                outstanding += OutstandingToken.objects.filter(pk__in=ids).delete()[0]
+
+            last_id = ids[-1]
+
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {outstanding} outstanding and {blacklisted} blacklisted tokens'))
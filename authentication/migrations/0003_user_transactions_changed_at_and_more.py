@@ -0,0 +1,23 @@
+# Generated by Django 4.2.3 on 2026-10-17 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0002_user_balance'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='transactions_changed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='transactions_version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -34,6 +34,9 @@ class User(AbstractBaseUser, PermissionsMixin):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     balance = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    # Bumped with the balance by every transaction write, validates conditional GETs of the transactions and reports
+    transactions_version = models.PositiveBigIntegerField(default=0)
+    transactions_changed_at = models.DateTimeField(null=True, blank=True)
 
     USERNAME_FIELD = 'username'
 
@@ -1,17 +1,35 @@
-from rest_framework import renderers
 import json
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class UserRenderer(renderers.JSONRenderer):
+    """
+    Wrap the payload in {'data': ...}, or in {'errors': ...} when the response is an error, and encode it in a single
+    pass, with orjson when it is installed. Both encoders produce the same bytes, orjson is skipped for the indents and
+    ASCII escaping it cannot produce
+    """
     charset = 'utf-8'
 
+    def is_error(self, renderer_context):
+        response = (renderer_context or {}).get('response')
+        return response is not None and (response.exception or response.status_code >= 400)
+
     def render(self, data, accepted_media_type=None, renderer_context=None):
-        response = ''
+        if data is None:
+            return b''
 
-        if 'ErrorDetail' in str(data):
-            response = json.dumps({'errors': data})
+        envelope = {'errors' if self.is_error(renderer_context) else 'data': data}
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
 
-        else:
-            response = json.dumps({'data': data})
+        if orjson is not None and not self.ensure_ascii and indent in (None, 2):
+            # UTC datetimes end in Z like DRF's encoder writes them, types orjson does not know go through that encoder
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z | (orjson.OPT_INDENT_2 if indent else 0)
+            return orjson.dumps(envelope, default=self.encoder_class().default, option=option)
 
-        return response
+        separators = (',', ': ') if indent else (',', ':')
+        return json.dumps(envelope, cls=self.encoder_class, indent=indent, ensure_ascii=self.ensure_ascii, separators=separators).encode()
@@ -2,7 +2,9 @@ import authentication.serializers
 from rest_framework import serializers, exceptions
 from . import models
 from django.contrib import auth
-from rest_framework_simplejwt.tokens import RefreshToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer as BaseTokenRefreshSerializer
+from rest_framework_simplejwt.tokens import TokenError
+from .tokens import RefreshToken
 
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -39,11 +41,7 @@ class LoginSerializer(serializers.ModelSerializer):
     tokens = serializers.SerializerMethodField()
 
     def get_tokens(self, obj):
-        user = models.User.objects.get(username=obj['username'])
-        return {
-            'refresh': user.tokens()['refresh'],
-            'access': user.tokens()['access']
-        }
+        return obj['tokens']
 
     class Meta:
         model = models.User
@@ -61,7 +59,7 @@ class LoginSerializer(serializers.ModelSerializer):
 
         return {
             'username': user.username,
-            'tokens': user.tokens
+            'tokens': user.tokens()
         }
 
 
@@ -87,6 +85,13 @@ class LogoutSerializer(serializers.Serializer):
             self.fail('bad_token')
 
 
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    """
+    Serializer for token refresh, checks the blacklist through the in-memory blacklist index
+    """
+    token_class = RefreshToken
+
+
 class UserSerializer(serializers.ModelSerializer):
     """
     Serializer for user
@@ -0,0 +1,15 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .authentication import user_cache_key
+from .models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, using, **kwargs):
+    key = user_cache_key(instance.pk)
+    cache.delete(key)
+    # Drop it again once the change is committed, a concurrent request may have cached the old row in between
+    transaction.on_commit(lambda: cache.delete(key), using=using)
@@ -1,3 +1,289 @@
-from django.test import TestCase
+import datetime
+import json
+import os
+import tempfile
+import uuid
+import zoneinfo
+import unittest.mock
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db.models import F
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from django.urls import reverse
+from rest_framework import serializers, status
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt import tokens as simplejwt_tokens
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from cash_management.throttling import STORES
+from .authentication import CachedJWTAuthentication
+from .blacklist import blacklist_index
+from .models import User
+from .renderers import UserRenderer
+from .tokens import RefreshToken
 
-# Create your tests here.
+
+class CachedJWTAuthenticationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.token = AccessToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def authenticate(self):
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {self.token}')
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    ### Unit Tests ###
+
+    def test_user_is_served_from_cache(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.username, 'testuser')
+        self.assertTrue(user.is_authenticated)
+
+    def test_balance_is_read_from_database(self):
+        self.authenticate()
+        User.objects.filter(pk=self.user.pk).update(balance=F('balance') + 75)
+        user = self.authenticate()
+
+        self.assertIn('balance', user.get_deferred_fields())
+        self.assertEqual(user.balance, Decimal('75'))
+
+    def test_save_invalidates_cached_user(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user_is_rejected(self):
+        self.authenticate()
+        self.user.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    ### Integration Tests ###
+
+    def test_expense_is_checked_against_current_balance(self):
+        data = {'category': 'Salary', 'type': 'income', 'amount': '100', 'date': '2023-07-21'}
+        response = self.client.post(reverse('transaction_list_create'), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        data = {'category': 'Food', 'type': 'expense', 'amount': '80', 'date': '2023-07-21'}
+        response = self.client.post(reverse('transaction_list_create'), data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        data = {'category': 'Food', 'type': 'expense', 'amount': '30', 'date': '2023-07-21'}
+        response = self.client.post(reverse('transaction_list_create'), data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deactivated_user_is_rejected(self):
+        response = self.client.get(reverse('monthly-summary-report'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('monthly-summary-report'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class LoginAPIViewTests(TestCase):
+
+    def setUp(self):
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    ### Unit Tests ###
+
+    def test_login_mints_one_token_pair(self):
+        response = self.client.post(reverse('login'), {'username': 'testuser', 'password': 'testpassword'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(OutstandingToken.objects.filter(user=self.user).count(), 1)
+
+        tokens = response.data['tokens']
+        refresh = RefreshToken(tokens['refresh'])
+        access = AccessToken(tokens['access'])
+        self.assertEqual(access['user_id'], self.user.pk)
+        self.assertEqual(refresh['user_id'], self.user.pk)
+
+    def test_login_reads_user_once(self):
+        with self.assertNumQueries(2):
+            self.client.post(reverse('login'), {'username': 'testuser', 'password': 'testpassword'})
+
+    def test_login_rejects_invalid_credentials(self):
+        response = self.client.post(reverse('login'), {'username': 'testuser', 'password': 'wrongpassword'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertFalse(OutstandingToken.objects.exists())
+
+    ### Integration Tests ###
+
+    def test_login_token_authenticates(self):
+        response = self.client.post(reverse('login'), {'username': 'testuser', 'password': 'testpassword'})
+        tokens = response.data['tokens']
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        response = self.client.get(reverse('monthly-summary-report'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+# Shared by every process on the host, like the cache the blacklist index needs in production
+SHARED_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': os.path.join(tempfile.gettempdir(), 'cash-management-test-cache')}}
+
+
+@override_settings(CACHES=SHARED_CACHES)
+class TokenBlacklistTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        blacklist_index.clear()
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.refresh = RefreshToken.for_user(self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def refresh_token(self, token):
+        return self.client.post(reverse('token_refresh'), {'refresh': str(token)})
+
+    ### Unit Tests ###
+
+    def test_refresh_does_not_query_blacklist_once_warm(self):
+        self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.refresh_token(self.refresh)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data)
+
+    def test_index_syncs_tokens_blacklisted_elsewhere(self):
+        self.refresh_token(self.refresh)
+        # Blacklisted without going through this process' index, as another worker would
+        simplejwt_tokens.RefreshToken(str(self.refresh)).blacklist()
+        self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_200_OK)
+
+        with override_settings(TOKEN_BLACKLIST_SYNC_INTERVAL=0):
+            self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_index_syncs_at_once_when_other_processes_signal_newer_tokens(self):
+        self.refresh_token(self.refresh)
+        blacklisted, _ = simplejwt_tokens.RefreshToken(str(self.refresh)).blacklist()
+        # Another process blacklisting through the index signals its id in the shared cache
+        cache.set('auth:blacklist:last_id', blacklisted.pk, timeout=None)
+        self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_process_local_cache_syncs_on_the_local_interval(self):
+        with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}, TOKEN_BLACKLIST_LOCAL_SYNC_INTERVAL=60):
+            self.refresh_token(self.refresh)
+
+            with self.assertNumQueries(0):
+                self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_200_OK)
+
+            simplejwt_tokens.RefreshToken(str(self.refresh)).blacklist()
+
+            with override_settings(TOKEN_BLACKLIST_LOCAL_SYNC_INTERVAL=0):
+                self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_purge_expired_tokens(self):
+        expired = RefreshToken.for_user(self.user)
+        OutstandingToken.objects.filter(jti=expired['jti']).update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+        expired.blacklist()
+        self.refresh.blacklist()
+
+        call_command('purge_expired_tokens', batch_size=1, stdout=StringIO())
+
+        self.assertFalse(OutstandingToken.objects.filter(jti=expired['jti']).exists())
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token__jti', flat=True)), [self.refresh['jti']])
+
+    ### Integration Tests ###
+
+    def test_logout_blocks_refresh(self):
+        self.assertEqual(self.refresh_token(self.refresh).status_code, status.HTTP_200_OK)
+
+        response = self.client.post(reverse('logout'), {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+        response = self.refresh_token(self.refresh)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserRendererTests(TestCase):
+
+    def setUp(self):
+        self.renderer = UserRenderer()
+
+    def render(self, data, status_code=200, exception=False):
+        response = Response(data, status=status_code)
+        response.exception = exception
+        return json.loads(self.renderer.render(data, renderer_context={'response': response}))
+
+    ### Unit Tests ###
+
+    def test_success_is_wrapped_in_data(self):
+        data = [{'pk': 1, 'amount': Decimal('10.50'), 'date': datetime.date(2023, 7, 21)}]
+        self.assertEqual(self.render(data), {'data': [{'pk': 1, 'amount': 10.5, 'date': '2023-07-21'}]})
+
+    def test_errors_are_detected_from_status(self):
+        errors = serializers.ValidationError({'amount': ['A valid number is required.']}).detail
+        self.assertEqual(self.render(errors, status_code=400), {'errors': {'amount': ['A valid number is required.']}})
+        self.assertEqual(self.render({'detail': 'Not found.'}, status_code=404, exception=True), {'errors': {'detail': 'Not found.'}})
+
+    def test_data_mentioning_error_detail_is_not_an_error(self):
+        self.assertEqual(self.render({'category': 'ErrorDetail'}), {'data': {'category': 'ErrorDetail'}})
+
+    def test_json_fallback_matches_orjson(self):
+        data = {
+            'results': [{'pk': i, 'amount': Decimal(i) / 4, 'category': 'Café', 'date': datetime.date(2023, 7, i + 1)} for i in range(10)],
+            'times': [
+                datetime.datetime(2023, 7, 21, 10, 30, tzinfo=datetime.timezone.utc),
+                datetime.datetime(2023, 7, 21, 10, 30, 0, 123456, tzinfo=zoneinfo.ZoneInfo('UTC')),
+                datetime.datetime(2023, 7, 21, 10, 30, tzinfo=zoneinfo.ZoneInfo('Asia/Tehran')),
+                datetime.datetime(2023, 7, 21, 10, 30, 5),
+                datetime.time(8, 15, 0, 250000),
+                datetime.timedelta(hours=1),
+            ],
+            'errors': serializers.ValidationError({'amount': ['A valid number is required.']}).detail,
+            'uuid': uuid.UUID(int=1),
+            1: 'x',
+        }
+        response = Response(data)
+
+        for renderer_context in ({'response': response}, {'response': response, 'indent': 2}):
+            with unittest.mock.patch('authentication.renderers.orjson', None):
+                fallback = self.renderer.render(data, renderer_context=renderer_context)
+
+            self.assertEqual(fallback, self.renderer.render(data, renderer_context=renderer_context))
+
+        self.assertIn(b'"2023-07-21T10:30:00Z"', fallback)
+        self.assertIn(b'\n  "data": {', fallback)
+
+    def test_empty_response(self):
+        self.assertEqual(self.renderer.render(None), b'')
+
+    ### Integration Tests ###
+
+    def test_renders_view_responses(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(reverse('monthly-summary-report'))
+        content = self.renderer.render(response.data, renderer_context={'response': response})
+        self.assertEqual(json.loads(content), {'data': json.loads(response.content)})
@@ -0,0 +1,20 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from .blacklist import blacklist_index
+
+
+class RefreshToken(tokens.RefreshToken):
+    """
+    Refresh token that checks the blacklist through the in-memory blacklist index
+    """
+
+    def check_blacklist(self):
+        if blacklist_index.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        blacklisted, created = super().blacklist()
+        blacklist_index.add(self.payload[api_settings.JTI_CLAIM], self.payload['exp'], blacklisted.pk)
+        return blacklisted, created
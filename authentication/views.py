@@ -1,6 +1,7 @@
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework import permissions
+from cash_management.throttling import LoginThrottle
 from . import serializers
 
 
@@ -10,6 +11,7 @@ class RegisterAPIView(generics.GenericAPIView):
     """
     serializer_class = serializers.RegisterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginThrottle]
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
@@ -24,6 +26,7 @@ class LoginAPIView(generics.GenericAPIView):
     """
     serializer_class = serializers.LoginSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginThrottle]
 
     def post(self, request):
         serializer = self.serializer_class(data=request.data)
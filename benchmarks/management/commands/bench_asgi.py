@@ -0,0 +1,87 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+from benchmarks.utils import bench_users, seed, summarize, unthrottled, write_results
+
+
+class Command(BaseCommand):
+    help = 'Compare read throughput of the sync views through WSGI and the async views through ASGI, in process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--per-user', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and serving path')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--output', default='bench_asgi.json')
+
+    def endpoints(self, user):
+        list_url = reverse('transaction_list_create')
+        return {
+            'list': list_url,
+            'list_cursor': list_url + '?pagination=cursor',
+            'detail': reverse('transaction_retrieve_update_destroy', kwargs={'pk': user.translations.values_list('pk', flat=True).first()}),
+            'monthly_summary_report': reverse('monthly-summary-report'),
+            'category_wise_expense_report': reverse('category-wise-expense-report'),
+        }
+
+    def run_wsgi(self, url, headers, requests, concurrency):
+        client = Client()
+
+        def request(_):
+            started = time.perf_counter()
+            response = client.get(url, headers=headers)
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(concurrency) as executor:
+            samples = list(executor.map(request, range(requests)))
+
+        return samples, time.perf_counter() - started
+
+    async def run_asgi(self, url, headers, requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                assert response.status_code == 200, response.status_code
+                return time.perf_counter() - started
+
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(request() for _ in range(requests)))
+        return samples, time.perf_counter() - started
+
+    @unthrottled
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        user = bench_users().annotate(rows=Count('translations')).order_by('-rows').first()
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        # The in-process clients send requests for the testserver host
+        setup_test_environment()
+        results = {'requests': options['requests'], 'concurrency': options['concurrency'], 'endpoints': {}}
+
+        for name, url in self.endpoints(user).items():
+            results['endpoints'][name] = {}
+
+            for path, run in (('wsgi', self.run_wsgi), ('asgi', lambda *a: asyncio.run(self.run_asgi(*a)))):
+                samples, elapsed = run(url, headers, options['requests'], options['concurrency'])
+                results['endpoints'][name][path] = {'throughput_rps': round(len(samples) / elapsed, 1), 'latency': summarize(samples)}
+
+            wsgi, asgi = results['endpoints'][name]['wsgi'], results['endpoints'][name]['asgi']
+            self.stdout.write(f"{name}: wsgi {wsgi['throughput_rps']} req/s, asgi {asgi['throughput_rps']} req/s")
+
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,63 @@
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, RequestFactory
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from authentication.authentication import CachedJWTAuthentication
+from benchmarks.utils import QueryRecorder, bench_users, seed, summarize, unthrottled, write_results
+
+
+class Command(BaseCommand):
+    help = 'Compare queries and latency of resolving the user of a JWT with and without the user cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--per-user', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--output', default='bench_auth.json')
+
+    def run(self, func, requests):
+        recorder = QueryRecorder()
+        samples = []
+
+        with connection.execute_wrapper(recorder):
+            for _ in range(requests):
+                started = time.perf_counter()
+                func()
+                samples.append(time.perf_counter() - started)
+
+        return {'queries_per_request': round(len(recorder.queries) / requests, 3), 'latency': summarize(samples)}
+
+    @unthrottled
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        user = bench_users().first()
+        header = f'Bearer {AccessToken.for_user(user)}'
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=header)
+        results = {'requests': options['requests'], 'authenticate': {}}
+        cache.clear()
+
+        for name, authentication in (('jwt', JWTAuthentication()), ('cached_jwt', CachedJWTAuthentication())):
+            results['authenticate'][name] = self.run(lambda: authentication.authenticate(request), options['requests'])
+
+        # Whole requests through the configured authentication class
+        setup_test_environment()
+        client = Client()
+        url = reverse('monthly-summary-report')
+        cache.clear()
+        results['monthly_summary_report'] = self.run(lambda: client.get(url, HTTP_AUTHORIZATION=header), options['requests'])
+
+        jwt, cached = results['authenticate']['jwt'], results['authenticate']['cached_jwt']
+        results['queries_saved_per_request'] = round(jwt['queries_per_request'] - cached['queries_per_request'], 3)
+        self.stdout.write(f"authenticate: {jwt['queries_per_request']} queries, p50 {jwt['latency']['p50_ms']} ms without the cache, "
+                          f"{cached['queries_per_request']} queries, p50 {cached['latency']['p50_ms']} ms with it")
+        self.stdout.write(f"monthly summary report: {results['monthly_summary_report']['queries_per_request']} queries per request")
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,99 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from benchmarks.utils import CATEGORIES, bench_users, measure, seed, write_results
+from transactions.filters import filter_transactions
+from transactions.models import Transaction
+from transactions.reports import category_expense_totals, category_names
+from transactions.serializers import TRANSACTION_VALUES
+
+LEGACY_TABLE = 'bench_legacy_transaction'
+
+
+class Command(BaseCommand):
+    help = 'Compare row width, index size and query latency of interned category keys with the previous free-text column'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--per-user', type=int, default=4000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--output', default='bench_categories.json')
+
+    def execute_sql(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall() if cursor.description else None
+
+    def create_legacy_table(self):
+        """
+        Copy the transactions into a table with the category name on every row and the previous category indexes
+        """
+        include = ' INCLUDE (amount)' if connection.vendor == 'postgresql' else ''
+        self.execute_sql(f'DROP TABLE IF EXISTS {LEGACY_TABLE}')
+        self.execute_sql(f'CREATE TABLE {LEGACY_TABLE} AS SELECT t.id, t.user_id, t.amount, t.type, c.name AS category, t.date '
+                         f'FROM {Transaction._meta.db_table} t INNER JOIN transactions_category c ON c.id = t.category_id')
+        self.execute_sql(f'CREATE INDEX {LEGACY_TABLE}_cat_date ON {LEGACY_TABLE} (user_id, category, date DESC)')
+        self.execute_sql(f'CREATE INDEX {LEGACY_TABLE}_type_cat ON {LEGACY_TABLE} (user_id, type, category){include}')
+
+    def sizes(self, table, category_indexes):
+        # pg_partition_tree covers the partitions of the partitioned transaction table and its indexes
+        def relation_size(name):
+            return self.execute_sql('SELECT coalesce(sum(pg_relation_size(relid)), 0) FROM pg_partition_tree(%s)', [name])[0][0]
+
+        return {
+            'table_bytes': relation_size(table),
+            'average_row_bytes': round(float(self.execute_sql(f'SELECT avg(pg_column_size(t.*)) FROM {table} t')[0][0]), 1),
+            'category_index_bytes': {name: relation_size(name) for name in category_indexes},
+        }
+
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        user = bench_users().annotate(rows=Count('translations')).order_by('-rows').first()
+        self.create_legacy_table()
+
+        try:
+            if connection.vendor == 'postgresql':
+                self.execute_sql(f'ANALYZE {LEGACY_TABLE}')
+                self.execute_sql(f'ANALYZE {Transaction._meta.db_table}')
+
+            legacy_report = (f"SELECT category, SUM(amount) FROM {LEGACY_TABLE} WHERE user_id = %s AND type = 'expense' "
+                             f"GROUP BY category, LOWER(category) ORDER BY LOWER(category)")
+            legacy_filter = (f'SELECT id, amount, type, category, date FROM {LEGACY_TABLE} WHERE user_id = %s AND category = %s '
+                             f'ORDER BY date DESC, id DESC LIMIT 10')
+            # Both sides run plain SQL, the interned side the statements the ORM builds for the report and the list filter
+            report = [queryset.query.sql_with_params() for queryset in (category_expense_totals(user.pk), category_names(user.pk))]
+            category_filter = filter_transactions(Transaction.objects.values_list(*TRANSACTION_VALUES), user, {'category': CATEGORIES[0]})[:10]
+            category_filter = category_filter.query.sql_with_params()
+            shapes = {
+                'category_wise_expense': {
+                    'legacy': lambda: self.execute_sql(legacy_report, [user.pk]),
+                    'interned': lambda: [self.execute_sql(sql, params) for sql, params in report],
+                },
+                'list_category_filter': {
+                    'legacy': lambda: self.execute_sql(legacy_filter, [user.pk, CATEGORIES[0]]),
+                    'interned': lambda: self.execute_sql(*category_filter),
+                },
+            }
+            results = {'vendor': connection.vendor, 'rows': Transaction.objects.count(), 'user_rows': user.rows, 'queries': {}}
+
+            for name, paths in shapes.items():
+                results['queries'][name] = {path: measure(func, options['repeat']) for path, func in paths.items()}
+                self.stdout.write(f'{name}: ' + ', '.join(f"{path} p50 {stats['p50_ms']} ms" for path, stats in results['queries'][name].items()))
+
+            if connection.vendor == 'postgresql':
+                results['sizes'] = {
+                    'legacy': self.sizes(LEGACY_TABLE, [f'{LEGACY_TABLE}_cat_date', f'{LEGACY_TABLE}_type_cat']),
+                    'interned': self.sizes(Transaction._meta.db_table, [index.name for index in Transaction._meta.indexes if 'category' in index.fields]),
+                }
+                for path, sizes in results['sizes'].items():
+                    self.stdout.write(f"{path}: table {sizes['table_bytes']} bytes, {sizes['average_row_bytes']} bytes per row, "
+                                      f"category indexes {sum(sizes['category_index_bytes'].values())} bytes")
+
+        finally:
+            self.execute_sql(f'DROP TABLE IF EXISTS {LEGACY_TABLE}')
+
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,84 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.utils import load_backend
+from benchmarks.utils import bench_users, seed, summarize, write_results
+from transactions.models import Transaction
+from transactions.serializers import TRANSACTION_VALUES
+
+
+ENGINES = {
+    'per_request': 'django.db.backends.postgresql',
+    'pooled': 'cash_management.db.backends.pooled_postgresql',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request PostgreSQL connections with the pooled backend under concurrent request-shaped load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--per-user', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--pool-size', type=int, default=10)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--output', default='bench_db_pool.json')
+
+    def run(self, engine, sql, params, options):
+        backend = load_backend(engine)
+        settings_dict = {**connection.settings_dict, 'ENGINE': engine, 'POOL': {'max_size': options['pool_size']}}
+        local = threading.local()
+        wrappers = []
+
+        def request(_):
+            # Like a request: connect, run the list query, close the connection at the end of the request
+            if not hasattr(local, 'wrapper'):
+                local.wrapper = backend.DatabaseWrapper(settings_dict, alias=f'bench_{engine}')
+                wrappers.append(local.wrapper)
+
+            started = time.perf_counter()
+
+            with local.wrapper.cursor() as cursor:
+                cursor.execute(sql, params)
+                cursor.fetchall()
+
+            local.wrapper.close()
+            return time.perf_counter() - started
+
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            samples = list(executor.map(request, range(options['requests'])))
+
+        elapsed = time.perf_counter() - started
+        result = {'throughput_rps': round(len(samples) / elapsed, 1), 'latency': summarize(samples)}
+
+        if wrappers and hasattr(wrappers[0], 'pool'):
+            result['pool'] = wrappers[0].pool.stats()
+            wrappers[0].pool.close_all()
+
+        return result
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Point DATABASES at a local PostgreSQL server to run this benchmark')
+
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        user = bench_users().first()
+        queryset = Transaction.objects.filter(user=user).order_by('-date', '-pk').values_list(*TRANSACTION_VALUES)[:10]
+        sql, params = queryset.query.sql_with_params()
+        results = {'requests': options['requests'], 'concurrency': options['concurrency'], 'pool_size': options['pool_size'], 'modes': {}}
+
+        for mode, engine in ENGINES.items():
+            result = self.run(engine, sql, params, options)
+            results['modes'][mode] = result
+            self.stdout.write(f"{mode}: {result['throughput_rps']} req/s, p50 {result['latency']['p50_ms']} ms, "
+                              f"p99 {result['latency']['p99_ms']} ms")
+
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.urls import reverse
+from benchmarks.utils import QueryRecorder, bench_client, bench_users, measure, seed, unthrottled, write_results
+from transactions.models import Transaction
+
+
+class Command(BaseCommand):
+    help = 'Record EXPLAIN plans and latency of the transaction list, filter and report queries on a large table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--per-user', type=int, default=4000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--output', default='bench_indexes.json')
+
+    def query_shapes(self):
+        list_url = reverse('transaction_list_create')
+        return {
+            'list': list_url,
+            'list_category': list_url + '?category=Food',
+            'list_type': list_url + '?type=income',
+            'list_date_range': list_url + '?date_from=2020-01-01&date_to=2020-03-31',
+            'list_deep_page': list_url + '?page=50',
+            'list_cursor': list_url + '?pagination=cursor',
+            'monthly_summary_report': reverse('monthly-summary-report'),
+            'category_wise_expense_report': reverse('category-wise-expense-report'),
+        }
+
+    def explain(self, sql, params):
+        if connection.vendor == 'postgresql':
+            sql = 'EXPLAIN (ANALYZE, BUFFERS) ' + sql
+
+        else:
+            sql = 'EXPLAIN QUERY PLAN ' + sql
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    @unthrottled
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE %s' % connection.ops.quote_name(Transaction._meta.db_table))
+
+        # The heaviest bench user exercises the deepest index ranges
+        user = bench_users().annotate(rows=Count('translations')).order_by('-rows').first()
+        client = bench_client(user)
+
+        with connection.cursor() as cursor:
+            indexes = sorted(name for name, info in connection.introspection.get_constraints(cursor, Transaction._meta.db_table).items()
+                             if info['index'])
+
+        results = {
+            'vendor': connection.vendor,
+            'rows': Transaction.objects.count(),
+            'user_rows': user.rows,
+            'indexes': indexes,
+            'endpoints': {},
+        }
+
+        for name, url in self.query_shapes().items():
+            recorder = QueryRecorder()
+
+            with connection.execute_wrapper(recorder):
+                client.get(url)
+
+            results['endpoints'][name] = {
+                'url': url,
+                'latency': measure(lambda: client.get(url), options['repeat']),
+                'queries': [
+                    {'sql': query['sql'], 'params': query['params'], 'plan': self.explain(query['sql'], query['params'])}
+                    for query in recorder.queries if query['sql'].lstrip().upper().startswith('SELECT')
+                ],
+            }
+            self.stdout.write(f"{name}: p50 {results['endpoints'][name]['latency']['p50_ms']} ms")
+
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,72 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from benchmarks.utils import BENCH_PASSWORD, QueryRecorder, bench_users, measure, seed, summarize, unthrottled, write_results
+
+
+class Command(BaseCommand):
+    help = 'Measure login throughput, and the password check and token minting it is made of'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--per-user', type=int, default=10)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users already in the database')
+        parser.add_argument('--output', default='bench_login.json')
+
+    @unthrottled
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        users = list(bench_users().order_by('pk'))
+
+        if not users:
+            raise CommandError('No bench users found, run without --no-seed first')
+
+        # The in-process client sends requests for the testserver host
+        setup_test_environment()
+        local = threading.local()
+        url = reverse('login')
+
+        def login(i):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+
+            recorder = QueryRecorder()
+            started = time.perf_counter()
+
+            with connection.execute_wrapper(recorder):
+                response = local.client.post(url, {'username': users[i % len(users)].username, 'password': BENCH_PASSWORD})
+
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - started, len(recorder.queries)
+
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            samples = list(executor.map(login, range(options['requests'])))
+
+        elapsed = time.perf_counter() - started
+        user = users[0]
+        results = {
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'login': {
+                'throughput_rps': round(len(samples) / elapsed, 1),
+                'latency': summarize([latency for latency, _ in samples]),
+                'queries_per_request': round(sum(queries for _, queries in samples) / len(samples), 3),
+            },
+            'check_password': measure(lambda: user.check_password(BENCH_PASSWORD), 20),
+            'mint_token_pair': measure(user.tokens, 200),
+        }
+        self.stdout.write(f"login: {results['login']['throughput_rps']} req/s, p50 {results['login']['latency']['p50_ms']} ms, "
+                          f"{results['login']['queries_per_request']} queries per login")
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
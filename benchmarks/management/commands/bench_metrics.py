@@ -0,0 +1,75 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import override_settings
+from django.urls import reverse
+from cash_management import metrics
+from benchmarks.utils import bench_client, bench_users, measure, seed, summarize, unthrottled, write_results
+
+
+METRICS_MIDDLEWARE = 'cash_management.metrics.MetricsMiddleware'
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the metrics middleware and database execute wrapper'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--per-user', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and configuration in each round')
+        parser.add_argument('--rounds', type=int, default=3)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--output', default='bench_metrics.json')
+
+    def run(self, user, url, requests, middleware):
+        # A new client loads the middleware chain from the overridden settings
+        with override_settings(MIDDLEWARE=middleware):
+            client = bench_client(user)
+            client.get(url)
+            samples = []
+
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = client.get(url)
+                samples.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.status_code
+
+        return samples
+
+    @unthrottled
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        user = bench_users().annotate(rows=Count('translations')).order_by('-rows').first()
+        enabled = list(settings.MIDDLEWARE)
+
+        if METRICS_MIDDLEWARE not in enabled:
+            enabled.insert(0, METRICS_MIDDLEWARE)
+
+        disabled = [name for name in enabled if name != METRICS_MIDDLEWARE]
+        endpoints = {
+            'list': reverse('transaction_list_create'),
+            'monthly_summary_report': reverse('monthly-summary-report'),
+        }
+        results = {'requests': options['requests'], 'rounds': options['rounds'], 'endpoints': {}}
+
+        for name, url in endpoints.items():
+            samples = {'without_metrics': [], 'with_metrics': []}
+
+            # Alternate the configurations so drift in the machine affects both alike
+            for _ in range(options['rounds']):
+                samples['without_metrics'] += self.run(user, url, options['requests'], disabled)
+                samples['with_metrics'] += self.run(user, url, options['requests'], enabled)
+
+            result = {key: summarize(value) for key, value in samples.items()}
+            result['overhead_ms'] = round(result['with_metrics']['p50_ms'] - result['without_metrics']['p50_ms'], 4)
+            results['endpoints'][name] = result
+            self.stdout.write(f"{name}: p50 {result['without_metrics']['p50_ms']} ms without metrics, "
+                              f"{result['with_metrics']['p50_ms']} ms with metrics")
+
+        results['record_call'] = measure(lambda: metrics.registry.record('bench', 200, 0.01, 3, 0.002, 512), 100000)
+        results['render'] = measure(metrics.render, 100)
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,104 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Max, Min
+from django.urls import reverse
+from django.utils import timezone
+from benchmarks.utils import QueryRecorder, bench_client, bench_users, measure, seed, write_results
+from transactions.models import Transaction
+from transactions.partitions import TABLE, add_months, ensure_partitions, is_partitioned, partitions
+
+
+class Command(BaseCommand):
+    help = 'Compare date-range list queries on the partitioned transaction table with partition pruning on and off'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--per-user', type=int, default=4000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--output', default='bench_partitions.json')
+
+    def query_shapes(self, user):
+        list_url = reverse('transaction_list_create')
+        # The primary key is (id, date), a lookup by id alone probes the primary key index of every partition
+        detail_url = reverse('transaction_retrieve_update_destroy', kwargs={'pk': user.translations.order_by('date').values_list('pk', flat=True).first()})
+        return {
+            'detail': detail_url,
+            'month': list_url + '?date_from=2020-03-01&date_to=2020-03-31',
+            'quarter': list_url + '?date_from=2020-01-01&date_to=2020-03-31',
+            'year': list_url + '?date_from=2020-01-01&date_to=2020-12-31',
+            'year_expense': list_url + '?date_from=2020-01-01&date_to=2020-12-31&type=expense',
+            'recent_cursor': list_url + '?date_from=2024-01-01&pagination=cursor',
+            'unbounded': list_url,
+        }
+
+    def scanned_partitions(self, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (ANALYZE, FORMAT JSON) ' + sql, params)
+            plan = cursor.fetchone()[0]
+
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        scanned, nodes = set(), [plan[0]['Plan']]
+        while nodes:
+            node = nodes.pop()
+            if node.get('Relation Name', '').startswith(TABLE + '_'):
+                scanned.add(node['Relation Name'])
+            nodes.extend(node.get('Plans', ()))
+        return len(scanned)
+
+    def set_pruning(self, enabled):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SET enable_partition_pruning = {'on' if enabled else 'off'}")
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError('Point DATABASES at a local PostgreSQL server and apply the transaction partitioning migration first')
+
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        # Seeded history older than the migration lands in the default partition until its months are created
+        span = Transaction.objects.aggregate(first=Min('date'), last=Max('date'))
+        ensure_partitions(span['first'] or timezone.localdate(), add_months(max(span['last'] or timezone.localdate(), timezone.localdate()), 3))
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE %s' % connection.ops.quote_name(TABLE))
+
+        user = bench_users().annotate(rows=Count('translations')).order_by('-rows').first()
+        client = bench_client(user)
+
+        results = {
+            'rows': Transaction.objects.count(),
+            'user_rows': user.rows,
+            'partitions': len(partitions()),
+            'endpoints': {},
+        }
+
+        for name, url in self.query_shapes(user).items():
+            results['endpoints'][name] = {'url': url}
+
+            for pruning in (True, False):
+                self.set_pruning(pruning)
+                recorder = QueryRecorder()
+
+                with connection.execute_wrapper(recorder):
+                    client.get(url)
+
+                results['endpoints'][name]['pruning' if pruning else 'no_pruning'] = {
+                    'latency': measure(lambda: client.get(url), options['repeat']),
+                    'scanned_partitions': [self.scanned_partitions(query['sql'], query['params']) for query in recorder.queries
+                                           if query['sql'].lstrip().upper().startswith('SELECT') and TABLE in query['sql']],
+                }
+
+            self.set_pruning(True)
+            endpoint = results['endpoints'][name]
+            endpoint['speedup'] = round(endpoint['no_pruning']['latency']['p50_ms'] / endpoint['pruning']['latency']['p50_ms'], 2)
+            self.stdout.write(f"{name}: p50 {endpoint['pruning']['latency']['p50_ms']} ms with pruning, "
+                              f"{endpoint['no_pruning']['latency']['p50_ms']} ms without, "
+                              f"partitions scanned {endpoint['pruning']['scanned_partitions']} vs {endpoint['no_pruning']['scanned_partitions']}")
+
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from transactions.models import Transaction
+from transactions.serializers import TRANSACTION_VALUES, TransactionSerializer, transaction_rows
+from benchmarks.utils import bench_users, measure, seed, write_results
+
+
+class Command(BaseCommand):
+    help = 'Compare rows per second of the values_list read path and TransactionSerializer over model instances'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--per-user', type=int, default=5000)
+        parser.add_argument('--page-size', type=int, action='append', dest='page_sizes', help='Rows per page, can be repeated')
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--output', default='bench_read_path.json')
+
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        user = bench_users().annotate(rows=Count('translations')).order_by('-rows').first()
+        queryset = Transaction.objects.filter(user=user).order_by('-date', '-pk')
+        results = {'repeat': options['repeat'], 'page_sizes': {}}
+
+        for page_size in options['page_sizes'] or [10, 100, 500]:
+            paths = {
+                'serializer': lambda: TransactionSerializer(list(queryset.select_related('category')[:page_size]), many=True).data,
+                'values_list': lambda: transaction_rows(queryset.values_list(*TRANSACTION_VALUES)[:page_size]),
+            }
+            result = {}
+
+            for name, path in paths.items():
+                stats = measure(path, options['repeat'])
+                stats['rows_per_second'] = round(page_size / (stats['mean_ms'] / 1000))
+                result[name] = stats
+
+            results['page_sizes'][page_size] = result
+            self.stdout.write(f'page_size {page_size}: ' + ', '.join(f"{name} {stats['rows_per_second']} rows/s" for name, stats in result.items()))
+
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
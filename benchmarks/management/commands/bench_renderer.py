@@ -0,0 +1,61 @@
+import datetime
+import json
+from collections import OrderedDict
+from django.core.management.base import BaseCommand
+from rest_framework.response import Response
+from rest_framework.utils.serializer_helpers import ReturnList
+from authentication import renderers
+from authentication.renderers import UserRenderer
+from benchmarks.utils import CATEGORIES, measure, write_results
+
+
+def sniffing_render(data):
+    # The renderer this benchmark compares against: str() the payload to look for errors, then json.dumps it
+    if 'ErrorDetail' in str(data):
+        return json.dumps({'errors': data})
+
+    return json.dumps({'data': data})
+
+
+class Command(BaseCommand):
+    help = 'Compare the envelope renderer against str() sniffing on large transaction lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, action='append', dest='sizes', help='List size, can be repeated')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--output', default='bench_renderer.json')
+
+    def payload(self, rows):
+        start = datetime.date(2015, 1, 1)
+        return ReturnList([
+            OrderedDict(pk=pk, amount=f'{pk % 997}.{pk % 100:02d}', type='expense' if pk % 5 else 'income',
+                        category=CATEGORIES[pk % len(CATEGORIES)], date=(start + datetime.timedelta(days=pk % 3650)).isoformat())
+            for pk in range(rows)
+        ], serializer=None)
+
+    def handle(self, *args, **options):
+        renderer = UserRenderer()
+        results = {'repeat': options['repeat'], 'orjson': renderers.orjson is not None, 'sizes': {}}
+
+        for rows in options['sizes'] or [1000, 10000, 100000]:
+            data = self.payload(rows)
+            context = {'response': Response(data)}
+            encoder = renderers.orjson
+            result = {'sniffing': measure(lambda: sniffing_render(data), options['repeat'])}
+
+            renderers.orjson = None
+
+            try:
+                result['envelope_json'] = measure(lambda: renderer.render(data, renderer_context=context), options['repeat'])
+
+            finally:
+                renderers.orjson = encoder
+
+            if encoder is not None:
+                result['envelope_orjson'] = measure(lambda: renderer.render(data, renderer_context=context), options['repeat'])
+
+            results['sizes'][rows] = result
+            self.stdout.write(f'{rows} rows: ' + ', '.join(f"{name} p50 {stats['p50_ms']} ms" for name, stats in result.items()))
+
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,74 @@
+import csv
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Max, Min
+from django.urls import reverse
+from benchmarks.utils import QueryRecorder, bench_client, bench_users, measure, seed, unthrottled, write_results
+from transactions.models import Transaction
+from transactions.series import GRANULARITIES, MAX_BUCKETS, bucket_start, bucket_starts, shift_bucket
+
+
+class Command(BaseCommand):
+    help = 'Compare the series endpoint with exporting a multi-year history and bucketing its rows on the client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--per-user', type=int, default=4000)
+        parser.add_argument('--repeat', type=int, default=50)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--output', default='bench_series.json')
+
+    def client_side_series(self, client, granularity, start, end):
+        """
+        What a client does without the endpoint, export every row in the range and sum it per bucket
+        """
+        totals = defaultdict(lambda: [Decimal(0), Decimal(0), 0])
+        response = client.get(reverse('transaction_export') + f'?date_from={start}&date_to={end}')
+        rows = csv.reader(line.decode() for line in response.streaming_content)
+        next(rows)
+
+        for pk, amount, type, category, date in rows:
+            bucket = totals[bucket_start(datetime.date.fromisoformat(date), granularity)]
+            bucket[0 if type == 'income' else 1] += Decimal(amount)
+            bucket[2] += 1
+
+        return [(bucket, *totals.get(bucket, (Decimal(0), Decimal(0), 0))) for bucket in bucket_starts(start, end, granularity)]
+
+    @unthrottled
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        user = bench_users().annotate(rows=Count('translations')).order_by('-rows').first()
+        span = Transaction.objects.filter(user=user).aggregate(first=Min('date'), last=Max('date'))
+        client = bench_client(user)
+        results = {'vendor': connection.vendor, 'rows': Transaction.objects.count(), 'user_rows': user.rows, 'granularities': {}}
+
+        for granularity in GRANULARITIES:
+            # Daily buckets over the whole history exceed MAX_BUCKETS, they cover its last MAX_BUCKETS days
+            end = span['last']
+            start = max(span['first'], shift_bucket(bucket_start(end, granularity), granularity, 1 - MAX_BUCKETS))
+            url = reverse('series-report') + f'?granularity={granularity}&from={start}&to={end}'
+            recorder = QueryRecorder()
+
+            with connection.execute_wrapper(recorder):
+                response = client.get(url)
+
+            results['granularities'][granularity] = {
+                'from': start.isoformat(),
+                'to': end.isoformat(),
+                'buckets': len(response.json()['results']),
+                'endpoint_queries': len(recorder.queries),
+                'endpoint': measure(lambda: client.get(url), options['repeat']),
+                'client_side': measure(lambda: self.client_side_series(client, granularity, start, end), options['repeat']),
+            }
+            entry = results['granularities'][granularity]
+            entry['speedup'] = round(entry['client_side']['p50_ms'] / entry['endpoint']['p50_ms'], 2)
+            self.stdout.write(f"{granularity}: {entry['buckets']} buckets, endpoint p50 {entry['endpoint']['p50_ms']} ms, "
+                              f"client side p50 {entry['client_side']['p50_ms']} ms")
+
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,90 @@
+import logging
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+from django.test import override_settings
+from django.urls import reverse
+from benchmarks.utils import QueryRecorder, bench_client, bench_users, measure, seed, summarize, write_results
+from cash_management.throttling import STORES
+
+# Budgets no benchmark run exhausts, so every request takes the allowed path
+UNLIMITED_RATES = {'reports': '1000000000/s', 'writes': '1000000000/s', 'login': '1000000000/s'}
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request overhead of the token-bucket throttles with each store, and the latency of shed requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--per-user', type=int, default=1000)
+        parser.add_argument('--requests', type=int, default=500, help='Requests per configuration in each round')
+        parser.add_argument('--rounds', type=int, default=3)
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--output', default='bench_throttle.json')
+
+    def settings_for(self, store, rates=UNLIMITED_RATES):
+        return override_settings(THROTTLE_ENABLED=store is not None, THROTTLE_STORE=store or 'local',
+                                 REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates})
+
+    def run(self, client, url, requests, expected_status):
+        client.get(url)
+        samples = []
+
+        for _ in range(requests):
+            started = time.perf_counter()
+            response = client.get(url)
+            samples.append(time.perf_counter() - started)
+            assert response.status_code == expected_status, response.status_code
+
+        return samples
+
+    def handle(self, *args, **options):
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], stdout=self.stdout)
+
+        user = bench_users().annotate(rows=Count('translations')).order_by('-rows').first()
+        client = bench_client(user)
+        url = reverse('monthly-summary-report')
+        configurations = {'unthrottled': None, 'local_store': 'local', 'cache_store': 'cache'}
+        samples = {name: [] for name in configurations}
+
+        # Alternate the configurations so drift in the machine affects all alike
+        for _ in range(options['rounds']):
+            for name, store in configurations.items():
+                with self.settings_for(store):
+                    samples[name] += self.run(client, url, options['requests'], 200)
+
+        results = {'requests': options['requests'], 'rounds': options['rounds'], 'allowed': {name: summarize(value) for name, value in samples.items()}}
+
+        for name in ('local_store', 'cache_store'):
+            results['allowed'][name]['overhead_ms'] = round(results['allowed'][name]['p50_ms'] - results['allowed']['unthrottled']['p50_ms'], 4)
+
+        self.stdout.write(', '.join(f"{name} p50 {stats['p50_ms']} ms" for name, stats in results['allowed'].items()))
+
+        # Requests over budget, answered with 429 before the report is read, without logging a warning for each
+        results['shed'] = {}
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+
+        for name in ('local_store', 'cache_store'):
+            STORES['local'].buckets.clear()
+
+            with self.settings_for(configurations[name], {'reports': '1/d'}):
+                recorder = QueryRecorder()
+                client.get(url)
+
+                with connection.execute_wrapper(recorder):
+                    client.get(url)
+
+                results['shed'][name] = summarize(self.run(client, url, options['requests'], 429))
+                results['shed'][name]['queries'] = len(recorder.queries)
+
+            self.stdout.write(f"{name}: shed p50 {results['shed'][name]['p50_ms']} ms with {results['shed'][name]['queries']} queries")
+
+        results['take_call'] = {
+            name: measure(lambda store=store: store.take('throttle:bench', 10 ** 9, 10 ** 9), 100000)
+            for name, store in STORES.items()
+        }
+        write_results(options['output'], results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
@@ -0,0 +1,232 @@
+import datetime
+import json
+import platform
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from benchmarks.utils import BENCH_PASSWORD, CATEGORIES, QueryRecorder, bench_users, seed, summarize, unthrottled, write_results
+
+
+REGISTER_USERNAME_PREFIX = 'benchreg'
+
+
+class InProcessTransport:
+    """
+    Drive the WSGI handler in process, counting the SQL queries of every request
+    """
+    name = 'in-process'
+
+    def __init__(self):
+        self.local = threading.local()
+
+    def request(self, method, path, data=None, token=None):
+        if not hasattr(self.local, 'client'):
+            self.local.client = Client()
+
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        kwargs = {'data': data}
+
+        if data is not None and method not in ('GET', 'POST'):
+            kwargs = {'data': urllib.parse.urlencode(data), 'content_type': 'application/x-www-form-urlencoded'}
+
+        recorder = QueryRecorder()
+
+        with connection.execute_wrapper(recorder):
+            response = getattr(self.local.client, method.lower())(path, headers=headers, **kwargs)
+
+        body = json.loads(response.content) if response.content else None
+        return response.status_code, body, len(recorder.queries)
+
+
+class HTTPTransport:
+    """
+    Drive a running server over HTTP, query counts are not available
+    """
+    name = 'http'
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, data=None, token=None):
+        url = self.base_url + path
+        body = None
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+
+        if data is not None and method == 'GET':
+            url += '?' + urllib.parse.urlencode(data)
+
+        elif data is not None:
+            body = urllib.parse.urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+
+        request = urllib.request.Request(url, data=body, headers=headers, method=method)
+
+        try:
+            with urllib.request.urlopen(request) as response:
+                status, content = response.status, response.read()
+
+        except urllib.error.HTTPError as e:
+            status, content = e.code, e.read()
+
+        try:
+            return status, json.loads(content) if content else None, None
+
+        except ValueError:
+            return status, None, None
+
+
+class Command(BaseCommand):
+    help = 'Seed a realistic dataset and drive every API endpoint with a concurrent client, reporting latency ' \
+           'percentiles, throughput and SQL query counts per endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--per-user', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=300, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--active-users', type=int, default=20, help='Bench users that log in and send the requests')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the dataset and the request mix')
+        parser.add_argument('--no-seed', action='store_true', help='Reuse the bench users and transactions already in the database')
+        parser.add_argument('--base-url', help='Drive a running server, e.g. http://localhost:8000, instead of the in-process handler')
+        parser.add_argument('--output', default='bench_load.json')
+
+    def run_phase(self, name, calls):
+        """
+        Run the calls, each returning (status, body, queries), on the worker pool and summarize them
+        """
+        def timed(call):
+            started = time.perf_counter()
+            status, body, queries = call()
+            return time.perf_counter() - started, status, body, queries
+
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(self.concurrency) as executor:
+            outcomes = list(executor.map(timed, calls))
+
+        elapsed = time.perf_counter() - started
+        queries = [q for _, _, _, q in outcomes if q is not None]
+        self.results['endpoints'][name] = {
+            'requests': len(outcomes),
+            'errors': sum(1 for _, status, _, _ in outcomes if status >= 400),
+            'throughput_rps': round(len(outcomes) / elapsed, 1),
+            'latency': summarize([duration for duration, _, _, _ in outcomes]),
+            'queries_per_request': round(statistics.fmean(queries), 2) if queries else None,
+        }
+        self.stdout.write(f"{name}: {self.results['endpoints'][name]['throughput_rps']} req/s, "
+                          f"p95 {self.results['endpoints'][name]['latency']['p95_ms']} ms, "
+                          f"{self.results['endpoints'][name]['queries_per_request']} queries/request")
+        return outcomes
+
+    @unthrottled
+    def handle(self, *args, **options):
+        if options['base_url'] and not options['no_seed']:
+            raise CommandError('Seed the database the server uses first, then run with --base-url and --no-seed')
+
+        if not options['no_seed']:
+            seed(options['users'], options['per_user'], seed=options['seed'], stdout=self.stdout)
+
+        if options['base_url']:
+            transport = HTTPTransport(options['base_url'])
+
+        else:
+            # The in-process client sends requests for the testserver host
+            setup_test_environment()
+            transport = InProcessTransport()
+
+        self.concurrency = options['concurrency']
+        rng = random.Random(options['seed'])
+        request = transport.request
+        n = options['requests']
+        users = list(bench_users().order_by('pk')[:options['active_users']])
+
+        if not users:
+            raise CommandError('No bench users found, run without --no-seed first')
+
+        self.results = {
+            'meta': {
+                'started_at': datetime.datetime.now().isoformat(),
+                'transport': transport.name,
+                'vendor': connection.vendor,
+                'python': platform.python_version(),
+                'options': {key: options[key] for key in ('users', 'per_user', 'requests', 'concurrency', 'active_users', 'seed', 'no_seed')},
+            },
+            'endpoints': {},
+        }
+
+        get_user_model().objects.filter(username__startswith=REGISTER_USERNAME_PREFIX).delete()
+        run_id = rng.randrange(10 ** 9)
+        self.run_phase('register', [
+            lambda i=i: request('POST', reverse('register'), {'username': f'{REGISTER_USERNAME_PREFIX}{run_id}x{i}', 'password': BENCH_PASSWORD})
+            for i in range(n)
+        ])
+        get_user_model().objects.filter(username__startswith=REGISTER_USERNAME_PREFIX).delete()
+
+        logins = self.run_phase('login', [
+            lambda user=users[i % len(users)]: request('POST', reverse('login'), {'username': user.username, 'password': BENCH_PASSWORD})
+            for i in range(n)
+        ])
+        tokens = {}
+
+        for i, (_, status, body, _) in enumerate(logins):
+            if status == 200:
+                tokens.setdefault(users[i % len(users)].pk, body['tokens']['access'])
+
+        if not tokens:
+            raise CommandError('Login failed for every bench user')
+
+        sessions = list(tokens.values())
+        list_url = reverse('transaction_list_create')
+        top_category = CATEGORIES[0]
+        reads = {
+            'list': (list_url, None),
+            'list_category': (list_url, {'category': top_category}),
+            'list_type': (list_url, {'type': 'income'}),
+            'list_date_range': (list_url, {'date_from': '2020-01-01', 'date_to': '2020-06-30'}),
+            'list_cursor': (list_url, {'pagination': 'cursor'}),
+            'monthly_summary_report': (reverse('monthly-summary-report'), None),
+            'category_wise_expense_report': (reverse('category-wise-expense-report'), None),
+            'balance_as_of': (reverse('balance'), {'as_of': '2020-06-15'}),
+        }
+
+        for name, (url, params) in reads.items():
+            self.run_phase(name, [lambda token=rng.choice(sessions): request('GET', url, params, token) for _ in range(n)])
+
+        create_tokens = [rng.choice(sessions) for _ in range(n)]
+        # Income rows, so the balance check never rejects a create
+        payloads = [{
+            'amount': f'{rng.randint(100, 10000) / 100:.2f}',
+            'type': 'income',
+            'category': rng.choice(CATEGORIES),
+            'date': (datetime.date(2015, 1, 1) + datetime.timedelta(days=rng.randrange(3650))).isoformat(),
+        } for _ in range(n)]
+        created = self.run_phase('create', [
+            lambda token=token, payload=payload: request('POST', list_url, payload, token)
+            for token, payload in zip(create_tokens, payloads)
+        ])
+
+        # Created rows are updated and then deleted by the session that owns them
+        owned = [(token, body['pk']) for (_, status, body, _), token in zip(created, create_tokens) if status == 201]
+
+        def detail_url(pk):
+            return reverse('transaction_retrieve_update_destroy', kwargs={'pk': pk})
+
+        self.run_phase('update', [
+            lambda token=token, pk=pk, amount=f'{rng.randint(100, 10000) / 100:.2f}': request('PATCH', detail_url(pk), {'amount': amount}, token)
+            for token, pk in owned
+        ])
+        self.run_phase('delete', [lambda token=token, pk=pk: request('DELETE', detail_url(pk), None, token) for token, pk in owned])
+
+        write_results(options['output'], self.results)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
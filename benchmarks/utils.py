@@ -0,0 +1,149 @@
+import datetime
+import json
+import random
+import statistics
+import time
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db.models import Case, F, Sum, When
+from django.test import override_settings
+from rest_framework.test import APIClient
+from transactions.models import Category, Transaction
+from transactions.checkpoints import create_balance_checkpoints
+from transactions.rollups import rebuild_monthly_summary
+
+
+BENCH_USERNAME_PREFIX = 'bench_user_'
+BENCH_PASSWORD = 'bench-password'
+
+# Few categories take most of the rows, like real spending does
+CATEGORIES = ('Food', 'Transport', 'Rent', 'Utilities', 'Health', 'Shopping', 'Travel', 'Education', 'Gifts', 'Others')
+CATEGORY_WEIGHTS = tuple(1 / (rank + 1) for rank in range(len(CATEGORIES)))
+
+
+def percentile(samples, percent):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """
+    Summarize latency samples given in seconds as milliseconds
+    """
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'p50_ms': round(percentile(samples, 50) * 1000, 3),
+        'p95_ms': round(percentile(samples, 95) * 1000, 3),
+        'p99_ms': round(percentile(samples, 99) * 1000, 3),
+        'max_ms': round(max(samples) * 1000, 3),
+    }
+
+
+def measure(func, repeat):
+    samples = []
+
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+
+    return summarize(samples)
+
+
+def write_results(path, results):
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that records the SQL, params and duration of every query it sees
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+
+        try:
+            return execute(sql, params, many, context)
+
+        finally:
+            self.queries.append({'sql': sql, 'params': params, 'time': time.perf_counter() - started})
+
+
+def bench_client(user=None):
+    """
+    Return an in-process API client, authenticated as user when given
+    """
+    client = APIClient(SERVER_NAME='localhost')
+
+    if user is not None:
+        client.force_authenticate(user=user)
+
+    return client
+
+
+def unthrottled(handle):
+    """
+    Run a benchmark command with the throttles off, they would answer most of its requests with 429
+    """
+    return override_settings(THROTTLE_ENABLED=False)(handle)
+
+
+def bench_users():
+    return get_user_model().objects.filter(username__startswith=BENCH_USERNAME_PREFIX)
+
+
+def seed(users, transactions_per_user, seed=0, batch_size=10000, start_date=datetime.date(2015, 1, 1), days=3650, stdout=None):
+    """
+    Create bench users with a shared password and transactions_per_user rows each.
+
+    Rows are inserted with bulk_create, so balances, monthly summaries and balance checkpoints are rebuilt afterwards
+    with aggregates per user instead of going through the write path signals.
+    """
+    user_model = get_user_model()
+    rng = random.Random(seed)
+    password = make_password(BENCH_PASSWORD)
+    # Raw delete skips the per-row post_delete balance bookkeeping, which is pointless for rows that go with their user
+    Transaction.objects.filter(user__in=bench_users())._raw_delete(Transaction.objects.db)
+    bench_users().delete()
+    created_users = user_model.objects.bulk_create(
+        [user_model(username=f'{BENCH_USERNAME_PREFIX}{i}', password=password) for i in range(users)]
+    )
+    batch = []
+
+    for number, user in enumerate(created_users, start=1):
+        categories = {category.name: category for category in Category.objects.bulk_create([Category(user=user, name=name) for name in ('Salary', *CATEGORIES)])}
+
+        for _ in range(transactions_per_user):
+            income = rng.random() < 0.2
+            batch.append(Transaction(
+                user=user,
+                type='income' if income else 'expense',
+                category=categories['Salary' if income else rng.choices(CATEGORIES, CATEGORY_WEIGHTS)[0]],
+                amount=Decimal(rng.randint(100, 500000)) / 100 * (5 if income else 1),
+                date=start_date + datetime.timedelta(days=rng.randrange(days)),
+            ))
+
+            if len(batch) >= batch_size:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+
+        if stdout is not None and number % 100 == 0:
+            stdout.write(f'Seeded {number}/{users} users')
+
+    Transaction.objects.bulk_create(batch)
+    signed = Case(When(type='income', then=F('amount')), default=-F('amount'))
+
+    for user in created_users:
+        balance = Transaction.objects.filter(user=user).aggregate(balance=Sum(signed))['balance'] or 0
+        user_model.objects.filter(pk=user.pk).update(balance=balance)
+        rebuild_monthly_summary(user.pk)
+        create_balance_checkpoints(user.pk, start_date + datetime.timedelta(days=days))
+
+    return created_users
@@ -0,0 +1,124 @@
+"""
+PostgreSQL backend that keeps a bounded per-process pool of connections.
+
+Django closes its connection at the end of every request when CONN_MAX_AGE is 0. With this backend that returns the
+connection to the pool instead of closing it, and the next request checks out an open one. That saves the connect,
+authentication and backend fork. Pool settings are read from the POOL key of the database settings, see ConnectionPool
+for what they mean. A pool is kept per database, so connections opened before the settings switch to another database,
+as the test runner does, are never handed out for it.
+"""
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel, is_psycopg3
+from cash_management.metrics import register_collector
+from .creation import DatabaseCreation
+from .pool import PoolTimeout, get_pool, pools, pools_lock
+
+if is_psycopg3:
+    from psycopg.pq import TransactionStatus
+
+    TRANSACTION_STATUS_IDLE = TransactionStatus.IDLE
+else:
+    from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    # Set once the connection opened a named cursor, those are WITH HOLD outside transactions
+    named_cursors = False
+    # Pool the open connection was checked out of, it goes back there even if the settings changed meanwhile
+    checked_out_of = None
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        # The stock backend sets isolation_level while connecting, a reused connection needs it set here
+        self.isolation_level = IsolationLevel(self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED))
+
+        self.checked_out_of = self.pool
+
+        try:
+            return self.checked_out_of.checkout(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params), self.ping)
+
+        except PoolTimeout as exc:
+            raise self.Database.OperationalError(str(exc)) from exc
+
+    def create_cursor(self, name=None):
+        if name:
+            self.named_cursors = True
+
+        return super().create_cursor(name)
+
+    def ping(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+
+            if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+
+        except self.Database.Error:
+            return False
+
+        return True
+
+    def _close(self):
+        connection = self.connection
+        reusable = not connection.closed
+
+        if reusable and connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+            # Closed mid-transaction, e.g. after an error in an atomic block
+            try:
+                connection.rollback()
+                reusable = connection.info.transaction_status == TRANSACTION_STATUS_IDLE
+
+            except self.Database.Error:
+                reusable = False
+
+        if reusable and self.named_cursors:
+            # A streaming export the client abandoned leaves its held cursor open, the next request must not inherit it
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('CLOSE ALL')
+
+                if connection.info.transaction_status != TRANSACTION_STATUS_IDLE:
+                    connection.commit()
+
+            except self.Database.Error:
+                reusable = False
+
+        self.named_cursors = False
+        (self.checked_out_of or self.pool).checkin(connection, reusable)
+
+
+def pool_metrics():
+    families = {
+        'db_pool_connections': ('gauge', 'Open pooled connections by state', []),
+        'db_pool_max_connections': ('gauge', 'Pool size limit', []),
+        'db_pool_events_total': ('counter', 'Checkouts, waits, timeouts, connections created and closed by reason', []),
+        'db_pool_wait_seconds': ('histogram', 'Time spent waiting to check out a connection', []),
+    }
+
+    with pools_lock:
+        current = list(pools.items())
+
+    for (alias, database, *_), pool in current:
+        labels = {'alias': alias, 'database': database}
+        stats = pool.stats()
+        families['db_pool_connections'][2].extend([
+            ('db_pool_connections', {**labels, 'state': 'idle'}, stats['idle']),
+            ('db_pool_connections', {**labels, 'state': 'in_use'}, stats['in_use']),
+        ])
+        families['db_pool_max_connections'][2].append(('db_pool_max_connections', labels, stats['max_size']))
+        families['db_pool_events_total'][2].extend(
+            ('db_pool_events_total', {**labels, 'event': event}, count) for event, count in sorted(stats['counters'].items())
+        )
+
+        with pool.condition:
+            families['db_pool_wait_seconds'][2].extend(pool.wait_time.samples('db_pool_wait_seconds', labels))
+
+    return [(name, type, help, samples) for name, (type, help, samples) in families.items()]
+
+
+register_collector(pool_metrics)
@@ -0,0 +1,12 @@
+from django.db.backends.postgresql import creation
+from .pool import close_pools
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """
+    Test database creation that closes the pooled connections to the test database before dropping it
+    """
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,218 @@
+import collections
+import threading
+import time
+from cash_management.metrics import Histogram
+
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    __slots__ = ('connection', 'created_at', 'last_used')
+
+    def __init__(self, connection, now):
+        self.connection = connection
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """
+    Bounded pool of open DB-API connections shared by the threads of a process.
+
+    Checkout hands out the most recently used idle connection, pinging it first when it has been idle longer than
+    check_interval, and opens a new one while fewer than max_size are open. Otherwise it waits up to timeout seconds
+    for a checkin. Connections older than max_lifetime are closed instead of reused, and idle connections beyond
+    min_size are closed after max_idle seconds.
+    """
+
+    def __init__(self, name, max_size=10, min_size=0, timeout=10, max_lifetime=3600, max_idle=300, check_interval=30):
+        self.name = name
+        self.max_size = max_size
+        self.min_size = min_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.condition = threading.Condition()
+        self.idle = collections.deque()
+        self.in_use = {}
+        self.size = 0
+        self.wait_time = Histogram(WAIT_BUCKETS)
+        self.counters = collections.Counter()
+
+    def checkout(self, connect, is_healthy):
+        """
+        Return an open connection, connect() opens a new one and is_healthy(connection) pings an idle one
+        """
+        while True:
+            entry = self.acquire()
+            now = time.monotonic()
+
+            if entry is None:
+                try:
+                    entry = PooledConnection(connect(), now)
+
+                except BaseException:
+                    self.release_slot()
+                    raise
+
+                self.counters['created'] += 1
+
+            elif now - entry.created_at > self.max_lifetime:
+                self.discard(entry, 'lifetime')
+                continue
+
+            elif now - entry.last_used > self.check_interval and not is_healthy(entry.connection):
+                self.discard(entry, 'unhealthy')
+                continue
+
+            with self.condition:
+                self.in_use[id(entry.connection)] = entry
+
+            return entry.connection
+
+    def acquire(self):
+        # Return an idle entry, or None once a slot for a new connection is reserved
+        started = time.monotonic()
+        waited = False
+        expired = []
+
+        with self.condition:
+            try:
+                while True:
+                    expired += self.reap_idle(time.monotonic())
+
+                    if self.idle:
+                        entry = self.idle.pop()
+                        break
+
+                    if self.size < self.max_size:
+                        self.size += 1
+                        entry = None
+                        break
+
+                    remaining = self.timeout - (time.monotonic() - started)
+
+                    if remaining <= 0:
+                        self.counters['timeouts'] += 1
+                        raise PoolTimeout(f'No connection available in pool {self.name} within {self.timeout} seconds')
+
+                    waited = True
+                    self.condition.wait(remaining)
+
+            finally:
+                self.counters['checkouts'] += 1
+                self.counters['waits'] += waited
+                self.wait_time.observe(time.monotonic() - started)
+
+        for stale in expired:
+            self.close(stale.connection)
+
+        return entry
+
+    def reap_idle(self, now):
+        # Called with the condition held, idle connections are ordered from least to most recently used
+        expired = []
+
+        while len(self.idle) and self.size > self.min_size and now - self.idle[0].last_used > self.max_idle:
+            expired.append(self.idle.popleft())
+            self.size -= 1
+            self.counters['closed_idle'] += 1
+
+        return expired
+
+    def checkin(self, connection, reusable):
+        """
+        Return a checked out connection, reusable is False when it is broken or left mid-transaction
+        """
+        with self.condition:
+            entry = self.in_use.pop(id(connection), None)
+
+        if entry is None:
+            self.close(connection)
+            return
+
+        now = time.monotonic()
+
+        if not reusable:
+            self.discard(entry, 'broken')
+
+        elif now - entry.created_at > self.max_lifetime:
+            self.discard(entry, 'lifetime')
+
+        else:
+            entry.last_used = now
+
+            with self.condition:
+                self.idle.append(entry)
+                self.condition.notify()
+
+    def discard(self, entry, reason):
+        self.close(entry.connection)
+        self.counters[f'closed_{reason}'] += 1
+        self.release_slot()
+
+    def release_slot(self):
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def close(self, connection):
+        try:
+            connection.close()
+
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self.condition:
+            idle, self.idle = list(self.idle), collections.deque()
+            self.size -= len(idle)
+
+        for entry in idle:
+            self.close(entry.connection)
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': len(self.in_use),
+                'max_size': self.max_size,
+                'counters': dict(self.counters),
+            }
+
+
+# One pool per database a process connects to, keyed by the parameters that pick the database
+pools = {}
+pools_lock = threading.Lock()
+
+
+def pool_key(alias, settings_dict):
+    return alias, settings_dict['NAME'], settings_dict['HOST'], settings_dict['PORT'], settings_dict['USER']
+
+
+def get_pool(alias, settings_dict):
+    key = pool_key(alias, settings_dict)
+
+    with pools_lock:
+        if key not in pools:
+            pools[key] = ConnectionPool(f'{alias} ({settings_dict["NAME"]})', **settings_dict.get('POOL', {}))
+
+        return pools[key]
+
+
+def close_pools(name=None):
+    """
+    Close the idle connections of every pool, or of the pools connecting to the database with the name
+    """
+    with pools_lock:
+        current = [pool for key, pool in pools.items() if name is None or key[1] == name]
+
+    for pool in current:
+        pool.close_all()
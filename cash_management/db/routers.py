@@ -0,0 +1,84 @@
+import functools
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+
+REPLICA = 'replica'
+
+# Set for the duration of a view decorated with read_from_replica when its reads may go to the replica
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def pin_key(user_id):
+    return f'db:primary:{user_id}'
+
+
+def pin_to_primary(user_ids):
+    """
+    Keep the users' reads on the primary for REPLICA_PIN_SECONDS, so they see their own writes while the replica catches up
+    """
+    if replica_configured() and user_ids:
+        cache.set_many({pin_key(user_id): True for user_id in user_ids}, timeout=settings.REPLICA_PIN_SECONDS)
+
+
+class ReplicaRouter:
+    """
+    Route the reads of views decorated with read_from_replica to the replica database, everything else to the primary
+    """
+
+    def db_for_read(self, model, **hints):
+        return REPLICA if replica_reads.get() else None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same rows
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
+
+
+def read_from_replica(view):
+    """
+    Send the view's reads to the replica unless the requesting user wrote within the last REPLICA_PIN_SECONDS
+    """
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_configured() or cache.get(pin_key(request.user.pk)):
+            return view(request, *args, **kwargs)
+
+        token = replica_reads.set(True)
+        try:
+            return view(request, *args, **kwargs)
+
+        finally:
+            replica_reads.reset(token)
+
+    return wrapper
+
+
+def aread_from_replica(view):
+    """
+    Counterpart of read_from_replica for the async views
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not replica_configured() or await cache.aget(pin_key(request.user.pk)):
+            return await view(request, *args, **kwargs)
+
+        token = replica_reads.set(True)
+        try:
+            return await view(request, *args, **kwargs)
+
+        finally:
+            replica_reads.reset(token)
+
+    return wrapper
@@ -0,0 +1,215 @@
+"""
+In-process request metrics exposed in the Prometheus text format.
+
+MetricsMiddleware times every request and labels it with the resolved URL name. SQL queries are counted and timed by
+an execute wrapper installed on every database connection, which attributes them to the request through a context
+variable, so queries run by the async views in worker threads are counted too. Other modules can add their own
+samples with register_collector.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+_current_request = contextvars.ContextVar('metrics_request', default=None)
+_collectors = []
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, name, labels):
+        cumulative = 0
+
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket', {**labels, 'le': str(bound)}, cumulative
+
+        yield f'{name}_sum', labels, self.sum
+        yield f'{name}_count', labels, cumulative
+
+
+class RouteMetrics:
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.response_size = Histogram(SIZE_BUCKETS)
+        self.responses = {}
+        self.queries = 0
+        self.db_seconds = 0
+
+
+class Registry:
+    """
+    Per route request metrics, updated under one lock
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, status, seconds, queries, db_seconds, size):
+        with self.lock:
+            metrics = self.routes.get(route)
+
+            if metrics is None:
+                metrics = self.routes[route] = RouteMetrics()
+
+            metrics.latency.observe(seconds)
+            metrics.responses[status] = metrics.responses.get(status, 0) + 1
+            metrics.queries += queries
+            metrics.db_seconds += db_seconds
+
+            if size is not None:
+                metrics.response_size.observe(size)
+
+    def families(self):
+        with self.lock:
+            routes = list(self.routes.items())
+            latency, size, responses, queries, db_time = [], [], [], [], []
+
+            for route, metrics in routes:
+                labels = {'route': route}
+                latency.extend(metrics.latency.samples('http_request_duration_seconds', labels))
+                size.extend(metrics.response_size.samples('http_response_size_bytes', labels))
+                responses.extend(('http_responses_total', {**labels, 'status': str(status)}, count)
+                                 for status, count in sorted(metrics.responses.items()))
+                queries.append(('db_queries_total', labels, metrics.queries))
+                db_time.append(('db_query_duration_seconds_total', labels, metrics.db_seconds))
+
+        return [
+            ('http_request_duration_seconds', 'histogram', 'Request latency by route', latency),
+            ('http_response_size_bytes', 'histogram', 'Response body size by route', size),
+            ('http_responses_total', 'counter', 'Responses by route and status', responses),
+            ('db_queries_total', 'counter', 'SQL queries run by requests by route', queries),
+            ('db_query_duration_seconds_total', 'counter', 'Time spent in SQL queries by route', db_time),
+        ]
+
+
+registry = Registry()
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0
+
+
+def db_execute_wrapper(execute, sql, params, many, context):
+    stats = _current_request.get()
+
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+
+    try:
+        return execute(sql, params, many, context)
+
+    finally:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_db_execute_wrapper(sender, connection, **kwargs):
+    if db_execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(db_execute_wrapper)
+
+
+def register_collector(collector):
+    """
+    Register a callable returning [(name, type, help, [(sample name, labels, value), ...]), ...] for /metrics
+    """
+    _collectors.append(collector)
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in labels.values())
+    return '{' + ','.join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + '}'
+
+
+def render():
+    lines = []
+    families = registry.families()
+
+    for collector in _collectors:
+        families.extend(collector())
+
+    for name, type, help, samples in families:
+        lines.append(f'# HELP {name} {help}')
+        lines.append(f'# TYPE {name} {type}')
+        lines.extend(f'{sample}{format_labels(labels)} {value}' for sample, labels, value in samples)
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL query count, DB time and response size of every request by resolved URL name
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats, token, started = self.start()
+
+        try:
+            response = self.get_response(request)
+
+        finally:
+            _current_request.reset(token)
+
+        self.finish(request, response, stats, started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token, started = self.start()
+
+        try:
+            response = await self.get_response(request)
+
+        finally:
+            _current_request.reset(token)
+
+        self.finish(request, response, stats, started)
+        return response
+
+    def start(self):
+        stats = RequestStats()
+        return stats, _current_request.set(stats), time.perf_counter()
+
+    def finish(self, request, response, stats, started):
+        match = getattr(request, 'resolver_match', None)
+        route = match.url_name or match.route if match is not None else 'unmatched'
+        size = None if response.streaming else len(response.content)
+        registry.record(route, response.status_code, time.perf_counter() - started, stats.queries, stats.db_seconds, size)
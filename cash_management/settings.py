@@ -49,11 +49,14 @@ INSTALLED_APPS = [
 
     'authentication.apps.AuthenticationConfig',
     'transactions.apps.TransactionsConfig',
+    'benchmarks.apps.BenchmarksConfig',
 ]
 
 AUTH_USER_MODEL = 'authentication.User'
 
 MIDDLEWARE = [
+    'cash_management.metrics.MetricsMiddleware',
+    'cash_management.middleware.ASGIURLConfMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,6 +68,9 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'cash_management.urls'
 
+# Requests served through ASGI resolve with this URLconf, which mounts the async read views
+ASGI_URLCONF = 'cash_management.urls_async'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -87,21 +93,61 @@ WSGI_APPLICATION = 'cash_management.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Set DB_ENGINE=cash_management.db.backends.pooled_postgresql to reuse connections from a per-process pool,
+# POOL is ignored by the stock backend
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': env.str("DB_ENGINE", default='django.db.backends.postgresql'),
         'NAME': env.str("POSTGRES_DB"),
         'USER': env.str("POSTGRES_USER"),
         'PASSWORD': env.str("POSTGRES_PASSWORD"),
         'HOST': env.str("POSTGRES_HOST"),
         'PORT': env.str("POSTGRES_PORT"),
+        'POOL': {
+            'max_size': env.int("DB_POOL_MAX_SIZE", default=10),
+            'min_size': env.int("DB_POOL_MIN_SIZE", default=0),
+            'timeout': env.float("DB_POOL_TIMEOUT", default=10),
+            'max_lifetime': env.float("DB_POOL_MAX_LIFETIME", default=3600),
+            'max_idle': env.float("DB_POOL_MAX_IDLE", default=300),
+            'check_interval': env.float("DB_POOL_CHECK_INTERVAL", default=30),
+        },
+    }
+}
+
+# Streaming replica serving the list and report reads, see cash_management.db.routers
+if env.str("POSTGRES_REPLICA_HOST", default=''):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': env.str("POSTGRES_REPLICA_HOST"),
+        'PORT': env.str("POSTGRES_REPLICA_PORT", default=DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['cash_management.db.routers.ReplicaRouter']
+
+# Seconds a user's reads stay on the primary after they write, keep it above the replica lag
+REPLICA_PIN_SECONDS = env.int("REPLICA_PIN_SECONDS", default=5)
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': env.str("CACHE_BACKEND", default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': env.str("CACHE_LOCATION", default=''),
     }
 }
 
+# Seconds a cached report is kept, writes invalidate it earlier
+REPORT_CACHE_TIMEOUT = env.int("REPORT_CACHE_TIMEOUT", default=300)
+
+# Seconds a user's identity and active status are cached for authentication, saving or deleting the user invalidates them earlier
+AUTH_USER_CACHE_TIMEOUT = env.int("AUTH_USER_CACHE_TIMEOUT", default=60)
+
 # Add authentication and permission classes
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PARSER_CLASSES': (
         'rest_framework.parsers.FormParser',
@@ -116,14 +162,36 @@ REST_FRAMEWORK = {
     # 'DEFAULT_PERMISSION_CLASSES': (
     #     'rest_framework.permissions.IsAuthenticated',
     # ),
+    # Trusted proxies appending to X-Forwarded-For, with 0 throttles key anonymous clients on REMOTE_ADDR
+    'NUM_PROXIES': env.int("NUM_PROXIES", default=0),
+    # Token-bucket budgets per user, or per IP address when anonymous, see cash_management.throttling. The _total
+    # rates budget all clients of a scope together and are off unless set
+    'DEFAULT_THROTTLE_RATES': {
+        'reports': env.str("THROTTLE_REPORTS_RATE", default='60/min'),
+        'reports_total': env.str("THROTTLE_REPORTS_TOTAL_RATE", default=None),
+        'writes': env.str("THROTTLE_WRITES_RATE", default='120/min'),
+        'writes_total': env.str("THROTTLE_WRITES_TOTAL_RATE", default=None),
+        'login': env.str("THROTTLE_LOGIN_RATE", default='10/min'),
+        'login_total': env.str("THROTTLE_LOGIN_TOTAL_RATE", default=None),
+    },
 }
 
+THROTTLE_ENABLED = env.bool("THROTTLE_ENABLED", default=True)
+# local keeps the buckets in each process, cache shares them through the default cache
+THROTTLE_STORE = env.str("THROTTLE_STORE", default='local')
+
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
-    'ACCESS_TOKEN_LIFETIME': datetime.timedelta(min=5),
+    'ACCESS_TOKEN_LIFETIME': datetime.timedelta(minutes=5),
     'REFRESH_TOKEN_LIFETIME': datetime.timedelta(days=1),
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.serializers.TokenRefreshSerializer',
 }
 
+# Seconds between syncs of the in-memory refresh token blacklist with the database
+TOKEN_BLACKLIST_SYNC_INTERVAL = env.int("TOKEN_BLACKLIST_SYNC_INTERVAL", default=30)
+# Used instead when the cache is kept per process, so tokens blacklisted by other processes are not signalled
+TOKEN_BLACKLIST_LOCAL_SYNC_INTERVAL = env.float("TOKEN_BLACKLIST_LOCAL_SYNC_INTERVAL", default=1.0)
+
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
         'Bearer': {
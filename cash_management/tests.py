@@ -0,0 +1,370 @@
+import datetime
+import threading
+import time
+import unittest
+import unittest.mock
+from types import SimpleNamespace
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, connections, router
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from authentication.models import User
+from transactions.categories import intern_category
+from transactions.models import Transaction
+from .db.backends.pooled_postgresql.pool import ConnectionPool, PoolTimeout, close_pools, get_pool, pools
+from .db.routers import REPLICA, ReplicaRouter, aread_from_replica, pin_key, read_from_replica
+from .throttling import STORES, LocalBucketStore, parse_rate, take_token
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def setUp(self):
+        self.pool = ConnectionPool('test', max_size=2, timeout=0.05, max_lifetime=60, max_idle=60, check_interval=0)
+
+    def checkout(self, healthy=True):
+        return self.pool.checkout(FakeConnection, lambda connection: healthy)
+
+    ### Unit Tests ###
+
+    def test_connections_are_reused(self):
+        first = self.checkout()
+        self.pool.checkin(first, reusable=True)
+
+        self.assertIs(self.checkout(), first)
+        self.assertEqual(self.pool.stats()['counters']['created'], 1)
+
+    def test_pool_is_bounded(self):
+        self.checkout()
+        self.checkout()
+
+        with self.assertRaises(PoolTimeout):
+            self.checkout()
+
+        self.assertEqual(self.pool.stats()['counters']['timeouts'], 1)
+
+    def test_waiter_gets_returned_connection(self):
+        self.pool.timeout = 5
+        first = self.checkout()
+        self.checkout()
+        threading.Timer(0.05, self.pool.checkin, (first, True)).start()
+
+        self.assertIs(self.checkout(), first)
+        self.assertEqual(self.pool.stats()['counters']['waits'], 1)
+        self.assertEqual(self.pool.wait_time.counts[-1] + sum(self.pool.wait_time.counts[:-1]), 3)
+
+    def test_unhealthy_connections_are_replaced(self):
+        first = self.checkout()
+        self.pool.checkin(first, reusable=True)
+
+        second = self.checkout(healthy=False)
+        self.assertIsNot(second, first)
+        self.assertTrue(first.closed)
+        self.assertEqual(self.pool.stats()['counters']['closed_unhealthy'], 1)
+
+    def test_broken_connections_are_not_reused(self):
+        first = self.checkout()
+        self.pool.checkin(first, reusable=False)
+
+        self.assertTrue(first.closed)
+        self.assertEqual(self.pool.stats()['size'], 0)
+
+    def test_max_lifetime(self):
+        self.pool.max_lifetime = 0
+        first = self.checkout()
+        self.pool.checkin(first, reusable=True)
+
+        self.assertTrue(first.closed)
+        self.assertIsNot(self.checkout(), first)
+
+    def test_idle_connections_are_reaped(self):
+        self.pool.max_idle = 0.01
+        first = self.checkout()
+        self.pool.checkin(first, reusable=True)
+        time.sleep(0.02)
+
+        self.checkout()
+        self.assertTrue(first.closed)
+        self.assertEqual(self.pool.stats()['counters']['closed_idle'], 1)
+        self.assertEqual(self.pool.stats()['size'], 1)
+
+    def test_failed_connect_frees_slot(self):
+        def connect():
+            raise OSError('connection refused')
+
+        for _ in range(3):
+            with self.assertRaises(OSError):
+                self.pool.checkout(connect, lambda connection: True)
+
+        self.assertEqual(self.pool.stats()['size'], 0)
+
+    def test_pools_are_kept_per_database(self):
+        settings_dict = {'NAME': 'cash', 'HOST': 'db', 'PORT': '5432', 'USER': 'cash', 'POOL': {'max_size': 2}}
+        self.addCleanup(lambda: [pools.pop(key) for key in list(pools) if key[0] == 'pool_test'])
+        main = get_pool('pool_test', settings_dict)
+        # The test runner switches NAME to the test database after closing the connection
+        test = get_pool('pool_test', {**settings_dict, 'NAME': 'test_cash'})
+
+        self.assertIs(get_pool('pool_test', dict(settings_dict)), main)
+        self.assertIsNot(test, main)
+
+        main.checkin(main.checkout(FakeConnection, lambda connection: True), reusable=True)
+        test.checkin(test.checkout(FakeConnection, lambda connection: True), reusable=True)
+        close_pools('test_cash')
+        self.assertEqual((main.stats()['idle'], test.stats()['idle'], test.stats()['size']), (1, 0, 0))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Needs a PostgreSQL database')
+class PooledPostgreSQLBackendTests(TestCase):
+
+    ### Integration Tests ###
+
+    def test_closed_connection_returns_to_pool(self):
+        from .db.backends.pooled_postgresql.base import DatabaseWrapper
+
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'POOL': {'max_size': 1}}, alias='pool_test')
+
+        try:
+            wrapper.ensure_connection()
+            raw = wrapper.connection
+            wrapper.close()
+            wrapper.ensure_connection()
+            self.assertIs(wrapper.connection, raw)
+
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                self.assertEqual(cursor.fetchone(), (1,))
+
+        finally:
+            wrapper.close()
+            wrapper.pool.close_all()
+
+    def test_held_cursors_are_closed_before_checkin(self):
+        from .db.backends.pooled_postgresql.base import DatabaseWrapper
+
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'POOL': {'max_size': 1}}, alias='pool_test')
+
+        try:
+            # Left open as by a streaming response whose client went away
+            held = wrapper.chunked_cursor()
+            held.execute('SELECT generate_series(1, 10)')
+            held.fetchone()
+            wrapper.close()
+
+            with wrapper.cursor() as cursor:
+                cursor.execute('SELECT count(*) FROM pg_cursors')
+                self.assertEqual(cursor.fetchone(), (0,))
+
+        finally:
+            wrapper.close()
+            wrapper.pool.close_all()
+
+
+class ReplicaRouterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.request = SimpleNamespace(user=self.user)
+
+    def read_database(self, request):
+        return router.db_for_read(Transaction)
+
+    ### Unit Tests ###
+
+    def test_reads_outside_replica_views_use_primary(self):
+        self.assertEqual(router.db_for_read(Transaction), 'default')
+        self.assertEqual(router.db_for_write(Transaction), 'default')
+
+    def test_replica_is_not_migrated(self):
+        self.assertFalse(ReplicaRouter().allow_migrate(REPLICA, 'transactions', 'transaction'))
+        self.assertTrue(ReplicaRouter().allow_migrate('default', 'transactions', 'transaction'))
+
+    @unittest.mock.patch('cash_management.db.routers.replica_configured', return_value=False)
+    def test_without_replica_views_read_from_primary(self, configured):
+        self.assertEqual(read_from_replica(self.read_database)(self.request), 'default')
+        Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, 'Food'), type='expense', amount=50, date=datetime.date.today())
+        self.assertIsNone(cache.get(pin_key(self.user.pk)))
+
+    @unittest.mock.patch('cash_management.db.routers.replica_configured', return_value=True)
+    def test_replica_views_read_from_replica(self, configured):
+        self.assertEqual(read_from_replica(self.read_database)(self.request), REPLICA)
+        self.assertEqual(router.db_for_read(Transaction), 'default')
+
+    @unittest.mock.patch('cash_management.db.routers.replica_configured', return_value=True)
+    def test_writer_is_pinned_to_primary(self, configured):
+        other = User.objects.create_user(username='otheruser', password='testpassword')
+        Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, 'Food'), type='expense', amount=50, date=datetime.date.today())
+
+        self.assertEqual(read_from_replica(self.read_database)(self.request), 'default')
+        self.assertEqual(read_from_replica(self.read_database)(SimpleNamespace(user=other)), REPLICA)
+
+        cache.delete(pin_key(self.user.pk))
+        self.assertEqual(read_from_replica(self.read_database)(self.request), REPLICA)
+
+    @unittest.mock.patch('cash_management.db.routers.replica_configured', return_value=True)
+    def test_async_replica_views(self, configured):
+        async def view(request):
+            return router.db_for_read(Transaction)
+
+        self.assertEqual(async_to_sync(aread_from_replica(view))(self.request), REPLICA)
+        cache.set(pin_key(self.user.pk), True)
+        self.assertEqual(async_to_sync(aread_from_replica(view))(self.request), 'default')
+
+
+@unittest.skipUnless(REPLICA in settings.DATABASES, 'Needs a replica database, set POSTGRES_REPLICA_HOST')
+class ReplicaRoutingTests(TransactionTestCase):
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+    def replica_queries(self, url):
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connections[REPLICA].execute_wrapper(record):
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return queries
+
+    ### Integration Tests ###
+
+    def test_list_and_reports_read_from_replica_until_the_user_writes(self):
+        urls = [reverse('transaction_list_create'), reverse('monthly-summary-report'), reverse('category-wise-expense-report')]
+
+        for url in urls:
+            self.assertTrue(self.replica_queries(url))
+
+        response = self.client.post(urls[0], {'category': 'Salary', 'type': 'income', 'amount': '5.00', 'date': '2023-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        for url in urls:
+            self.assertEqual(self.replica_queries(url), [])
+
+
+THROTTLE_RATES = {'reports': '3/min', 'writes': '2/min', 'login': '2/min'}
+
+
+@override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': THROTTLE_RATES}, THROTTLE_ENABLED=True)
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        STORES['local'].buckets.clear()
+        self.addCleanup(STORES['local'].buckets.clear)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.user.balance = 1000
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.report_url = reverse('monthly-summary-report')
+
+    def get_reports(self, count, client=None):
+        return [(client or self.client).get(self.report_url).status_code for _ in range(count)]
+
+    ### Unit Tests ###
+
+    def test_buckets_refill_at_their_rate(self):
+        self.assertEqual(parse_rate('3/min'), (3, 0.05))
+        bucket, wait = take_token(None, 2, 1, 100)
+        self.assertEqual((bucket, wait), ((1, 100), 0))
+        bucket, wait = take_token(bucket, 2, 1, 100)
+        bucket, wait = take_token(bucket, 2, 1, 100.25)
+        self.assertEqual((bucket, wait), ((0.25, 100.25), 0.75))
+        # Refilled tokens never exceed the capacity
+        self.assertEqual(take_token(bucket, 2, 1, 200), ((1, 200), 0))
+
+    def test_local_store_evicts_least_recently_used_buckets(self):
+        store = LocalBucketStore()
+        store.max_size = 2
+        store.take('old', 1, 1)
+        store.take('busy', 1, 1)
+        store.take('old', 1, 1)
+        store.take('new', 1, 1)
+        self.assertEqual(list(store.buckets), ['old', 'new'])
+
+    ### Integration Tests ###
+
+    def test_reports_are_budgeted_per_user(self):
+        self.assertEqual(self.get_reports(3), [status.HTTP_200_OK] * 3)
+
+        # Shed before the view reads anything
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('category-wise-expense-report'))
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '20')
+
+        other = APIClient()
+        other.force_authenticate(user=User.objects.create_user(username='otheruser', password='testpassword'))
+        self.assertEqual(self.get_reports(1, other), [status.HTTP_200_OK])
+
+        # Writes have their own budget, reads of the list none
+        data = {'category': 'Food', 'type': 'income', 'amount': '10', 'date': '2023-07-01'}
+        self.assertEqual([self.client.post(reverse('transaction_list_create'), data).status_code for _ in range(3)],
+                         [status.HTTP_201_CREATED, status.HTTP_201_CREATED, status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual({self.client.get(reverse('transaction_list_create')).status_code for _ in range(5)}, {status.HTTP_200_OK})
+
+    def test_login_is_budgeted_per_ip(self):
+        client = APIClient()
+        data = {'username': 'testuser', 'password': 'wrongpassword'}
+        self.assertEqual([client.post(reverse('login'), data).status_code for _ in range(3)],
+                         [status.HTTP_401_UNAUTHORIZED, status.HTTP_401_UNAUTHORIZED, status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual(client.post(reverse('register'), data).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(client.post(reverse('login'), data, REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_forwarded_for_does_not_pick_the_bucket(self):
+        client = APIClient()
+        data = {'username': 'testuser', 'password': 'wrongpassword'}
+        responses = [client.post(reverse('login'), data, HTTP_X_FORWARDED_FOR=f'10.0.0.{i}').status_code for i in range(5)]
+        self.assertEqual(responses[2:], [status.HTTP_429_TOO_MANY_REQUESTS] * 3)
+        self.assertEqual(len(STORES['local'].buckets), 1)
+
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': THROTTLE_RATES, 'NUM_PROXIES': 1}):
+            self.assertEqual(client.post(reverse('login'), data, HTTP_X_FORWARDED_FOR='10.0.0.9').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_total_budget_sheds_every_client(self):
+        rates = {**THROTTLE_RATES, 'reports': '100/min', 'reports_total': '4/min'}
+
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': rates}):
+            self.assertEqual(self.get_reports(4), [status.HTTP_200_OK] * 4)
+            other = APIClient()
+            other.force_authenticate(user=User.objects.create_user(username='otheruser', password='testpassword'))
+            self.assertEqual(self.get_reports(1, other), [status.HTTP_429_TOO_MANY_REQUESTS])
+
+    def test_cache_store_and_switch(self):
+        with override_settings(THROTTLE_STORE='cache'):
+            self.assertEqual(self.get_reports(4)[-1], status.HTTP_429_TOO_MANY_REQUESTS)
+
+        self.assertEqual(STORES['local'].buckets, {})
+        self.assertIsNotNone(cache.get(f'throttle:reports:user:{self.user.pk}'))
+
+        with override_settings(THROTTLE_ENABLED=False):
+            self.assertEqual(set(self.get_reports(5)), {status.HTTP_200_OK})
+
+    def test_async_reports_are_throttled(self):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        responses = [async_to_sync(self.async_client.get)(self.report_url, headers=headers) for _ in range(4)]
+        self.assertEqual([response.status_code for response in responses], [status.HTTP_200_OK] * 3 + [status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual(responses[-1]['Retry-After'], '20')
@@ -0,0 +1,174 @@
+"""
+Token-bucket request throttles.
+
+Each throttle class has a scope budgeted in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] as 'N/period': a client's bucket
+holds up to N tokens, refills at N per period and every request takes one token. Clients are users, or IP addresses
+for anonymous requests. A '<scope>_total' rate adds one bucket shared by all clients of the scope, so the scope sheds
+load once it is over budget as a whole. Denied requests are answered with 429 and Retry-After before the view runs.
+
+Buckets are kept in the process by default, THROTTLE_STORE = 'cache' keeps them in the default cache so every process
+using it shares them. IP addresses are REMOTE_ADDR unless REST_FRAMEWORK['NUM_PROXIES'] says how many trusted proxies
+in front of the service append to X-Forwarded-For, a client-supplied header would otherwise pick its own bucket.
+"""
+import functools
+import math
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@functools.lru_cache(maxsize=None)
+def parse_rate(rate):
+    """
+    Return the capacity and the tokens refilled per second of an 'N/period' rate
+    """
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period[0]]
+
+
+def take_token(bucket, capacity, refill_rate, now):
+    """
+    Return the (tokens, updated) bucket after a request and the seconds until it holds a token again, 0 when the
+    request may proceed. A missing bucket is full
+    """
+    tokens, updated = bucket or (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+
+    return (tokens, now), (1 - tokens) / refill_rate
+
+
+class LocalBucketStore:
+    """
+    Buckets of this process, taking a token needs no I/O. Past max_size the least recently used buckets are evicted
+    """
+    max_size = 100000
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate):
+        now = time.monotonic()
+
+        with self.lock:
+            bucket, wait = take_token(self.buckets.get(key), capacity, refill_rate, now)
+            self.buckets[key] = bucket
+            self.buckets.move_to_end(key)
+
+            if len(self.buckets) > self.max_size:
+                self.buckets.popitem(last=False)
+
+        return wait
+
+    async def atake(self, key, capacity, refill_rate):
+        return self.take(key, capacity, refill_rate)
+
+
+class CacheBucketStore:
+    """
+    Buckets in the default cache, shared by every process using it. A bucket is read and written without a lock, so
+    concurrent requests of one client can both take its last token
+    """
+
+    def take(self, key, capacity, refill_rate):
+        bucket, wait = take_token(cache.get(key), capacity, refill_rate, time.time())
+        # Once it expires the bucket would have refilled anyway
+        cache.set(key, bucket, timeout=math.ceil(capacity / refill_rate))
+        return wait
+
+    async def atake(self, key, capacity, refill_rate):
+        bucket, wait = take_token(await cache.aget(key), capacity, refill_rate, time.time())
+        await cache.aset(key, bucket, timeout=math.ceil(capacity / refill_rate))
+        return wait
+
+
+STORES = {'local': LocalBucketStore(), 'cache': CacheBucketStore()}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Take a token from the client's bucket of the scope, then from the scope's total bucket when it has a rate
+    """
+    scope = None
+
+    def applies(self, request):
+        return True
+
+    def get_ident(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+
+        return f'ip:{super().get_ident(request)}'
+
+    def buckets(self, request):
+        rates = api_settings.DEFAULT_THROTTLE_RATES
+
+        for key, rate in ((self.get_ident(request), rates.get(self.scope)), ('total', rates.get(f'{self.scope}_total'))):
+            if rate:
+                yield (f'throttle:{self.scope}:{key}', *parse_rate(rate))
+
+    def allow_request(self, request, view):
+        self.wait_seconds = 0
+
+        if settings.THROTTLE_ENABLED and self.applies(request):
+            store = STORES[settings.THROTTLE_STORE]
+
+            for key, capacity, refill_rate in self.buckets(request):
+                self.wait_seconds = store.take(key, capacity, refill_rate)
+
+                if self.wait_seconds:
+                    break
+
+        return not self.wait_seconds
+
+    async def aallow_request(self, request, view):
+        self.wait_seconds = 0
+
+        if settings.THROTTLE_ENABLED and self.applies(request):
+            store = STORES[settings.THROTTLE_STORE]
+
+            for key, capacity, refill_rate in self.buckets(request):
+                self.wait_seconds = await store.atake(key, capacity, refill_rate)
+
+                if self.wait_seconds:
+                    break
+
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class ReportThrottle(TokenBucketThrottle):
+    scope = 'reports'
+
+
+class WriteThrottle(TokenBucketThrottle):
+    """
+    Throttle for the unsafe methods of a view, its reads are not throttled
+    """
+    scope = 'writes'
+
+    def applies(self, request):
+        return request.method not in SAFE_METHODS
+
+
+class LoginThrottle(TokenBucketThrottle):
+    """
+    Throttle for login and registration, by IP address so guessing passwords of many users shares one budget
+    """
+    scope = 'login'
+
+    def get_ident(self, request):
+        return f'ip:{BaseThrottle.get_ident(self, request)}'
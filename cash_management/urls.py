@@ -19,6 +19,7 @@ from django.urls import path, include
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from .views import metrics
 
 
 # drf_yasg settings
@@ -40,6 +41,7 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('auth/', include('authentication.urls')),
     path('', include('transactions.urls')),
+    path('metrics', metrics, name='metrics'),
 
     # drf_yasg
     path('doc/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
@@ -0,0 +1,20 @@
+"""
+URL configuration for requests served through ASGI.
+
+The transaction list, detail, export and report routes resolve to the async views in transactions.async_views, which
+answer GET requests with the async ORM and hand other methods to the sync views. Every other route is the same as
+in cash_management.urls.
+"""
+from django.urls import path
+from transactions import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+
+urlpatterns = [
+    path('transactions/', async_views.transaction_list, name='transaction_list_create'),
+    path('transactions/<int:pk>/', async_views.transaction_detail, name='transaction_retrieve_update_destroy'),
+    path('transactions/export/', async_views.transaction_export, name='transaction_export'),
+    path('reports/monthly-summary/', async_views.monthly_summary_report, name='monthly-summary-report'),
+    path('reports/category-wise-expense/', async_views.category_wise_expense_report, name='category-wise-expense-report'),
+    path('reports/series/', async_views.transaction_series_report, name='series-report'),
+] + sync_urlpatterns
@@ -7,3 +7,7 @@ class TransactionsConfig(AppConfig):
     
     def ready(self):
         import transactions.signals
+        from cash_management.metrics import register_collector
+        from .report_cache import report_cache_metrics
+
+        register_collector(report_cache_metrics)
@@ -0,0 +1,151 @@
+import functools
+import itertools
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from authentication.authentication import AsyncJWTAuthentication
+from cash_management.db.routers import aread_from_replica
+from .conditional import aconditional_on_transactions
+from .exporters import AEXPORTERS, EXPORT_VALUES
+from .filters import filter_transactions
+from .models import Transaction
+from .reports import acached_category_wise_expense, amonthly_summary
+from .series import atransaction_series, series_response
+from .serializers import TRANSACTION_VALUES, TransactionSerializer, transaction_rows
+from . import views
+
+
+authenticator = AsyncJWTAuthentication()
+renderer = JSONRenderer()
+
+
+def render(data, status=status.HTTP_200_OK):
+    return HttpResponse(renderer.render(data), status=status, content_type=renderer.media_type)
+
+
+def error_response(exc):
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = render(data, status=exc.status_code)
+
+    if getattr(exc, 'wait', None):
+        response['Retry-After'] = '%d' % exc.wait
+
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response.status_code = status.HTTP_401_UNAUTHORIZED
+        response['WWW-Authenticate'] = authenticator.authenticate_header(None)
+
+    return response
+
+
+def async_read_view(sync_view):
+    """
+    Serve GET requests with the decorated coroutine after JWT authentication and the sync view's throttles, every
+    other method is handed to the sync DRF view so writes keep their serializers and signals
+    """
+
+    def decorator(view):
+        write_view = sync_to_async(sync_view)
+        throttle_classes = sync_view.cls.throttle_classes
+
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method != 'GET':
+                return await write_view(request, *args, **kwargs)
+
+            try:
+                auth = await authenticator.aauthenticate(request)
+
+                if auth is None:
+                    raise exceptions.NotAuthenticated()
+
+                request = Request(request)
+                request.user, request.auth = auth
+
+                for throttle in [throttle_class() for throttle_class in throttle_classes]:
+                    if not await throttle.aallow_request(request, None):
+                        raise exceptions.Throttled(throttle.wait())
+
+                return await view(request, *args, **kwargs)
+
+            except exceptions.APIException as exc:
+                return error_response(exc)
+
+        # DRF views are exempt from CSRF checks, JWT requests carry no cookies
+        wrapper.csrf_exempt = True
+        return wrapper
+
+    return decorator
+
+
+@async_read_view(views.TransactionListCreateView.as_view())
+@aread_from_replica
+@aconditional_on_transactions
+async def transaction_list(request):
+    queryset = filter_transactions(Transaction.objects.all(), request.user, request.query_params).values_list(*TRANSACTION_VALUES)
+    paginator = views.get_list_paginator(request.query_params, views.TransactionListCreateView.pagination_class)
+    page = await paginator.apaginate_queryset(queryset, request)
+    return render(paginator.get_paginated_response(transaction_rows(page)).data)
+
+
+@async_read_view(views.TransactionRetrieveUpdateDestroyView.as_view())
+async def transaction_detail(request, pk):
+    try:
+        transaction = await Transaction.objects.select_related('category').aget(pk=pk)
+
+    except Transaction.DoesNotExist:
+        raise exceptions.NotFound()
+
+    if transaction.user_id != request.user.pk:
+        raise exceptions.PermissionDenied()
+
+    return render(TransactionSerializer(transaction).data)
+
+
+@async_read_view(views.monthly_summary_report)
+@aread_from_replica
+@aconditional_on_transactions
+async def monthly_summary_report(request):
+    return render(await amonthly_summary(request.user.pk))
+
+
+@async_read_view(views.category_wise_expense_report)
+@aread_from_replica
+@aconditional_on_transactions
+async def category_wise_expense_report(request):
+    return render(await acached_category_wise_expense(request.user.pk))
+
+
+@async_read_view(views.transaction_series_report)
+@aread_from_replica
+@aconditional_on_transactions(window=views.series_window)
+async def transaction_series_report(request):
+    query = views.series_query(request)
+    return render(series_response(query, await atransaction_series(*query)))
+
+
+async def aiterate(queryset, chunk_size):
+    """
+    Yield the queryset's rows, fetched chunk by chunk from its sync iterator in the thread sync_to_async runs ORM calls
+    in. Django 4.2's aiterator() starts values_list queries in the event loop, which raises SynchronousOnlyOperation
+    """
+    rows = queryset.iterator(chunk_size=chunk_size)
+    fetch = sync_to_async(lambda: list(itertools.islice(rows, chunk_size)))
+
+    try:
+        while chunk := await fetch():
+            for row in chunk:
+                yield row
+
+    finally:
+        # Closes the cursor in its thread, also when the client went away mid download
+        await sync_to_async(rows.close)()
+
+
+@async_read_view(views.TransactionExportView.as_view())
+async def transaction_export(request):
+    export_format = views.export_format_of(request, AEXPORTERS)
+    content_type, write_rows = AEXPORTERS[export_format]
+    queryset = filter_transactions(Transaction.objects.all(), request.user, request.query_params).values_list(*EXPORT_VALUES)
+    return views.export_response(write_rows(aiterate(queryset, views.TransactionExportView.chunk_size)), content_type, export_format)
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.utils import timezone
+
+
+def signed_amount(type, amount):
+    """
+    Return the amount as it affects the balance: positive for income, negative for expense
+    """
+    return amount if type == 'income' else -amount
+
+
+def locked_balance(user_id):
+    """
+    Read the user's stored balance and lock the user row until the end of the database transaction, so concurrent
+    writers check their expenses one after the other
+    """
+    return get_user_model().objects.select_for_update().values_list('balance', flat=True).get(pk=user_id)
+
+
+def apply_balance_deltas(deltas):
+    """
+    Apply {user_id: delta} to the stored balances and bump the users' transactions version, with one in-database
+    UPDATE per user, including users whose balance did not move
+    """
+    user_model = get_user_model()
+    now = timezone.now()
+
+    for user_id, delta in deltas.items():
+        changes = {'transactions_version': F('transactions_version') + 1, 'transactions_changed_at': now}
+
+        if delta:
+            changes['balance'] = F('balance') + delta
+
+        user_model.objects.filter(pk=user_id).update(**changes)
@@ -0,0 +1,81 @@
+import threading
+from collections import OrderedDict
+from django.db import IntegrityError, transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
+from .models import Category
+
+# (user id, lowercased name) -> (category id, stored name) of committed categories, ids never change. Past
+# CATEGORY_CACHE_SIZE the least recently used categories are evicted
+category_cache = OrderedDict()
+category_cache_lock = threading.Lock()
+CATEGORY_CACHE_SIZE = 100000
+
+
+def cache_key(user_id, name):
+    return user_id, name.lower()
+
+
+def remember(key, category):
+    with category_cache_lock:
+        category_cache[key] = (category.pk, category.name)
+        category_cache.move_to_end(key)
+
+        if len(category_cache) > CATEGORY_CACHE_SIZE:
+            category_cache.popitem(last=False)
+
+
+def cached_category(user_id, key):
+    with category_cache_lock:
+        cached = category_cache.get(key)
+
+        if cached is not None:
+            category_cache.move_to_end(key)
+
+    if cached is not None:
+        return Category.from_db(Category.objects.db, ['id', 'user_id', 'name'], [cached[0], user_id, cached[1]])
+
+
+def categories_named(user_id, name):
+    """
+    Return a queryset of the user's category with the name, compared ignoring case through the unique constraint's index
+    """
+    return Category.objects.alias(lower_name=Lower('name')).filter(user_id=user_id, lower_name=Lower(Value(name)))
+
+
+def lookup_category(user_id, name):
+    return categories_named(user_id, name).first()
+
+
+def intern_category(user_id, name):
+    """
+    Return the user's category with the name, compared ignoring case, creating it on first use. Categories are cached
+    per process once the transaction that looked them up commits, a cached category is returned without queries or
+    commit hooks
+    """
+    key = cache_key(user_id, name)
+    category = cached_category(user_id, key)
+
+    if category is None:
+        category = lookup_category(user_id, name)
+
+        if category is None:
+            try:
+                with transaction.atomic():
+                    category = Category.objects.create(user_id=user_id, name=name)
+
+            except IntegrityError:
+                # Created by a concurrent request since the lookup
+                category = lookup_category(user_id, name)
+
+        transaction.on_commit(lambda: remember(key, category))
+
+    return category
+
+
+def intern_categories(user_id, names):
+    """
+    Return {name: category} for the distinct names, interning each of them once in order of appearance
+    """
+    return {name: intern_category(user_id, name) for name in dict.fromkeys(names)}
+
@@ -0,0 +1,97 @@
+import calendar
+import datetime
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+from .models import BalanceCheckpoint, Transaction
+
+
+def month_end(date):
+    return datetime.date(date.year, date.month, calendar.monthrange(date.year, date.month)[1])
+
+
+def signed_total(queryset):
+    """
+    Return income minus expenses over the queryset's transactions in one aggregate query
+    """
+    zero = Decimal(0)
+    totals = queryset.aggregate(income=Coalesce(Sum('amount', filter=Q(type='income')), zero),
+                                expense=Coalesce(Sum('amount', filter=Q(type='expense')), zero))
+    return totals['income'] - totals['expense']
+
+
+def monthly_signed_totals(queryset):
+    """
+    Return {(year, month): income minus expenses} over the queryset's transactions
+    """
+    rows = queryset.values('date__year', 'date__month') \
+                   .annotate(income=Coalesce(Sum('amount', filter=Q(type='income')), Decimal(0)),
+                             expense=Coalesce(Sum('amount', filter=Q(type='expense')), Decimal(0))) \
+                   .values_list('date__year', 'date__month', 'income', 'expense') \
+                   .order_by()
+    return {(year, month): income - expense for year, month, income, expense in rows}
+
+
+def apply_checkpoint_deltas(deltas):
+    """
+    Apply {(user_id, date): delta} to every checkpoint of the user dated on or after the transaction date
+    """
+    for (user_id, date), delta in deltas.items():
+        if delta:
+            BalanceCheckpoint.objects.filter(user_id=user_id, date__gte=date).update(balance=F('balance') + delta)
+
+
+def balance_as_of(user_id, as_of):
+    """
+    Return the user's balance at the end of as_of from the nearest earlier checkpoint plus the transactions after it.
+    Within detached months, whose checkpoints were completed before the detach, it is exact at month ends only
+    """
+    checkpoint = BalanceCheckpoint.objects.filter(user_id=user_id, date__lte=as_of).order_by('-date').first()
+    transactions = Transaction.objects.filter(user_id=user_id, date__lte=as_of)
+
+    if checkpoint is None:
+        return signed_total(transactions)
+
+    return checkpoint.balance + signed_total(transactions.filter(date__gt=checkpoint.date))
+
+
+def create_balance_checkpoints(user_id, until, rebuild=False, since=None):
+    """
+    Add the user's missing month end checkpoints up to until, or recompute all of them when rebuild is set,
+    and return how many were created. A rebuild keeps the checkpoints before since, the first day after detached
+    partitions, and continues from the last of them
+    """
+    with transaction.atomic():
+        # Writes update the user's balance in the same transaction as the checkpoints, the row lock keeps them out
+        get_user_model().objects.select_for_update().filter(pk=user_id).exists()
+
+        if rebuild:
+            checkpoints = BalanceCheckpoint.objects.filter(user_id=user_id)
+            (checkpoints if since is None else checkpoints.filter(date__gte=since)).delete()
+
+        last = BalanceCheckpoint.objects.filter(user_id=user_id).order_by('-date').first()
+        transactions = Transaction.objects.filter(user_id=user_id, date__lte=until)
+
+        if last is not None:
+            balance, start = last.balance, last.date + datetime.timedelta(days=1)
+            transactions = transactions.filter(date__gt=last.date)
+
+        else:
+            balance, start = Decimal(0), transactions.order_by('date').values_list('date', flat=True).first()
+
+        if start is None or month_end(start) > until:
+            return 0
+
+        monthly = monthly_signed_totals(transactions)
+        checkpoints = []
+        date = month_end(start)
+
+        while date <= until:
+            balance += monthly.get((date.year, date.month), 0)
+            checkpoints.append(BalanceCheckpoint(user_id=user_id, date=date, balance=balance))
+            date = month_end(date + datetime.timedelta(days=1))
+
+        BalanceCheckpoint.objects.bulk_create(checkpoints)
+        return len(checkpoints)
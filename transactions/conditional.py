@@ -0,0 +1,102 @@
+import datetime
+import functools
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
+
+
+def validators(user_id, version, changed_at, window=None):
+    """
+    Return the weak ETag and the Last-Modified timestamp in whole seconds. Last-Modified is left out within a second of
+    the last write, when a later write in the same second would keep it, and for responses that also depend on the
+    window, which changes without a write
+    """
+    if window is not None:
+        return f'W/"{user_id}-{version}-{window}"', None
+
+    etag = f'W/"{user_id}-{version}"'
+
+    if changed_at is None or timezone.now() - changed_at < datetime.timedelta(seconds=1):
+        return etag, None
+
+    return etag, int(changed_at.timestamp())
+
+
+def user_validators(user_id, window=None):
+    """
+    Return the weak ETag and Last-Modified timestamp of the user's transactions, read with one primary key lookup
+    """
+    return validators(user_id, *get_user_model().objects.values_list('transactions_version', 'transactions_changed_at').get(pk=user_id), window)
+
+
+async def auser_validators(user_id, window=None):
+    return validators(user_id, *await get_user_model().objects.values_list('transactions_version', 'transactions_changed_at').aget(pk=user_id), window)
+
+
+def not_modified(request, etag, last_modified):
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+
+    if response is not None:
+        set_validators(response, etag, last_modified)
+
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+
+    # Responses differ per token, clients must revalidate before reusing them
+    patch_vary_headers(response, ['Authorization'])
+    patch_cache_control(response, private=True, no_cache=True)
+
+
+def conditional_on_transactions(view=None, *, window=None):
+    """
+    Answer GETs with a matching If-None-Match or If-Modified-Since with 304 before the view runs any query, and add
+    the ETag and Last-Modified of the requesting user's transactions to successful responses. window(request) returns
+    what else the response depends on, such as the current date, or None
+    """
+    if view is None:
+        return functools.partial(conditional_on_transactions, window=window)
+
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        etag, last_modified = user_validators(request.user.pk, window and window(request))
+        response = not_modified(request, etag, last_modified)
+
+        if response is None:
+            response = view(request, *args, **kwargs)
+
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified)
+
+        return response
+
+    return wrapper
+
+
+def aconditional_on_transactions(view=None, *, window=None):
+    """
+    Counterpart of conditional_on_transactions for the async views
+    """
+    if view is None:
+        return functools.partial(aconditional_on_transactions, window=window)
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        etag, last_modified = await auser_validators(request.user.pk, window and window(request))
+        response = not_modified(request, etag, last_modified)
+
+        if response is None:
+            response = await view(request, *args, **kwargs)
+
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified)
+
+        return response
+
+    return wrapper
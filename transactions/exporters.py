@@ -0,0 +1,61 @@
+import csv
+import json
+from .serializers import TRANSACTION_FIELDS, TRANSACTION_VALUES, transaction_row
+
+
+EXPORT_FIELDS = TRANSACTION_FIELDS
+EXPORT_VALUES = TRANSACTION_VALUES
+
+
+class Echo:
+    """
+    File-like object that hands back what is written, so csv.writer output can be streamed
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_line(writer, pk, amount, type, category, date):
+    return writer.writerow((pk, amount, type, category, date.isoformat()))
+
+
+def csv_rows(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+
+    for row in rows:
+        yield csv_line(writer, *row)
+
+
+async def acsv_rows(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+
+    async for row in rows:
+        yield csv_line(writer, *row)
+
+
+def ndjson_rows(rows):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+
+    for row in rows:
+        yield encode(transaction_row(*row)) + '\n'
+
+
+async def andjson_rows(rows):
+    encode = json.JSONEncoder(ensure_ascii=False).encode
+
+    async for row in rows:
+        yield encode(transaction_row(*row)) + '\n'
+
+
+EXPORTERS = {
+    'csv': ('text/csv', csv_rows),
+    'ndjson': ('application/x-ndjson', ndjson_rows),
+}
+# Same formats from async iterators, so an export served through ASGI streams instead of being collected first
+AEXPORTERS = {
+    'csv': ('text/csv', acsv_rows),
+    'ndjson': ('application/x-ndjson', andjson_rows),
+}
@@ -0,0 +1,23 @@
+from .categories import categories_named
+
+
+def filter_transactions(queryset, user, query_params):
+    """
+    Scope transactions to the user, apply the category, type and date range query filters and order by date
+    """
+    translations = queryset.filter(user=user)
+    category = query_params.get('category', None)
+    type = query_params.get('type', None)
+    date_from = query_params.get('date_from', None)
+    date_to = query_params.get('date_to', None)
+
+    if category:
+        translations = translations.filter(category__in=categories_named(user.pk, category).values('pk'))
+
+    if type:
+        translations = translations.filter(type=type)
+
+    if date_from and date_to:
+        translations = translations.filter(date__range=[date_from, date_to])
+
+    return translations.order_by('-date', '-pk')
@@ -0,0 +1,128 @@
+import codecs
+import csv
+import itertools
+import json
+from django.db import transaction
+from rest_framework import serializers
+from .models import Transaction
+from .balance import locked_balance, signed_amount
+from .categories import intern_categories
+from .serializers import TransactionImportRowSerializer
+from .signals import bulk_created
+
+
+IMPORT_COLUMNS = ('amount', 'type', 'category', 'date')
+
+
+def unreadable(error):
+    return serializers.ValidationError(f'File cannot be read from this row on, the rest of it was not imported: {error}')
+
+
+def iter_csv_rows(upload):
+    """
+    Yield (row number, row) pairs from a CSV upload with a header line, reading it line by line. A part of the file
+    that cannot be decoded or parsed ends it with an error in place of the row
+    """
+    reader = csv.DictReader(codecs.iterdecode(upload, 'utf-8-sig'))
+
+    try:
+        missing = set(IMPORT_COLUMNS) - set(reader.fieldnames or ())
+
+    except (UnicodeDecodeError, csv.Error) as e:
+        raise serializers.ValidationError({'file': f'File cannot be read: {e}'})
+
+    if missing:
+        raise serializers.ValidationError({'file': f"Missing columns: {', '.join(sorted(missing))}"})
+
+    try:
+        for row in reader:
+            yield reader.line_num, row
+
+    except csv.Error as e:
+        yield reader.line_num, unreadable(e)
+
+    except UnicodeDecodeError as e:
+        yield reader.line_num + 1, unreadable(e)
+
+
+def iter_ndjson_rows(upload):
+    """
+    Yield (line number, row) pairs from an NDJSON upload, one JSON object per line. Lines that are not a JSON object
+    yield an error in place of the row, a part of the file that cannot be decoded ends it with one
+    """
+    number = 0
+
+    try:
+        for number, line in enumerate(codecs.iterdecode(upload, 'utf-8-sig'), start=1):
+            if not line.strip():
+                continue
+
+            try:
+                row = json.loads(line)
+
+            except ValueError:
+                row = None
+
+            yield number, row if isinstance(row, dict) else serializers.ValidationError('Row is not a valid JSON object')
+
+    except UnicodeDecodeError as e:
+        yield number + 1, unreadable(e)
+
+
+ROW_READERS = {
+    'csv': iter_csv_rows,
+    'ndjson': iter_ndjson_rows,
+}
+
+
+def import_transactions(user, rows, chunk_size=1000, max_errors=1000):
+    """
+    Validate and insert rows chunk by chunk for the given user.
+
+    Each chunk runs in its own database transaction: the user's balance is read once under a row lock, expenses are
+    checked against a running balance, valid rows are inserted with bulk_create and the balance moves by a single
+    aggregated delta. Invalid rows are reported and skipped without aborting the rest of the file, the readers report a
+    part of the file they cannot read as a failed row after the rows read before it.
+    """
+    row_serializer = TransactionImportRowSerializer()
+    created = 0
+    failed = 0
+    errors = []
+    rows = iter(rows)
+
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+
+        if not chunk:
+            break
+
+        with transaction.atomic():
+            balance = locked_balance(user.pk)
+            valid = []
+
+            for number, row in chunk:
+                try:
+                    if isinstance(row, serializers.ValidationError):
+                        raise row
+
+                    attrs = row_serializer.run_validation(row)
+
+                    if attrs['type'] == 'expense' and attrs['amount'] > balance:
+                        raise serializers.ValidationError('Expense amount is greater than balance')
+
+                except serializers.ValidationError as e:
+                    failed += 1
+                    if len(errors) < max_errors:
+                        errors.append({'row': number, 'errors': e.detail})
+                    continue
+
+                balance += signed_amount(attrs['type'], attrs['amount'])
+                valid.append(attrs)
+
+            categories = intern_categories(user.pk, [attrs['category'] for attrs in valid])
+            instances = [Transaction(user=user, **{**attrs, 'category': categories[attrs['category']]}) for attrs in valid]
+            Transaction.objects.bulk_create(instances, batch_size=chunk_size)
+            bulk_created.send(sender=Transaction, instances=instances)
+            created += len(instances)
+
+    return created, failed, errors
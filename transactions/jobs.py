@@ -0,0 +1,113 @@
+import datetime
+import threading
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import ReportJob
+from .reports import category_wise_expense, monthly_summary
+from .serializers import SeriesSerializer
+from .series import series_response, transaction_series
+
+# A running job whose claim was not renewed for this long is assumed to have lost its worker and is claimed again
+RECLAIM_AFTER = datetime.timedelta(minutes=10)
+MAX_ATTEMPTS = 3
+
+
+def run_series(user_id, params):
+    serializer = SeriesSerializer(data=params)
+    serializer.is_valid(raise_exception=True)
+    query = serializer.series_arguments(user_id)
+    return series_response(query, transaction_series(*query))
+
+
+# Report name -> function computing it from the user id and the parameters checked with REPORT_PARAMS
+REPORTS = {
+    'monthly_summary': lambda user_id, params: monthly_summary(user_id),
+    'category_wise_expense': lambda user_id, params: category_wise_expense(user_id),
+    'series': run_series,
+}
+
+
+def claim_job(reclaim_after=RECLAIM_AFTER):
+    """
+    Mark the oldest queued job as running and return it, or None when there is nothing to run. Workers skip the rows
+    other workers have locked, so concurrent workers never claim the same job
+    """
+    now = timezone.now()
+
+    while True:
+        with transaction.atomic():
+            job = ReportJob.objects.select_for_update(skip_locked=True) \
+                                   .filter(Q(status='pending') | Q(status='running', started_at__lt=now - reclaim_after)) \
+                                   .order_by('created_at') \
+                                   .first()
+
+            if job is None:
+                return None
+
+            if job.attempts >= MAX_ATTEMPTS:
+                job.status, job.error, job.finished_at = 'failed', 'The job stopped its worker too many times', now
+                job.save(update_fields=['status', 'error', 'finished_at'])
+                continue
+
+            job.status, job.started_at, job.attempts = 'running', now, job.attempts + 1
+            job.save(update_fields=['status', 'started_at', 'attempts'])
+            return job
+
+
+def renew_claim(job, **values):
+    """
+    Update the job's row with the values if this claim still holds it, i.e. no other worker claimed the job since.
+    Return whether it did
+    """
+    return ReportJob.objects.filter(pk=job.pk, status='running', attempts=job.attempts).update(**values) == 1
+
+
+def heartbeat(job, interval, done):
+    """
+    Renew the job's claim every interval seconds until done is set, so a long report is not claimed again
+    """
+    try:
+        while not done.wait(interval):
+            try:
+                if not renew_claim(job, started_at=timezone.now()):
+                    break
+
+            except DatabaseError:
+                # Tried again next interval, the claim outlasts a few failed renewals
+                close_old_connections()
+
+    finally:
+        connection.close()
+
+
+def run_job(job, reclaim_after=RECLAIM_AFTER):
+    """
+    Compute the job's report and store its result, or the error when it fails. Return False when the job was claimed
+    again meanwhile, its result is then discarded
+    """
+    done = threading.Event()
+    beat = threading.Thread(target=heartbeat, args=(job, reclaim_after.total_seconds() / 3, done), daemon=True)
+    beat.start()
+
+    try:
+        job.result, job.status = REPORTS[job.report](job.user_id, job.params), 'done'
+
+    except Exception as e:
+        job.error, job.status = str(e), 'failed'
+
+    finally:
+        done.set()
+        beat.join()
+
+    job.finished_at = timezone.now()
+    return renew_claim(job, result=job.result, status=job.status, error=job.error, finished_at=job.finished_at)
+
+
+def run_next_job(reclaim_after=RECLAIM_AFTER):
+    job = claim_job(reclaim_after)
+
+    if job is not None:
+        run_job(job, reclaim_after)
+
+    return job
@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from transactions.rollups import diff_monthly_summary
+from transactions.partitions import detached_before
+
+
+class Command(BaseCommand):
+    help = 'Compare the monthly summary rollup against a fresh aggregate of the transactions table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only check this user id, can be repeated')
+
+    def handle(self, *args, **options):
+        # Detached months are no longer in the table, their summaries are not compared
+        since = detached_before()
+        user_ids = options['users'] or get_user_model().objects.order_by('pk').values_list('pk', flat=True).iterator()
+        mismatched_users = 0
+
+        for user_id in user_ids:
+            mismatches = diff_monthly_summary(user_id, since)
+
+            if mismatches:
+                mismatched_users += 1
+
+            for year, month, type, stored, expected in mismatches:
+                self.stdout.write(f'user {user_id} {year}-{month:02d} {type}: stored {stored[0]} ({stored[1]} rows), '
+                                  f'expected {expected[0]} ({expected[1]} rows)')
+
+        if mismatched_users:
+            raise CommandError(f'Monthly summaries differ from the transactions for {mismatched_users} users, '
+                               f'run rebuild_monthly_summary to repair them')
+
+        self.stdout.write(self.style.SUCCESS('Monthly summaries match the transactions'))
@@ -0,0 +1,27 @@
+import datetime
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from transactions.checkpoints import create_balance_checkpoints
+from transactions.partitions import detached_before
+
+
+class Command(BaseCommand):
+    help = 'Add month end balance checkpoints up to the end of the last completed month, run it after every month end'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only this user id, can be repeated')
+        parser.add_argument('--until', type=datetime.date.fromisoformat, help='Last date to checkpoint, YYYY-MM-DD')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute existing checkpoints from the transactions')
+
+    def handle(self, *args, **options):
+        until = options['until'] or timezone.localdate().replace(day=1) - datetime.timedelta(days=1)
+        # Detached months are no longer in the table, a rebuild keeps their checkpoints
+        since = detached_before()
+        user_ids = options['users'] or get_user_model().objects.order_by('pk').values_list('pk', flat=True).iterator()
+        created = 0
+
+        for user_id in user_ids:
+            created += create_balance_checkpoints(user_id, until, rebuild=options['rebuild'], since=since)
+
+        self.stdout.write(self.style.SUCCESS(f'Created {created} balance checkpoints up to {until}'))
@@ -0,0 +1,33 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from transactions.partitions import add_months, detach_partitions, ensure_partitions, is_partitioned, partitions
+
+
+class Command(BaseCommand):
+    help = 'Create the monthly transaction partitions ahead of time and detach old ones, run it daily or at least monthly'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=3, help='Months to create past the current one')
+        parser.add_argument('--from', type=datetime.date.fromisoformat, dest='start',
+                            help='Also create partitions from this date on, YYYY-MM-DD, moving their rows out of the default partition')
+        parser.add_argument('--detach-before', type=datetime.date.fromisoformat,
+                            help='Detach the partitions that end on or before this date, YYYY-MM-DD. Their transactions '
+                                 'disappear from the API but stay counted in balances, checkpoints and monthly summaries')
+        parser.add_argument('--archive-schema', help='Move the detached partitions to this schema')
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError('The transaction table is not partitioned, this needs PostgreSQL with migration 0008 applied')
+
+        today = timezone.localdate()
+        created = ensure_partitions(options['start'] or today, add_months(today, options['ahead']))
+        self.stdout.write(f'Created {len(created)} partitions' + (f": {', '.join(f'{month:%Y-%m}' for month in created)}" if created else ''))
+
+        if options['detach_before']:
+            detached = detach_partitions(options['detach_before'], options['archive_schema'])
+            self.stdout.write(f'Detached {len(detached)} partitions' + (f": {', '.join(detached)}" if detached else ''))
+
+        attached = partitions()
+        if attached:
+            self.stdout.write(self.style.SUCCESS(f'{len(attached)} monthly partitions cover {attached[0][1]} to {attached[-1][2]}'))
@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from transactions.rollups import rebuild_monthly_summary
+from transactions.partitions import detached_before
+
+
+class Command(BaseCommand):
+    help = 'Backfill the monthly summary rollup from the transactions table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help='Only rebuild this user id, can be repeated')
+
+    def handle(self, *args, **options):
+        # Detached months are no longer in the table, their summaries are kept
+        since = detached_before()
+        user_ids = options['users'] or get_user_model().objects.order_by('pk').values_list('pk', flat=True).iterator()
+        rebuilt = 0
+
+        for user_id in user_ids:
+            rebuild_monthly_summary(user_id, since)
+            rebuilt += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt monthly summaries for {rebuilt} users'))
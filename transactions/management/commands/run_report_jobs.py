@@ -0,0 +1,78 @@
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from transactions.jobs import RECLAIM_AFTER, claim_job, run_job
+
+# Longest wait between attempts of a thread whose iterations keep failing
+MAX_BACKOFF = 60
+
+
+class Command(BaseCommand):
+    help = 'Run queued report jobs on a pool of worker threads, several workers can run side by side against the same database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Jobs run at once by this worker, each thread uses its own database connection')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds an idle thread waits before looking for jobs again')
+        parser.add_argument('--reclaim-after', type=int, default=int(RECLAIM_AFTER.total_seconds()),
+                            help='Seconds after which a running job is assumed to have lost its worker and is run again')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty instead of polling for new jobs')
+
+    def work(self, stop, options):
+        reclaim_after = datetime.timedelta(seconds=options['reclaim_after'])
+        ran = failures = 0
+
+        try:
+            while not stop.is_set():
+                try:
+                    job = claim_job(reclaim_after)
+
+                    if job is not None:
+                        ran += 1
+
+                        if run_job(job, reclaim_after):
+                            self.stdout.write(f'Job {job.pk} {job.report} {job.status}' + (f': {job.error}' if job.error else ''))
+
+                        else:
+                            self.stdout.write(f'Job {job.pk} {job.report} was claimed again by another worker, its result is discarded')
+
+                    elif options['once']:
+                        break
+
+                    else:
+                        stop.wait(options['poll_interval'])
+
+                    failures = 0
+
+                except Exception as e:
+                    # The database went away or the job could not be stored, the thread carries on with a fresh connection
+                    failures += 1
+                    self.stderr.write(f'Report job worker error: {e}')
+                    close_old_connections()
+                    stop.wait(min(options['poll_interval'] * 2 ** failures, MAX_BACKOFF))
+
+        finally:
+            connection.close()
+
+        return ran
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            threads = [pool.submit(self.work, stop, options) for _ in range(options['threads'])]
+
+            try:
+                ran = sum(thread.result() for thread in threads)
+
+            except KeyboardInterrupt:
+                # Running jobs finish, their threads then stop
+                stop.set()
+                ran = sum(thread.result() for thread in threads)
+
+            finally:
+                # Leaving on any other exception, the pool waits for threads that must stop polling first
+                stop.set()
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {ran} report jobs'))
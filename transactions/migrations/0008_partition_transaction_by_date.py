@@ -0,0 +1,80 @@
+import datetime
+from django.db import migrations
+from django.utils import timezone
+
+TABLE = 'transactions_transaction'
+# Months created past the current one, manage_partitions keeps extending this
+MONTHS_AHEAD = 3
+
+
+def add_months(date, months):
+    index = date.year * 12 + date.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def rebuild_table(apps, schema_editor, partitioned):
+    """
+    Copy the transaction table into a new one, partitioned by month of date or not, and swap it in under the same name.
+    The primary key of a partitioned table has to include date, ids stay unique through the shared sequence
+    """
+    Transaction = apps.get_model('transactions', 'Transaction')
+    user_table = Transaction._meta.get_field('user').related_model._meta.db_table
+    execute = schema_editor.execute
+    new = TABLE + '_new'
+
+    if partitioned:
+        execute(f'CREATE TABLE {new} (LIKE {TABLE}) PARTITION BY RANGE (date)')
+        execute(f'CREATE SEQUENCE {new}_id_seq OWNED BY {new}.id')
+        execute(f"ALTER TABLE {new} ALTER COLUMN id SET DEFAULT nextval('{new}_id_seq')")
+
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(f'SELECT min(date), max(date) FROM {TABLE}')
+            first, last = cursor.fetchone()
+
+        # Partitions run through MONTHS_AHEAD months past the day the migration runs, later months start in the
+        # default partition until manage_partitions creates them
+        today = timezone.localdate()
+        month, until = (first or today).replace(day=1), add_months(max(last or today, today), MONTHS_AHEAD)
+        while month <= until:
+            execute(f"CREATE TABLE {TABLE}_p{month.year}_{month.month:02d} PARTITION OF {new} "
+                    f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')")
+            month = add_months(month, 1)
+        execute(f'CREATE TABLE {TABLE}_default PARTITION OF {new} DEFAULT')
+
+    else:
+        execute(f'CREATE TABLE {new} (LIKE {TABLE})')
+        execute(f'ALTER TABLE {new} ALTER COLUMN id ADD GENERATED BY DEFAULT AS IDENTITY')
+
+    execute(f'INSERT INTO {new} SELECT * FROM {TABLE}')
+    execute(f"SELECT setval(pg_get_serial_sequence('{new}', 'id'), coalesce(max(id), 0) + 1, false) FROM {new}")
+    execute(f'DROP TABLE {TABLE}')
+    execute(f'ALTER TABLE {new} RENAME TO {TABLE}')
+    execute(f'ALTER SEQUENCE {new}_id_seq RENAME TO {TABLE}_id_seq')
+    execute(f"ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_pkey PRIMARY KEY {'(id, date)' if partitioned else '(id)'}")
+    execute(f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_user_id_fk FOREIGN KEY (user_id) '
+            f'REFERENCES {user_table} (id) DEFERRABLE INITIALLY DEFERRED')
+
+    for index in Transaction._meta.indexes:
+        schema_editor.add_index(Transaction, index)
+
+
+def partition_transactions(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        rebuild_table(apps, schema_editor, partitioned=True)
+
+
+def unpartition_transactions(apps, schema_editor):
+    # Partitions detached by manage_partitions are left alone
+    if schema_editor.connection.vendor == 'postgresql':
+        rebuild_table(apps, schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_balancecheckpoint_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_transactions, unpartition_transactions),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+def intern_categories(apps, schema_editor):
+    """
+    Create one category per user and name ignoring case, spelled like its first name in sort order, and point the
+    transactions at it with one UPDATE per distinct stored name
+    """
+    Category = apps.get_model('transactions', 'Category')
+    Transaction = apps.get_model('transactions', 'Transaction')
+    category_ids, current_user_id = {}, None
+
+    pairs = Transaction.objects.values_list('user_id', 'category').distinct().order_by('user_id', 'category')
+    for user_id, name in pairs.iterator():
+        if user_id != current_user_id:
+            category_ids, current_user_id = {}, user_id
+
+        key = name.lower()
+        if key not in category_ids:
+            category_ids[key] = Category.objects.create(user_id=user_id, name=name).pk
+
+        Transaction.objects.filter(user_id=user_id, category=name).update(category_ref_id=category_ids[key])
+
+
+def restore_category_names(apps, schema_editor):
+    Category = apps.get_model('transactions', 'Category')
+    Transaction = apps.get_model('transactions', 'Transaction')
+
+    for pk, user_id, name in Category.objects.values_list('pk', 'user_id', 'name').iterator():
+        Transaction.objects.filter(user_id=user_id, category_ref_id=pk).update(category=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0009_category_transaction_category_ref'),
+    ]
+
+    operations = [
+        migrations.RunPython(intern_categories, restore_category_names),
+    ]
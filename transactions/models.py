@@ -1,7 +1,29 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Lower
+from rest_framework.utils.encoders import JSONEncoder
 
 
 # Create your models here.
+class Category(models.Model):
+    """
+    Model for a user's transaction category, names are unique per user ignoring case
+    """
+    # A 4 byte key keeps the transaction rows and their category indexes narrow
+    id = models.AutoField(primary_key=True)
+    # The unique constraint below leads with user, so the single column FK index is not needed
+    user = models.ForeignKey('authentication.User', related_name='categories', on_delete=models.CASCADE, db_index=False)
+    name = models.CharField(max_length=100)
+
+    class Meta:
+        verbose_name_plural = 'categories'
+        constraints = [
+            models.UniqueConstraint('user', Lower('name'), name='category_user_name_unique'),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
 class Transaction(models.Model):
     """
     Model for transactions
@@ -11,11 +33,128 @@ class Transaction(models.Model):
         ('expense', 'Expense'),
     )
 
-    user = models.ForeignKey('authentication.User', related_name='translations', on_delete=models.CASCADE)
+    # The composite indexes below all lead with user, so the single column FK index is not needed
+    user = models.ForeignKey('authentication.User', related_name='translations', on_delete=models.CASCADE, db_index=False)
     amount = models.DecimalField(max_digits=20, decimal_places=2)
     type = models.CharField(max_length=10, choices=TRANSACTION_TYPES)
-    category = models.CharField(max_length=100)
+    # Transactions reference their interned category by id instead of repeating its name on every row
+    category = models.ForeignKey(Category, related_name='transactions', on_delete=models.CASCADE, db_index=False)
     date = models.DateField()
 
+    class Meta:
+        indexes = [
+            # List view: filtered by user, optionally by date range, ordered by (-date, -pk) which is also the cursor key
+            models.Index(fields=['user', '-date', '-id'], name='transaction_user_date_id_idx'),
+            # List view with a category filter
+            models.Index(fields=['user', 'category', '-date'], name='transaction_user_cat_date_idx'),
+            # List view with a type filter and the monthly summary (grouped by month and type), covering amount
+            models.Index(fields=['user', 'type', '-date'], include=['amount'], name='transaction_user_type_date_idx'),
+            # Category-wise expense report, covering amount
+            models.Index(fields=['user', 'type', 'category'], include=['amount'], name='transaction_user_type_cat_idx'),
+        ]
+
     def __str__(self):
         return f"{self.type} - {self.amount}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Remember the loaded values, save and delete replace them with the stored row read under a lock
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def lock_stored_values(self, using):
+        # The signals compute deltas against the stored row, locked so concurrent writers of the row go one at a time
+        return type(self)._base_manager.db_manager(using).select_for_update() \
+                                      .values('user_id', 'amount', 'type', 'date').filter(pk=self.pk).first()
+
+    def save(self, *args, **kwargs):
+        # Run the row write and the post_save bookkeeping in one database transaction
+        with transaction.atomic(using=kwargs.get('using')):
+            if self.pk is not None:
+                self._loaded_values = self.lock_stored_values(kwargs.get('using'))
+
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            self._loaded_values = self.lock_stored_values(kwargs.get('using'))
+
+            if self._loaded_values is None:
+                # Already deleted by a concurrent request, its changes were applied then
+                return 0, {}
+
+            return super().delete(*args, **kwargs)
+
+
+class MonthlySummary(models.Model):
+    """
+    Model for per user monthly totals by transaction type, maintained by the transaction write paths
+    """
+    user = models.ForeignKey('authentication.User', related_name='monthly_summaries', on_delete=models.CASCADE, db_index=False)
+    year = models.PositiveSmallIntegerField()
+    month = models.PositiveSmallIntegerField()
+    type = models.CharField(max_length=10, choices=Transaction.TRANSACTION_TYPES)
+    total_amount = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    transaction_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'year', 'month', 'type'], name='monthly_summary_unique_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.year}-{self.month:02d} {self.type} - {self.total_amount}"
+
+
+class BalanceCheckpoint(models.Model):
+    """
+    Model for a user's running balance at the end of a month, including every transaction dated on or before it
+    """
+    user = models.ForeignKey('authentication.User', related_name='balance_checkpoints', on_delete=models.CASCADE, db_index=False)
+    date = models.DateField()
+    balance = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='balance_checkpoint_unique_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.date} - {self.balance}"
+
+
+class ReportJob(models.Model):
+    """
+    Model for a report requested through the job queue, run by the run_report_jobs worker which stores its result
+    """
+    STATUSES = (
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+
+    user = models.ForeignKey('authentication.User', related_name='report_jobs', on_delete=models.CASCADE, db_index=False)
+    report = models.CharField(max_length=30)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default='pending')
+    # Encoded like the inline report responses, so both return the same JSON
+    result = models.JSONField(null=True, encoder=JSONEncoder)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Renewed by the worker while the job runs, a running job not renewed for RECLAIM_AFTER is claimed again
+    started_at = models.DateTimeField(null=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        indexes = [
+            # Job list and lookups of the requesting user, newest first
+            models.Index(fields=['user', '-created_at'], name='report_job_user_created_idx'),
+            # Workers claim the oldest pending job, the partial index only holds the jobs still queued or running
+            models.Index(fields=['status', 'created_at'], condition=models.Q(status__in=['pending', 'running']), name='report_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.report} - {self.status}"
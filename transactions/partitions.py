@@ -0,0 +1,122 @@
+import datetime
+import re
+from django.db import connection, transaction
+from .checkpoints import create_balance_checkpoints
+from .models import Transaction
+
+TABLE = Transaction._meta.db_table
+DEFAULT_PARTITION = TABLE + '_default'
+
+BOUND_PATTERN = re.compile(r"FROM \('(?P<lower>[\d-]+)'\) TO \('(?P<upper>[\d-]+)'\)")
+NAME_PATTERN = re.compile(rf'^{TABLE}_p(?P<year>\d{{4}})_(?P<month>\d{{2}})$')
+
+
+def add_months(date, months):
+    index = date.year * 12 + date.month - 1 + months
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_p{month.year}_{month.month:02d}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)', [TABLE])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def partitions():
+    """
+    Return [(name, lower, upper)] of the monthly partitions attached to the transaction table, oldest first
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) FROM pg_inherits '
+                       'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+                       'WHERE pg_inherits.inhparent = to_regclass(%s)', [TABLE])
+        rows = cursor.fetchall()
+
+    bounds = []
+    for name, bound in rows:
+        match = BOUND_PATTERN.search(bound)
+        if match:
+            bounds.append((name, datetime.date.fromisoformat(match['lower']), datetime.date.fromisoformat(match['upper'])))
+    return sorted(bounds, key=lambda partition: partition[1])
+
+
+def create_partition(month):
+    """
+    Attach the partition for the month, moving its rows out of the default partition first so the attach succeeds
+    """
+    lower, upper = month.replace(day=1), add_months(month, 1)
+    name = connection.ops.quote_name(partition_name(lower))
+    table = connection.ops.quote_name(TABLE)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(f'WITH moved AS (DELETE FROM {connection.ops.quote_name(DEFAULT_PARTITION)} '
+                       f'WHERE date >= %s AND date < %s RETURNING *) INSERT INTO {name} SELECT * FROM moved', [lower, upper])
+        cursor.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM ('{lower}') TO ('{upper}')")
+
+
+def ensure_partitions(start, end):
+    """
+    Create the missing monthly partitions from start's month through end's month, return the months created
+    """
+    existing = {lower for _, lower, _ in partitions()}
+    month, created = start.replace(day=1), []
+
+    while month <= end:
+        if month not in existing:
+            create_partition(month)
+            created.append(month)
+        month = add_months(month, 1)
+    return created
+
+
+def detached_before():
+    """
+    Return the first day after the partitions detached by detach_partitions, in any schema, or None when none were.
+    Transactions dated before it may no longer be in the table
+    """
+    if not is_partitioned():
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relname FROM pg_class WHERE relkind = 'r' AND NOT relispartition AND relname LIKE %s", [TABLE + '\\_p%'])
+        matches = [NAME_PATTERN.match(name) for name, in cursor.fetchall()]
+
+    months = [datetime.date(int(match['year']), int(match['month']), 1) for match in matches if match]
+    return add_months(max(months), 1) if months else None
+
+
+def detach_partitions(before, archive_schema=None):
+    """
+    Detach every monthly partition that ends on or before the given date and optionally move it to an archive schema,
+    return the detached table names. Balance checkpoints are completed through the last detached month first, so the
+    detached transactions stay counted in balances
+    """
+    table = connection.ops.quote_name(TABLE)
+    detached = []
+    to_detach = [(name, upper) for name, _, upper in partitions() if upper <= before]
+
+    if to_detach:
+        end = max(upper for _, upper in to_detach)
+        user_ids = Transaction.objects.filter(date__lt=end).order_by().values_list('user_id', flat=True).distinct()
+
+        for user_id in user_ids:
+            create_balance_checkpoints(user_id, end - datetime.timedelta(days=1))
+
+    for name, _ in to_detach:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {connection.ops.quote_name(name)}')
+
+            if archive_schema:
+                cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {connection.ops.quote_name(archive_schema)}')
+                cursor.execute(f'ALTER TABLE {connection.ops.quote_name(name)} SET SCHEMA {connection.ops.quote_name(archive_schema)}')
+        detached.append(name)
+    return detached
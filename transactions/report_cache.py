@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def version_key(user_id):
+    return f'reports:version:{user_id}'
+
+
+def get_version(user_id):
+    key = version_key(user_id)
+    version = cache.get(key)
+
+    if version is None:
+        # Start from the clock rather than 1, an evicted version must never be reissued for entries that outlived it
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+
+    return version
+
+
+async def aget_version(user_id):
+    key = version_key(user_id)
+    version = await cache.aget(key)
+
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+
+    return version
+
+
+def bump_versions(user_ids):
+    """
+    Invalidate the cached reports of the given users, called once their writes are committed
+    """
+    for user_id in user_ids:
+        try:
+            cache.incr(version_key(user_id))
+
+        except ValueError:
+            cache.set(version_key(user_id), time.time_ns(), timeout=None)
+
+
+def record(report, outcome):
+    with _stats_lock:
+        _stats[report, outcome] += 1
+
+
+def report_cache_stats():
+    """
+    Return {report: {'hits': n, 'misses': n}} counted by this process
+    """
+    with _stats_lock:
+        stats = {}
+
+        for (report, outcome), count in _stats.items():
+            stats.setdefault(report, {'hits': 0, 'misses': 0})[outcome] = count
+
+        return stats
+
+
+def report_cache_metrics():
+    """
+    Report cache hits and misses as a metrics family for cash_management.metrics
+    """
+    samples = [
+        ('report_cache_requests_total', {'report': report, 'outcome': outcome}, count)
+        for report, counts in sorted(report_cache_stats().items()) for outcome, count in sorted(counts.items())
+    ]
+    return [('report_cache_requests_total', 'counter', 'Report cache lookups by report and outcome', samples)]
+
+
+def cached_report(report, user_id, build):
+    """
+    Return the user's report from the cache, building and storing it on a miss
+    """
+    key = f'reports:{report}:{user_id}:{get_version(user_id)}'
+    data = cache.get(key)
+
+    if data is not None:
+        record(report, 'hits')
+        return data
+
+    record(report, 'misses')
+    data = build()
+    cache.set(key, data, timeout=settings.REPORT_CACHE_TIMEOUT)
+    return data
+
+
+async def acached_report(report, user_id, build):
+    """
+    Async counterpart of cached_report, build is a coroutine function
+    """
+    key = f'reports:{report}:{user_id}:{await aget_version(user_id)}'
+    data = await cache.aget(key)
+
+    if data is not None:
+        record(report, 'hits')
+        return data
+
+    record(report, 'misses')
+    data = await build()
+    await cache.aset(key, data, timeout=settings.REPORT_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,60 @@
+from django.db.models import Sum
+from django.db.models.functions import Lower
+from .models import Category, MonthlySummary, Transaction
+from .report_cache import acached_report, cached_report
+
+
+def monthly_summary_rows(user_id):
+    return MonthlySummary.objects.filter(user_id=user_id, transaction_count__gt=0) \
+                                 .order_by('year', 'month', 'type') \
+                                 .values_list('year', 'month', 'type', 'total_amount')
+
+
+def format_monthly_summary(rows):
+    return [
+        {'date__year': year, 'date__month': month, 'type': type, 'total_amount': total_amount}
+        for year, month, type, total_amount in rows
+    ]
+
+
+def category_expense_totals(user_id):
+    # Grouped by the small category key, the names of the few resulting categories are looked up separately
+    return Transaction.objects.filter(user_id=user_id, type='expense') \
+                              .values_list('category_id') \
+                              .annotate(total_expense=Sum('amount')) \
+                              .order_by()
+
+
+def category_names(user_id):
+    # In report order, through the index on the lowercased names
+    return Category.objects.filter(user_id=user_id).order_by(Lower('name')).values_list('pk', 'name')
+
+
+def format_category_wise_expense(totals, names):
+    totals = dict(totals)
+    return [{'category': name, 'total_expense': totals[category_id]} for category_id, name in names if category_id in totals]
+
+
+def monthly_summary(user_id):
+    return format_monthly_summary(monthly_summary_rows(user_id))
+
+
+async def amonthly_summary(user_id):
+    return format_monthly_summary([row async for row in monthly_summary_rows(user_id)])
+
+
+def category_wise_expense(user_id):
+    return format_category_wise_expense(category_expense_totals(user_id), category_names(user_id))
+
+
+async def acategory_wise_expense(user_id):
+    totals = [row async for row in category_expense_totals(user_id)]
+    return format_category_wise_expense(totals, [row async for row in category_names(user_id)])
+
+
+def cached_category_wise_expense(user_id):
+    return cached_report('category-wise-expense', user_id, lambda: category_wise_expense(user_id))
+
+
+async def acached_category_wise_expense(user_id):
+    return await acached_report('category-wise-expense', user_id, lambda: acategory_wise_expense(user_id))
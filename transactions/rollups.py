@@ -0,0 +1,89 @@
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from .models import MonthlySummary, Transaction
+
+
+def apply_monthly_deltas(deltas):
+    """
+    Apply {(user_id, year, month, type): (amount, count)} deltas to the monthly summaries in place
+    """
+    for (user_id, year, month, type), (amount, count) in deltas.items():
+        if not amount and not count:
+            continue
+
+        key = {'user_id': user_id, 'year': year, 'month': month, 'type': type}
+        updated = MonthlySummary.objects.filter(**key).update(total_amount=F('total_amount') + amount,
+                                                               transaction_count=F('transaction_count') + count)
+
+        if not updated:
+            try:
+                with transaction.atomic():
+                    MonthlySummary.objects.create(total_amount=amount, transaction_count=count, **key)
+
+            except IntegrityError:
+                # A concurrent writer created the row first
+                MonthlySummary.objects.filter(**key).update(total_amount=F('total_amount') + amount,
+                                                            transaction_count=F('transaction_count') + count)
+
+
+def months_since(since):
+    return Q(year__gt=since.year) | Q(year=since.year, month__gte=since.month)
+
+
+def aggregate_monthly_summary(user_id, since=None):
+    """
+    Return {(year, month, type): (total_amount, count)} computed from the user's transactions, from since's month on
+    when given
+    """
+    transactions = Transaction.objects.filter(user_id=user_id)
+
+    if since is not None:
+        transactions = transactions.filter(date__gte=since)
+
+    rows = transactions.values_list('date__year', 'date__month', 'type') \
+                              .annotate(total_amount=Sum('amount'), count=Count('pk')) \
+                              .order_by()
+    return {(year, month, type): (total_amount, count) for year, month, type, total_amount, count in rows}
+
+
+def stored_monthly_summary(user_id, since=None):
+    summaries = MonthlySummary.objects.filter(user_id=user_id, transaction_count__gt=0)
+
+    if since is not None:
+        summaries = summaries.filter(months_since(since))
+
+    rows = summaries.values_list('year', 'month', 'type', 'total_amount', 'transaction_count')
+    return {(year, month, type): (total_amount, count) for year, month, type, total_amount, count in rows}
+
+
+def rebuild_monthly_summary(user_id, since=None):
+    """
+    Replace the user's monthly summaries with a fresh aggregate of their transactions. With since, the first day
+    after detached partitions, the summaries of the detached months are kept
+    """
+    with transaction.atomic():
+        # Writes update the user's balance in the same transaction as the summaries, the row lock keeps them out
+        get_user_model().objects.select_for_update().filter(pk=user_id).exists()
+        summaries = MonthlySummary.objects.filter(user_id=user_id)
+        (summaries if since is None else summaries.filter(months_since(since))).delete()
+        MonthlySummary.objects.bulk_create([
+            MonthlySummary(user_id=user_id, year=year, month=month, type=type, total_amount=total_amount, transaction_count=count)
+            for (year, month, type), (total_amount, count) in aggregate_monthly_summary(user_id, since).items()
+        ])
+
+
+def diff_monthly_summary(user_id, since=None):
+    """
+    Return the (year, month, type, stored, expected) entries where the summaries disagree with a fresh aggregate,
+    from since's month on when given
+    """
+    stored = stored_monthly_summary(user_id, since)
+    expected = aggregate_monthly_summary(user_id, since)
+    missing = (Decimal(0), 0)
+    return [
+        (*key, stored.get(key, missing), expected.get(key, missing))
+        for key in sorted(stored.keys() | expected.keys())
+        if stored.get(key, missing) != expected.get(key, missing)
+    ]
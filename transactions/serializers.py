@@ -1,20 +1,239 @@
+from decimal import Decimal
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Transaction
+from rest_framework.settings import api_settings
+from .models import Category, ReportJob, Transaction
+from .balance import locked_balance, signed_amount
+from .categories import intern_categories, intern_category
+from .series import GRANULARITIES, MAX_BUCKETS, bucket_count, default_start
+from .signals import bulk_created
 from authentication.serializers import UserSerializer
 
 
+class CategoryNameField(serializers.CharField):
+    """
+    Field for a transaction's category by name, serializers intern the name into the user's category when saving
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(max_length=Category._meta.get_field('name').max_length, **kwargs)
+
+    def to_representation(self, value):
+        return value.name
+
+
+class TransactionListSerializer(serializers.ListSerializer):
+    """
+    Serializer for a batch of new transactions, validate and save it inside one database transaction.
+
+    The balance is read once under a row lock and expenses are checked against a running balance, so an income earlier
+    in the batch funds a later expense. The batch is inserted with one bulk_create and moves the balance by one
+    aggregated delta.
+    """
+
+    def to_internal_value(self, data):
+        attrs_list = super().to_internal_value(data)
+        balance = locked_balance(self.context['request'].user.pk)
+        errors = []
+
+        for attrs in attrs_list:
+            if attrs['type'] == 'expense' and attrs['amount'] > balance:
+                errors.append({api_settings.NON_FIELD_ERRORS_KEY: ['Expense amount is greater than balance']})
+                continue
+
+            balance += signed_amount(attrs['type'], attrs['amount'])
+            errors.append({})
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+        return attrs_list
+
+    def create(self, validated_data):
+        categories = intern_categories(validated_data[0]['user'].pk, [attrs['category'] for attrs in validated_data])
+        instances = Transaction.objects.bulk_create([Transaction(**{**attrs, 'category': categories[attrs['category']]}) for attrs in validated_data])
+        bulk_created.send(sender=Transaction, instances=instances)
+        return instances
+
+
 class TransactionSerializer(serializers.ModelSerializer):
     """
     Serializer for Transaction model
     """
+    category = CategoryNameField()
 
     def validate(self, attrs):
-        if attrs['type'] == 'expense' and attrs['amount'] > self.context['request'].user.balance:
+        if self.parent is not None:
+            # A batch checks its running balance in TransactionListSerializer
+            return attrs
+
+        type = attrs.get('type', getattr(self.instance, 'type', None))
+        amount = attrs.get('amount', getattr(self.instance, 'amount', None))
+        # Locked until the view's database transaction ends, so concurrent writes of the user are checked one at a time
+        balance = locked_balance(self.context['request'].user.pk)
+
+        if self.instance is not None:
+            # The stored balance already includes this transaction, check the edit against the balance without the
+            # stored row, which a concurrent edit may have changed since the instance was loaded
+            stored = self.instance.lock_stored_values(self.instance._state.db)
+
+            if stored is None:
+                raise serializers.ValidationError('Transaction was deleted')
+
+            balance -= signed_amount(stored['type'], stored['amount'])
+
+        if type == 'expense' and amount > balance:
             raise serializers.ValidationError('Expense amount is greater than balance')
-        
+
         return attrs
 
+    def create(self, validated_data):
+        validated_data['category'] = intern_category(validated_data['user'].pk, validated_data['category'])
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        if 'category' in validated_data:
+            validated_data['category'] = intern_category(instance.user_id, validated_data['category'])
+
+        return super().update(instance, validated_data)
+
     class Meta:
         model = Transaction
         fields = ('pk', 'amount', 'type', 'category', 'date')
         read_only_fields = ('pk', )
+        list_serializer_class = TransactionListSerializer
+
+
+TRANSACTION_FIELDS = TransactionSerializer.Meta.fields
+# values_list lookups of TRANSACTION_FIELDS, the category name is joined from the category table
+TRANSACTION_VALUES = tuple('category__name' if field == 'category' else field for field in TRANSACTION_FIELDS)
+AMOUNT_QUANTUM = Decimal(1).scaleb(-Transaction._meta.get_field('amount').decimal_places)
+
+
+def transaction_row(pk, amount, type, category, date):
+    """
+    Format a values_list row of TRANSACTION_VALUES exactly as TransactionSerializer represents the transaction
+    """
+    return {'pk': pk, 'amount': f'{amount.quantize(AMOUNT_QUANTUM):f}', 'type': type, 'category': category, 'date': date.isoformat()}
+
+
+def transaction_rows(rows):
+    return [transaction_row(*row) for row in rows]
+
+
+class TransactionImportRowSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a single imported transaction row, the balance is checked by the importer as a running total
+    """
+    category = CategoryNameField()
+
+    class Meta:
+        model = Transaction
+        fields = ('amount', 'type', 'category', 'date')
+
+
+class TransactionImportSerializer(serializers.Serializer):
+    """
+    Serializer for transaction import uploads
+    """
+    file = serializers.FileField()
+    file_format = serializers.ChoiceField(choices=('csv', 'ndjson'), required=False)
+
+    def validate(self, attrs):
+        if 'file_format' not in attrs:
+            extension = attrs['file'].name.rsplit('.', 1)[-1].lower()
+            attrs['file_format'] = {'csv': 'csv', 'ndjson': 'ndjson', 'jsonl': 'ndjson'}.get(extension)
+
+            if attrs['file_format'] is None:
+                raise serializers.ValidationError({'file_format': 'Could not detect the file format, pass csv or ndjson'})
+
+        return attrs
+
+
+class BalanceSerializer(serializers.Serializer):
+    """
+    Serializer for the balance as of a date, as_of defaults to today
+    """
+    as_of = serializers.DateField(required=False)
+    balance = serializers.DecimalField(max_digits=20, decimal_places=2, read_only=True)
+
+
+class SeriesSerializer(serializers.Serializer):
+    """
+    Serializer for the transaction series query, from defaults to a granularity dependent window ending at to
+    """
+    granularity = serializers.ChoiceField(choices=GRANULARITIES, default='month')
+    type = serializers.ChoiceField(choices=Transaction.TRANSACTION_TYPES, required=False)
+    category = serializers.CharField(required=False)
+
+    def get_fields(self):
+        # from is a keyword, so the date range fields are added here
+        fields = super().get_fields()
+        fields['from'] = serializers.DateField(required=False)
+        fields['to'] = serializers.DateField(required=False)
+        return fields
+
+    def validate(self, attrs):
+        attrs.setdefault('to', timezone.localdate())
+
+        if 'from' not in attrs:
+            attrs['from'] = default_start(attrs['to'], attrs['granularity'])
+
+        if attrs['from'] > attrs['to']:
+            raise serializers.ValidationError({'from': 'Must not be after to'})
+
+        if bucket_count(attrs['from'], attrs['to'], attrs['granularity']) > MAX_BUCKETS:
+            raise serializers.ValidationError({'granularity': f'The range covers more than {MAX_BUCKETS} buckets, use a coarser granularity'})
+
+        return attrs
+
+    def series_arguments(self, user_id):
+        query = self.validated_data
+        return user_id, query['granularity'], query['from'], query['to'], query.get('type'), query.get('category')
+
+
+# Reports that can be queued as jobs -> serializer of their parameters, None for reports without parameters
+REPORT_PARAMS = {
+    'monthly_summary': None,
+    'category_wise_expense': None,
+    'series': SeriesSerializer,
+}
+
+
+class ReportJobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for queued report jobs, params are checked against the report's own query serializer when queued
+    """
+    report = serializers.ChoiceField(choices=list(REPORT_PARAMS))
+    params = serializers.DictField(required=False, default=dict)
+
+    class Meta:
+        model = ReportJob
+        fields = ('pk', 'report', 'params', 'status', 'error', 'attempts', 'created_at', 'started_at', 'finished_at')
+        read_only_fields = ('pk', 'status', 'error', 'attempts', 'created_at', 'started_at', 'finished_at')
+
+    def validate(self, attrs):
+        params_serializer = REPORT_PARAMS[attrs['report']]
+
+        if params_serializer is None:
+            attrs['params'] = {}
+
+        else:
+            # Stored with its defaults filled in, so a job covers the dates of the day it was queued
+            params_serializer = params_serializer(data=attrs['params'])
+
+            if not params_serializer.is_valid():
+                raise serializers.ValidationError({'params': params_serializer.errors})
+
+            attrs['params'] = dict(params_serializer.data)
+
+        return attrs
+
+
+class ReportJobResultSerializer(ReportJobSerializer):
+    """
+    Serializer for a report job with its result
+    """
+
+    class Meta(ReportJobSerializer.Meta):
+        fields = ReportJobSerializer.Meta.fields + ('result', )
@@ -0,0 +1,122 @@
+import datetime
+from decimal import Decimal
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Coalesce, Trunc
+from .categories import categories_named
+from .models import Transaction
+from .partitions import add_months
+
+GRANULARITIES = ('day', 'week', 'month', 'quarter', 'year')
+# Buckets covered when the request has no start date
+DEFAULT_BUCKETS = {'day': 31, 'week': 13, 'month': 12, 'quarter': 8, 'year': 5}
+MAX_BUCKETS = 1000
+
+
+def bucket_start(date, granularity):
+    """
+    Return the first day of the bucket holding the date, weeks start on Monday like date_trunc
+    """
+    if granularity == 'day':
+        return date
+    if granularity == 'week':
+        return date - datetime.timedelta(days=date.weekday())
+    if granularity == 'month':
+        return date.replace(day=1)
+    if granularity == 'quarter':
+        return date.replace(month=(date.month - 1) // 3 * 3 + 1, day=1)
+    return date.replace(month=1, day=1)
+
+
+def shift_bucket(start, granularity, buckets=1):
+    """
+    Return the start of the bucket that many buckets away, None when it falls outside the dates Python can represent
+    """
+    try:
+        if granularity == 'day':
+            return start + datetime.timedelta(days=buckets)
+        if granularity == 'week':
+            return start + datetime.timedelta(weeks=buckets)
+        return add_months(start, buckets * {'month': 1, 'quarter': 3, 'year': 12}[granularity])
+
+    except (OverflowError, ValueError):
+        return None
+
+
+def bucket_starts(start, end, granularity):
+    bucket, starts = bucket_start(start, granularity), []
+
+    while bucket is not None and bucket <= end:
+        starts.append(bucket)
+        bucket = shift_bucket(bucket, granularity)
+
+    return starts
+
+
+def bucket_count(start, end, granularity):
+    """
+    Return the number of buckets between start and end without listing them
+    """
+    first, last = bucket_start(start, granularity), bucket_start(end, granularity)
+
+    if granularity in ('day', 'week'):
+        return (last - first).days // (7 if granularity == 'week' else 1) + 1
+
+    months = (last.year - first.year) * 12 + last.month - first.month
+    return months // {'month': 1, 'quarter': 3, 'year': 12}[granularity] + 1
+
+
+def default_start(end, granularity):
+    # The window is cut short at the first representable date
+    return shift_bucket(bucket_start(end, granularity), granularity, 1 - DEFAULT_BUCKETS[granularity]) or datetime.date.min
+
+
+def series_rows(user_id, granularity, start, end, type=None, category=None):
+    """
+    Return (bucket, income, expense, count) rows of the user's transactions between start and end, one per non-empty
+    bucket, from a single date_trunc aggregate
+    """
+    zero = Decimal(0)
+    transactions = Transaction.objects.filter(user_id=user_id, date__range=(start, end))
+
+    if type:
+        transactions = transactions.filter(type=type)
+
+    if category:
+        transactions = transactions.filter(category__in=categories_named(user_id, category).values('pk'))
+
+    return transactions.annotate(bucket=Trunc('date', granularity, output_field=DateField())) \
+                       .values('bucket') \
+                       .annotate(income=Coalesce(Sum('amount', filter=Q(type='income')), zero),
+                                 expense=Coalesce(Sum('amount', filter=Q(type='expense')), zero),
+                                 count=Count('pk')) \
+                       .values_list('bucket', 'income', 'expense', 'count') \
+                       .order_by()
+
+
+def format_series(rows, granularity, start, end):
+    """
+    Return one entry per bucket between start and end, in order, with zeros for buckets without transactions
+    """
+    zero = Decimal(0)
+    totals = {bucket: (income, expense, count) for bucket, income, expense, count in rows}
+    series = []
+
+    for bucket in bucket_starts(start, end, granularity):
+        income, expense, count = totals.get(bucket, (zero, zero, 0))
+        series.append({'bucket': bucket.isoformat(), 'income': income, 'expense': expense, 'count': count})
+
+    return series
+
+
+def series_response(query, results):
+    _, granularity, start, end, *_ = query
+    return {'granularity': granularity, 'from': start.isoformat(), 'to': end.isoformat(), 'results': results}
+
+
+def transaction_series(user_id, granularity, start, end, type=None, category=None):
+    return format_series(series_rows(user_id, granularity, start, end, type, category), granularity, start, end)
+
+
+async def atransaction_series(user_id, granularity, start, end, type=None, category=None):
+    rows = [row async for row in series_rows(user_id, granularity, start, end, type, category)]
+    return format_series(rows, granularity, start, end)
@@ -1,15 +1,80 @@
-from django.dispatch import receiver
-from django.db.models.signals import post_save
+from collections import defaultdict
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.dispatch import receiver, Signal
+from django.db.models.signals import post_save, post_delete
+from cash_management.db.routers import pin_to_primary
 from . import models
+from .balance import apply_balance_deltas, signed_amount
+from .checkpoints import apply_checkpoint_deltas
+from .rollups import apply_monthly_deltas
+from .report_cache import bump_versions
+
+
+# Sent with the created instances after Transaction.objects.bulk_create, which does not send post_save
+bulk_created = Signal()
+
+
+def current_values(instance):
+    # Values may still be the raw ones passed to the constructor, e.g. a date string
+    return {
+        'user_id': instance.user_id,
+        'amount': instance._meta.get_field('amount').to_python(instance.amount),
+        'type': instance.type,
+        'date': instance._meta.get_field('date').to_python(instance.date),
+    }
+
+
+def apply_changes(entries):
+    """
+    Apply (sign, values) entries, +1 for a row that now exists and -1 for a row that no longer does,
+    to the balances, the balance checkpoints and the monthly summaries, invalidate the users' cached reports once
+    committed and keep their reads on the primary database until the replica has the change
+    """
+    balance_deltas = defaultdict(int)
+    checkpoint_deltas = defaultdict(int)
+    monthly_deltas = defaultdict(lambda: (0, 0))
+
+    for sign, values in entries:
+        delta = sign * signed_amount(values['type'], values['amount'])
+        balance_deltas[values['user_id']] += delta
+        checkpoint_deltas[values['user_id'], values['date']] += delta
+        key = (values['user_id'], values['date'].year, values['date'].month, values['type'])
+        amount, count = monthly_deltas[key]
+        monthly_deltas[key] = (amount + sign * values['amount'], count + sign)
+
+    apply_balance_deltas(balance_deltas)
+    apply_checkpoint_deltas(checkpoint_deltas)
+    apply_monthly_deltas(monthly_deltas)
+    user_ids = list(balance_deltas)
+    pin_to_primary(user_ids)
+    transaction.on_commit(lambda: (bump_versions(user_ids), pin_to_primary(user_ids)))
 
 
 @receiver(post_save, sender=models.Transaction)
-def calculate_user_balance(sender, instance, created, **kwargs):
-    if created:
-        if instance.type == 'income':
-            instance.user.balance += instance.amount
-            
-        else:
-            instance.user.balance -= instance.amount
-
-        instance.user.save()
+def transaction_saved(sender, instance, created, **kwargs):
+    entries = []
+    previous = getattr(instance, '_loaded_values', None)
+
+    if not created and previous is not None:
+        entries.append((-1, previous))
+
+    values = current_values(instance)
+    entries.append((1, values))
+    apply_changes(entries)
+    instance._loaded_values = values
+
+
+@receiver(post_delete, sender=models.Transaction)
+def transaction_deleted(sender, instance, origin=None, **kwargs):
+    # Balances and summaries of a user being deleted go away with the user
+    if isinstance(origin, get_user_model()):
+        return
+
+    previous = getattr(instance, '_loaded_values', None) or current_values(instance)
+    apply_changes([(-1, previous)])
+
+
+@receiver(bulk_created, sender=models.Transaction)
+def transactions_bulk_created(sender, instances, **kwargs):
+    apply_changes([(1, current_values(instance)) for instance in instances])
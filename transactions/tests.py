@@ -1,17 +1,43 @@
+import csv
 import datetime
+import json
+import threading
+import time
+import unittest
+import unittest.mock
+from decimal import Decimal
+from asgiref.sync import async_to_sync, sync_to_async
+from io import StringIO
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import F
 from django.urls import reverse
+from django.utils.http import http_date
 from django.utils.timezone import make_aware
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from cash_management import metrics
+from cash_management.throttling import STORES
 from rest_framework import status
 from rest_framework.test import APIClient
-from .models import Transaction
-from .serializers import TransactionSerializer
+from rest_framework_simplejwt.tokens import AccessToken
+from .categories import category_cache, intern_category
+from .checkpoints import balance_as_of, create_balance_checkpoints
+from .jobs import MAX_ATTEMPTS, REPORTS, claim_job, run_job, run_next_job
+from .models import BalanceCheckpoint, Category, MonthlySummary, ReportJob, Transaction
+from .partitions import DEFAULT_PARTITION, add_months, detached_before, ensure_partitions, partition_name, partitions
+from .report_cache import report_cache_stats
+from .rollups import diff_monthly_summary, rebuild_monthly_summary
+from .serializers import TRANSACTION_FIELDS, TRANSACTION_VALUES, TransactionSerializer, transaction_rows
 from authentication.models import User
 
 
 class TransactionListCreateViewTests(TestCase):
 
     def setUp(self):
+        STORES['local'].buckets.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(username='testuser', password='testpassword')
         self.client.force_authenticate(user=self.user)
@@ -19,7 +45,7 @@ class TransactionListCreateViewTests(TestCase):
     def create_transaction(self, category='Food', type='expense', amount=50, date=None):
         if date is None:
             date = datetime.date.today()
-        return Transaction.objects.create(user=self.user, category=category, type=type, amount=amount, date=date)
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
 
     ### Unit Tests ###
 
@@ -30,7 +56,7 @@ class TransactionListCreateViewTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(Transaction.objects.count(), 1)
         self.assertEqual(Transaction.objects.get().user, self.user)
-        self.assertEqual(Transaction.objects.get().category, 'Food')
+        self.assertEqual(Transaction.objects.get().category.name, 'Food')
         self.assertEqual(Transaction.objects.get().type, 'expense')
         self.assertEqual(Transaction.objects.get().amount, 50)
         self.assertEqual(Transaction.objects.get().date, make_aware(datetime.datetime(2023, 7, 21)))
@@ -91,6 +117,7 @@ class TransactionListCreateViewTests(TestCase):
 class TransactionRetrieveUpdateDestroyViewTests(TestCase):
 
     def setUp(self):
+        STORES['local'].buckets.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(username='testuser', password='testpassword')
         self.client.force_authenticate(user=self.user)
@@ -99,7 +126,7 @@ class TransactionRetrieveUpdateDestroyViewTests(TestCase):
     def create_transaction(self, category='Food', type='expense', amount=50, date=None):
         if date is None:
             date = datetime.date.today()
-        return Transaction.objects.create(user=self.user, category=category, type=type, amount=amount, date=date)
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
 
     ### Unit Tests ###
 
@@ -116,7 +143,7 @@ class TransactionRetrieveUpdateDestroyViewTests(TestCase):
         response = self.client.put(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.transaction.refresh_from_db()
-        self.assertEqual(self.transaction.category, 'Groceries')
+        self.assertEqual(self.transaction.category.name, 'Groceries')
         self.assertEqual(self.transaction.type, 'expense')
         self.assertEqual(self.transaction.amount, 60)
         self.assertEqual(self.transaction.date, datetime.date(2023, 7, 21))
@@ -155,6 +182,7 @@ class TransactionRetrieveUpdateDestroyViewTests(TestCase):
 class MonthlySummaryReportViewTests(TestCase):
 
     def setUp(self):
+        STORES['local'].buckets.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(username='testuser', password='testpassword')
         self.client.force_authenticate(user=self.user)
@@ -162,7 +190,7 @@ class MonthlySummaryReportViewTests(TestCase):
     def create_transaction(self, category='Food', type='expense', amount=50, date=None):
         if date is None:
             date = datetime.date.today()
-        return Transaction.objects.create(user=self.user, category=category, type=type, amount=amount, date=date)
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
 
     ### Unit Tests ###
 
@@ -205,6 +233,8 @@ class MonthlySummaryReportViewTests(TestCase):
 class CategoryWiseExpenseReportViewTests(TestCase):
 
     def setUp(self):
+        cache.clear()
+        STORES['local'].buckets.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(username='testuser', password='testpassword')
         self.client.force_authenticate(user=self.user)
@@ -212,7 +242,7 @@ class CategoryWiseExpenseReportViewTests(TestCase):
     def create_transaction(self, category='Food', type='expense', amount=50, date=None):
         if date is None:
             date = datetime.date.today()
-        return Transaction.objects.create(user=self.user, category=category, type=type, amount=amount, date=date)
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
 
     ### Unit Tests ###
 
@@ -250,3 +280,1488 @@ class CategoryWiseExpenseReportViewTests(TestCase):
         ]
 
         self.assertEqual(response.data, expected_data)
+
+
+class TransactionBalanceTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def create_transaction(self, category='Food', type='expense', amount=50, date=None):
+        if date is None:
+            date = datetime.date.today()
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
+
+    def assertBalance(self, expected):
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal(expected))
+
+    ### Unit Tests ###
+
+    def test_create_applies_signed_amount(self):
+        self.create_transaction(type='income', amount=100)
+        self.create_transaction(type='expense', amount=30)
+        self.assertBalance('70')
+
+    def test_update_applies_difference(self):
+        self.create_transaction(type='income', amount=100)
+        transaction = Transaction.objects.get(pk=self.create_transaction(type='expense', amount=30).pk)
+
+        transaction.amount = 45
+        transaction.save()
+        self.assertBalance('55')
+
+        transaction.type = 'income'
+        transaction.save()
+        self.assertBalance('145')
+
+    def test_update_without_amount_change_issues_no_balance_update(self):
+        transaction = Transaction.objects.get(pk=self.create_transaction(type='income', amount=100).pk)
+        transaction.category = intern_category(self.user.pk, 'Gift')
+
+        # SAVEPOINT, SELECT the stored row FOR UPDATE, UPDATE transaction, UPDATE the user's transactions version, RELEASE SAVEPOINT
+        with self.assertNumQueries(5) as queries:
+            transaction.save()
+
+        self.assertNotIn('balance', queries.captured_queries[3]['sql'])
+        self.assertBalance('100')
+
+    def test_updates_from_stale_instances_do_not_drift(self):
+        created = self.create_transaction(type='income', amount=100)
+        first, second = Transaction.objects.get(pk=created.pk), Transaction.objects.get(pk=created.pk)
+
+        # Both were loaded before either write, like two concurrent requests
+        first.amount = 30
+        first.save()
+        second.amount = 40
+        second.save()
+        self.assertBalance('40')
+
+        # An instance built with an existing id replaces the stored row instead of adding to it
+        Transaction(pk=created.pk, user=self.user, category=created.category, type='expense', amount=10, date=created.date).save()
+        self.assertBalance('-10')
+
+        first.delete()
+        second.delete()
+        self.assertBalance('0')
+
+    def test_delete_reverts_amount(self):
+        self.create_transaction(type='income', amount=100)
+        transaction = Transaction.objects.get(pk=self.create_transaction(type='expense', amount=30).pk)
+        transaction.delete()
+        self.assertBalance('100')
+
+    ### Integration Tests ###
+
+    def test_update_and_delete_through_api(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.create_transaction(type='income', amount=100)
+        transaction = self.create_transaction(type='expense', amount=30)
+        url = reverse('transaction_retrieve_update_destroy', kwargs={'pk': transaction.pk})
+
+        response = client.patch(url, {'amount': '10'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertBalance('90')
+
+        response = client.delete(url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertBalance('100')
+
+    def test_api_checks_expenses_against_the_stored_balance(self):
+        client = APIClient()
+        # Authenticated with the user as loaded before the income below, like a request racing another one
+        client.force_authenticate(user=User.objects.get(pk=self.user.pk))
+        self.create_transaction(type='income', amount=100)
+        url = reverse('transaction_list_create')
+
+        response = client.post(url, {'category': 'Food', 'type': 'expense', 'amount': '60', 'date': '2023-07-01'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(client.post(url, {'category': 'Food', 'type': 'expense', 'amount': '60', 'date': '2023-07-01'}, format='json').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+        # An edit is checked against the stored balance without the stored row
+        detail = reverse('transaction_retrieve_update_destroy', kwargs={'pk': response.data['pk']})
+        Transaction.objects.filter(pk=response.data['pk']).update(amount=90)
+        self.assertEqual(client.patch(detail, {'amount': '120'}).status_code, status.HTTP_200_OK)
+        self.assertEqual(client.patch(detail, {'amount': '200'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Concurrent writers need a database with row-level locking')
+class TransactionBalanceConcurrencyTests(TransactionTestCase):
+    writers = 8
+    writes_per_writer = 25
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def write(self, barrier, errors):
+        try:
+            barrier.wait()
+            for i in range(self.writes_per_writer):
+                type = 'income' if i % 2 == 0 else 'expense'
+                Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, 'Stress'), type=type, amount=Decimal('3.00') if type == 'income' else Decimal('1.00'),
+                                           date=datetime.date.today())
+
+        except Exception as e:
+            errors.append(e)
+
+        finally:
+            connection.close()
+
+    def test_parallel_writers_do_not_lose_updates(self):
+        barrier = threading.Barrier(self.writers)
+        errors = []
+        threads = [threading.Thread(target=self.write, args=(barrier, errors)) for _ in range(self.writers)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        incomes = (self.writes_per_writer + 1) // 2
+        expenses = self.writes_per_writer // 2
+        expected = self.writers * (incomes * Decimal('3.00') - expenses * Decimal('1.00'))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, expected)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), self.writers * self.writes_per_writer)
+
+    def post_expense(self, barrier, statuses):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        try:
+            barrier.wait()
+            statuses.append(client.post(reverse('transaction_list_create'), {'category': 'Food', 'type': 'expense', 'amount': '60', 'date': '2023-07-01'},
+                                        format='json').status_code)
+
+        finally:
+            connection.close()
+
+    @override_settings(THROTTLE_ENABLED=False)
+    def test_parallel_single_expenses_cannot_overdraw(self):
+        Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, 'Salary'), type='income', amount=100, date=datetime.date.today())
+        barrier = threading.Barrier(self.writers)
+        statuses = []
+        threads = [threading.Thread(target=self.post_expense, args=(barrier, statuses)) for _ in range(self.writers)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(statuses), [status.HTTP_201_CREATED] + [status.HTTP_400_BAD_REQUEST] * (self.writers - 1))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('40'))
+
+    def update(self, barrier, pk, amount, errors):
+        try:
+            transaction = Transaction.objects.get(pk=pk)
+            barrier.wait()
+            transaction.amount = amount
+            transaction.save()
+
+        except Exception as e:
+            errors.append(e)
+
+        finally:
+            connection.close()
+
+    def test_parallel_updates_of_one_row_do_not_drift(self):
+        pk = Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, 'Stress'), type='income', amount=1, date=datetime.date.today()).pk
+        barrier = threading.Barrier(self.writers)
+        errors = []
+        threads = [threading.Thread(target=self.update, args=(barrier, pk, Decimal(amount), errors)) for amount in range(10, 10 + self.writers)]
+
+        for thread in threads:
+            thread.start()
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Transaction.objects.get(pk=pk).amount)
+
+
+class TransactionImportViewTests(TestCase):
+
+    def setUp(self):
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, name, content, **extra):
+        url = reverse('transaction_import')
+        content = content if isinstance(content, bytes) else content.encode()
+        return self.client.post(url, {'file': SimpleUploadedFile(name, content), **extra}, format='multipart')
+
+    ### Unit Tests ###
+
+    def test_import_csv(self):
+        content = (
+            'amount,type,category,date\n'
+            '1000,income,Salary,2023-07-01\n'
+            '50,expense,Food,2023-07-02\n'
+            'abc,expense,Food,2023-07-03\n'
+            '30,expense,Transport,2023-07-04\n'
+        )
+        response = self.upload('history.csv', content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['failed'], 1)
+        self.assertEqual(response.data['errors'][0]['row'], 4)
+        self.assertIn('amount', response.data['errors'][0]['errors'])
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('920'))
+
+    def test_import_ndjson(self):
+        content = (
+            '{"amount": "100", "type": "income", "category": "Gift", "date": "2023-07-01"}\n'
+            '\n'
+            'not json\n'
+            '{"amount": "40", "type": "expense", "category": "Food", "date": "2023-07-02"}\n'
+        )
+        response = self.upload('history.txt', content, file_format='ndjson')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [3])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('60'))
+
+    def test_import_rejects_unknown_format(self):
+        response = self.upload('history.txt', 'amount,type,category,date\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_rejects_missing_columns(self):
+        response = self.upload('history.csv', 'amount,type\n10,income\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    ### Integration Tests ###
+
+    def test_import_checks_expenses_against_running_balance_across_chunks(self):
+        content = (
+            'amount,type,category,date\n'
+            '80,expense,Food,2023-07-01\n'
+            '100,income,Salary,2023-07-02\n'
+            '80,expense,Food,2023-07-03\n'
+            '80,expense,Food,2023-07-04\n'
+        )
+
+        with unittest.mock.patch('transactions.views.TransactionImportView.chunk_size', 2):
+            response = self.upload('history.csv', content)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 5])
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('20'))
+
+    def test_import_reports_unreadable_rest_of_file_after_committed_chunks(self):
+        content = (
+            b'amount,type,category,date\n'
+            b'100,income,Salary,2023-07-01\n'
+            b'10,expense,Food,2023-07-02\n'
+            b'10,expense,Caf\xe9,2023-07-03\n'
+            b'10,expense,Food,2023-07-04\n'
+        )
+
+        with unittest.mock.patch('transactions.views.TransactionImportView.chunk_size', 2):
+            response = self.upload('history.csv', content)
+            ndjson = self.upload('history.txt', b'{"amount": "5", "type": "income", "category": "Gift", "date": "2023-07-05"}\n\xff\n', file_format='ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 1))
+        self.assertEqual(response.data['errors'][0]['row'], 4)
+        self.assertIn('cannot be read', str(response.data['errors'][0]['errors']))
+        self.assertEqual((ndjson.status_code, ndjson.data['created'], ndjson.data['errors'][0]['row']), (status.HTTP_200_OK, 1, 2))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('95'))
+
+    def test_import_reports_malformed_csv_as_a_row_error(self):
+        content = f'amount,type,category,date\n100,income,Salary,2023-07-01\n10,expense,"{"x" * csv.field_size_limit()}",2023-07-02\n'
+        response = self.upload('history.csv', content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['failed'], response.data['errors'][0]['row']), (1, 1, 3))
+        self.assertEqual(self.upload('history.csv', b'amount,type,\xffcategory,date\n').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TransactionCursorPaginationTests(TestCase):
+
+    def setUp(self):
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+    def create_transaction(self, category='Food', type='expense', amount=50, date=None):
+        if date is None:
+            date = datetime.date.today()
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
+
+    def collect_pages(self, url):
+        pks = []
+
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            pks.extend(item['pk'] for item in response.data['results'])
+            url = response.data['next']
+
+        return pks
+
+    ### Unit Tests ###
+
+    def test_cursor_pages_follow_date_and_pk_order(self):
+        transactions = [self.create_transaction(date=datetime.date(2023, 7, 1 + i % 3)) for i in range(7)]
+        expected = [t.pk for t in sorted(transactions, key=lambda t: (t.date, t.pk), reverse=True)]
+
+        url = reverse('transaction_list_create') + '?pagination=cursor&page_size=3'
+        self.assertEqual(self.collect_pages(url), expected)
+
+    def test_cursor_mode_skips_count_query(self):
+        for i in range(5):
+            self.create_transaction()
+
+        url = reverse('transaction_list_create') + '?pagination=cursor&page_size=2'
+
+        with self.assertNumQueries(2):  # ETag lookup, page
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        url = reverse('transaction_list_create') + '?cursor=not-a-cursor'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_mode_keeps_count_envelope(self):
+        self.create_transaction()
+        response = self.client.get(reverse('transaction_list_create'))
+        self.assertEqual(response.data['count'], 1)
+        self.assertIn('total_pages', response.data)
+
+    ### Integration Tests ###
+
+    def test_cursor_pages_with_filters_and_concurrent_inserts(self):
+        for day in range(1, 7):
+            self.create_transaction(category='Food', date=datetime.date(2023, 7, day))
+            self.create_transaction(category='Transport', date=datetime.date(2023, 7, day))
+
+        url = reverse('transaction_list_create') + '?pagination=cursor&page_size=2&category=Food'
+        response = self.client.get(url)
+        seen = [item['pk'] for item in response.data['results']]
+
+        # Rows inserted ahead of the cursor must not shift the following pages
+        self.create_transaction(category='Food', date=datetime.date(2023, 7, 30))
+        seen += self.collect_pages(response.data['next'])
+
+        expected = list(Transaction.objects.filter(category__name='Food', date__lte=datetime.date(2023, 7, 6))
+                                           .order_by('-date', '-pk').values_list('pk', flat=True))
+        self.assertEqual(seen, expected)
+
+
+class MonthlySummaryRollupTests(TestCase):
+
+    def setUp(self):
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+    def create_transaction(self, category='Food', type='expense', amount=50, date=None, user=None):
+        if date is None:
+            date = datetime.date.today()
+        return Transaction.objects.create(user=user or self.user, category=intern_category((user or self.user).pk, category), type=type, amount=amount, date=date)
+
+    def summary(self):
+        return {
+            (s.year, s.month, s.type): (s.total_amount, s.transaction_count)
+            for s in MonthlySummary.objects.filter(user=self.user, transaction_count__gt=0)
+        }
+
+    ### Unit Tests ###
+
+    def test_rollup_follows_create_update_and_delete(self):
+        self.create_transaction(type='income', amount=1000, date='2023-07-01')
+        transaction = Transaction.objects.get(pk=self.create_transaction(amount=50, date='2023-07-19').pk)
+        self.create_transaction(amount=30, date='2023-07-20')
+        self.assertEqual(self.summary(), {(2023, 7, 'income'): (1000, 1), (2023, 7, 'expense'): (80, 2)})
+
+        transaction.date = datetime.date(2023, 8, 2)
+        transaction.amount = 60
+        transaction.save()
+        self.assertEqual(self.summary(), {(2023, 7, 'income'): (1000, 1), (2023, 7, 'expense'): (30, 1), (2023, 8, 'expense'): (60, 1)})
+
+        transaction.delete()
+        self.assertEqual(self.summary(), {(2023, 7, 'income'): (1000, 1), (2023, 7, 'expense'): (30, 1)})
+
+    def test_rollup_follows_bulk_import(self):
+        content = 'amount,type,category,date\n500,income,Salary,2023-06-01\n20,expense,Food,2023-06-05\n'
+        self.client.post(reverse('transaction_import'), {'file': SimpleUploadedFile('history.csv', content.encode())}, format='multipart')
+        self.assertEqual(self.summary(), {(2023, 6, 'income'): (500, 1), (2023, 6, 'expense'): (20, 1)})
+
+    def test_user_deletion_removes_rollup(self):
+        self.create_transaction(type='income', amount=100, date='2023-07-01')
+        self.user.delete()
+        self.assertFalse(MonthlySummary.objects.exists())
+
+    def test_check_and_rebuild_commands(self):
+        self.create_transaction(type='income', amount=100, date='2023-07-01')
+        self.create_transaction(amount=40, date='2023-07-02')
+        call_command('check_monthly_summary', stdout=StringIO())
+
+        MonthlySummary.objects.filter(type='expense').update(total_amount=1)
+        MonthlySummary.objects.create(user=self.user, year=2023, month=9, type='income', total_amount=5, transaction_count=1)
+
+        with self.assertRaises(CommandError):
+            call_command('check_monthly_summary', stdout=StringIO())
+
+        call_command('rebuild_monthly_summary', user=[self.user.pk], stdout=StringIO())
+        call_command('check_monthly_summary', stdout=StringIO())
+        self.assertEqual(self.summary(), {(2023, 7, 'income'): (100, 1), (2023, 7, 'expense'): (40, 1)})
+
+    ### Integration Tests ###
+
+    def test_report_reads_rollup_for_requesting_user_only(self):
+        other = User.objects.create_user(username='otheruser', password='testpassword')
+        self.create_transaction(type='income', amount=1000, date='2023-07-01', user=other)
+        for day in range(1, 21):
+            self.create_transaction(amount=5, date=datetime.date(2023, 7, day))
+
+        with self.assertNumQueries(2):  # ETag lookup, summaries
+            response = self.client.get(reverse('monthly-summary-report'))
+
+        self.assertEqual(response.data, [{'date__year': 2023, 'date__month': 7, 'type': 'expense', 'total_amount': 100}])
+
+
+class CategoryWiseExpenseReportCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # The on commit callbacks run below intern categories that the test rollback removes again
+        self.addCleanup(category_cache.clear)
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('category-wise-expense-report')
+
+    def create_transaction(self, category='Food', type='expense', amount=50, date=None, user=None):
+        if date is None:
+            date = datetime.date.today()
+        with self.captureOnCommitCallbacks(execute=True):
+            return Transaction.objects.create(user=user or self.user, category=intern_category((user or self.user).pk, category), type=type, amount=amount, date=date)
+
+    def stats(self):
+        return report_cache_stats().get('category-wise-expense', {'hits': 0, 'misses': 0})
+
+    ### Unit Tests ###
+
+    def test_repeated_reads_are_served_from_cache(self):
+        self.create_transaction(amount=50)
+        before = self.stats()
+        self.client.get(self.url)
+
+        with self.assertNumQueries(1):  # ETag lookup
+            response = self.client.get(self.url)
+
+        self.assertEqual(response.data, [{'category': 'Food', 'total_expense': 50}])
+        after = self.stats()
+        self.assertEqual(after['misses'] - before['misses'], 1)
+        self.assertEqual(after['hits'] - before['hits'], 1)
+
+    def test_report_is_scoped_to_requesting_user(self):
+        other = User.objects.create_user(username='otheruser', password='testpassword')
+        self.create_transaction(category='Rent', amount=500, user=other)
+        self.create_transaction(category='Food', amount=20)
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [{'category': 'Food', 'total_expense': 20}])
+
+    ### Integration Tests ###
+
+    def test_writes_invalidate_only_the_writers_cache(self):
+        other = User.objects.create_user(username='otheruser', password='testpassword')
+        other_client = APIClient()
+        other_client.force_authenticate(user=other)
+        self.create_transaction(amount=50)
+        self.client.get(self.url)
+        other_client.get(self.url)
+
+        transaction = self.create_transaction(category='Transport', amount=30)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [{'category': 'Food', 'total_expense': 50}, {'category': 'Transport', 'total_expense': 30}])
+
+        with self.assertNumQueries(1):  # ETag lookup
+            other_client.get(self.url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.get(pk=transaction.pk).delete()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.data, [{'category': 'Food', 'total_expense': 50}])
+
+
+class TransactionExportViewTests(TestCase):
+
+    def setUp(self):
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+    def create_transaction(self, category='Food', type='expense', amount=50, date=None):
+        if date is None:
+            date = datetime.date.today()
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
+
+    def export(self, query=''):
+        response = self.client.get(reverse('transaction_export') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    ### Unit Tests ###
+
+    def test_export_csv(self):
+        first = self.create_transaction(category='Food, fresh', amount=50, date='2023-07-19')
+        second = self.create_transaction(category='Salary', type='income', amount=1000, date='2023-07-21')
+
+        response, content = self.export()
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(list(csv.reader(content.splitlines())), [
+            ['pk', 'amount', 'type', 'category', 'date'],
+            [str(second.pk), '1000.00', 'income', 'Salary', '2023-07-21'],
+            [str(first.pk), '50.00', 'expense', 'Food, fresh', '2023-07-19'],
+        ])
+
+    def test_export_ndjson_matches_serializer_output(self):
+        transaction = self.create_transaction(amount='12.5', date='2023-07-19')
+
+        response, content = self.export('?export_format=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        expected = dict(TransactionSerializer(Transaction.objects.get(pk=transaction.pk)).data)
+        self.assertEqual([json.loads(line) for line in content.splitlines()], [expected])
+
+    def test_export_invalid_format(self):
+        response = self.client.get(reverse('transaction_export') + '?export_format=xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    ### Integration Tests ###
+
+    def test_export_applies_list_filters(self):
+        self.create_transaction(category='Food', date='2023-07-19')
+        self.create_transaction(category='Transport', date='2023-07-20')
+        self.create_transaction(category='Food', date='2023-08-01')
+
+        response, content = self.export('?export_format=ndjson&category=Food&date_from=2023-07-01&date_to=2023-07-31')
+        self.assertEqual([json.loads(line)['date'] for line in content.splitlines()], ['2023-07-19'])
+
+
+class AsyncReadViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+
+    def create_transaction(self, category='Food', type='expense', amount=50, date=None, user=None):
+        if date is None:
+            date = datetime.date.today()
+        return Transaction.objects.create(user=user or self.user, category=intern_category((user or self.user).pk, category), type=type, amount=amount, date=date)
+
+    def assertSameAsSync(self, url):
+        sync_response = self.client.get(url)
+        async_response = async_to_sync(self.async_client.get)(url, headers=self.headers)
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.json(), json.loads(sync_response.render().content))
+
+    ### Unit Tests ###
+
+    def test_async_reads_match_sync_views(self):
+        for day in range(1, 13):
+            self.create_transaction(category='Food' if day % 2 else 'Rent', amount=day, date=datetime.date(2023, 7, day))
+        self.create_transaction(type='income', amount=1000, date='2023-08-01')
+
+        self.assertSameAsSync(reverse('transaction_list_create'))
+        self.assertSameAsSync(reverse('transaction_list_create') + '?category=Food&page_size=2&page=2')
+        self.assertSameAsSync(reverse('transaction_list_create') + '?pagination=cursor&page_size=5')
+        self.assertSameAsSync(reverse('transaction_retrieve_update_destroy', kwargs={'pk': Transaction.objects.first().pk}))
+        self.assertSameAsSync(reverse('monthly-summary-report'))
+        self.assertSameAsSync(reverse('category-wise-expense-report'))
+
+    async def test_async_views_require_token(self):
+        response = await self.async_client.get(reverse('monthly-summary-report'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('WWW-Authenticate', response)
+
+        response = await self.async_client.get(reverse('monthly-summary-report'), headers={'Authorization': 'Bearer invalid'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_async_detail_checks_owner(self):
+        other = User.objects.create_user(username='otheruser', password='testpassword')
+        transaction = self.create_transaction(user=other)
+        get = async_to_sync(self.async_client.get)
+
+        response = get(reverse('transaction_retrieve_update_destroy', kwargs={'pk': transaction.pk}), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        response = get(reverse('transaction_retrieve_update_destroy', kwargs={'pk': 999}), headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_export_matches_sync_export(self):
+        await sync_to_async(self.create_transaction)(category='Food, fresh', amount=50, date='2023-07-19')
+        await sync_to_async(self.create_transaction)(type='income', amount=1000, date='2023-07-21')
+        sync_get = sync_to_async(self.client.get)
+
+        for query in ('', '?export_format=ndjson&category=Food&date_from=2023-07-01&date_to=2023-07-31'):
+            sync_response = await sync_get(reverse('transaction_export') + query)
+            async_response = await self.async_client.get(reverse('transaction_export') + query, headers=self.headers)
+            self.assertTrue(async_response.is_async)
+            self.assertEqual(async_response['Content-Disposition'], sync_response['Content-Disposition'])
+            self.assertEqual(b''.join([chunk async for chunk in async_response.streaming_content]),
+                             await sync_to_async(lambda: b''.join(sync_response.streaming_content))())
+
+        response = await self.async_client.get(reverse('transaction_export') + '?export_format=xml', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    ### Integration Tests ###
+
+    def test_writes_through_asgi_use_sync_views(self):
+        self.create_transaction(type='income', amount=100)
+        data = {'category': 'Food', 'type': 'expense', 'amount': '30', 'date': '2023-07-21'}
+        response = async_to_sync(self.async_client.post)(reverse('transaction_list_create'), data, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('70'))
+
+
+class RequestMetricsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        metrics.registry.routes.clear()
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+    def create_transaction(self, category='Food', type='expense', amount=50, date=None):
+        if date is None:
+            date = datetime.date.today()
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
+
+    ### Unit Tests ###
+
+    def test_requests_are_recorded_by_route(self):
+        self.create_transaction()
+        self.client.get(reverse('transaction_list_create'))
+        self.client.get(reverse('transaction_list_create'))
+        self.client.get(reverse('monthly-summary-report'))
+
+        route = metrics.registry.routes['transaction_list_create']
+        self.assertEqual(route.latency.counts[-1] + sum(route.latency.counts[:-1]), 2)
+        self.assertEqual(route.responses, {200: 2})
+        self.assertGreater(route.queries, 0)
+        self.assertGreater(route.db_seconds, 0)
+        self.assertEqual(sum(route.response_size.counts), 2)
+        self.assertIn('monthly-summary-report', metrics.registry.routes)
+
+    def test_unresolved_requests_are_grouped(self):
+        self.client.get('/missing/')
+        self.assertEqual(metrics.registry.routes['unmatched'].responses, {404: 1})
+
+    def test_async_requests_count_queries(self):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        async_to_sync(self.async_client.get)(reverse('transaction_list_create'), headers=headers)
+        self.assertGreater(metrics.registry.routes['transaction_list_create'].queries, 0)
+
+    def test_metrics_requires_staff(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    ### Integration Tests ###
+
+    def test_metrics_exposition(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.get(reverse('transaction_list_create'))
+        self.client.get(reverse('category-wise-expense-report'))
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{route="transaction_list_create"} 1', body)
+        self.assertIn('http_responses_total{route="transaction_list_create",status="200"} 1', body)
+        self.assertIn('db_queries_total{route="transaction_list_create"}', body)
+        self.assertIn('report_cache_requests_total{report="category-wise-expense",outcome="misses"}', body)
+
+
+class TransactionReadPathTests(TestCase):
+
+    def setUp(self):
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+
+    def create_transaction(self, category='Food', type='expense', amount=50, date=None):
+        if date is None:
+            date = datetime.date.today()
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
+
+    ### Unit Tests ###
+
+    def test_rows_match_serializer(self):
+        self.create_transaction(type='income', amount=Decimal('123456789012345678.99'), category='Salary', date='2015-01-01')
+        self.create_transaction(amount=Decimal('0.5'), category='Café', date='2023-02-28')
+        self.create_transaction(amount=7, date='2023-12-31')
+        self.create_transaction(amount=Decimal('10.10'))
+        queryset = Transaction.objects.filter(user=self.user).order_by('-date', '-pk')
+
+        rows = transaction_rows(queryset.values_list(*TRANSACTION_VALUES))
+        expected = TransactionSerializer(queryset, many=True).data
+        self.assertEqual(rows, expected)
+        self.assertEqual(json.dumps(rows), json.dumps(expected))
+
+    ### Integration Tests ###
+
+    def test_list_matches_serializer(self):
+        for day in range(1, 16):
+            self.create_transaction(type='income' if day % 3 == 0 else 'expense', amount=Decimal(day) / 4, date=datetime.date(2023, 7, day))
+        expected = TransactionSerializer(Transaction.objects.filter(user=self.user).order_by('-date', '-pk'), many=True).data
+
+        response = self.client.get(reverse('transaction_list_create'), {'page_size': 20})
+        self.assertEqual(response.data['results'], expected)
+
+        cursor_pages = []
+        url = reverse('transaction_list_create') + '?pagination=cursor&page_size=4'
+        while url:
+            response = self.client.get(url)
+            cursor_pages += response.data['results']
+            url = response.data['next']
+        self.assertEqual(cursor_pages, expected)
+
+
+class BalanceCheckpointTests(TestCase):
+
+    def setUp(self):
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.create_transaction(type='income', amount=1000, date='2023-01-15')
+        self.create_transaction(amount=100, date='2023-01-31')
+        self.create_transaction(amount=50, date='2023-03-02')
+        self.create_transaction(type='income', amount=Decimal('20.50'), date='2023-04-10')
+
+    def create_transaction(self, category='Food', type='expense', amount=50, date=None):
+        if date is None:
+            date = datetime.date.today()
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
+
+    def create_checkpoints(self, until='2023-04-30'):
+        call_command('create_balance_checkpoints', until=datetime.date.fromisoformat(until), stdout=StringIO())
+
+    def checkpoints(self):
+        return {str(date): balance for date, balance in BalanceCheckpoint.objects.filter(user=self.user).order_by('date').values_list('date', 'balance')}
+
+    def expected_balance(self, as_of):
+        return sum(
+            (amount if type == 'income' else -amount
+             for type, amount in Transaction.objects.filter(user=self.user, date__lte=as_of).values_list('type', 'amount')),
+            Decimal(0),
+        )
+
+    ### Unit Tests ###
+
+    def test_create_checkpoints(self):
+        self.create_checkpoints(until='2023-03-15')
+        self.assertEqual(self.checkpoints(), {'2023-01-31': Decimal('900'), '2023-02-28': Decimal('900')})
+
+        self.create_checkpoints()
+        self.assertEqual(self.checkpoints(), {'2023-01-31': Decimal('900'), '2023-02-28': Decimal('900'),
+                                              '2023-03-31': Decimal('850'), '2023-04-30': Decimal('870.50')})
+
+    def test_balance_as_of_matches_transactions(self):
+        dates = ['2022-12-31', '2023-01-15', '2023-01-31', '2023-02-10', '2023-03-02', '2023-03-31', '2023-04-09', '2023-05-01']
+
+        for date in dates:
+            self.assertEqual(balance_as_of(self.user.pk, date), self.expected_balance(date))
+
+        self.create_checkpoints()
+
+        for date in dates:
+            expected = self.expected_balance(date)
+
+            with self.assertNumQueries(2):
+                self.assertEqual(balance_as_of(self.user.pk, date), expected)
+
+    def test_back_dated_writes_repair_checkpoints(self):
+        self.create_checkpoints()
+        transaction = self.create_transaction(amount=30, date='2023-02-14')
+        self.assertEqual(self.checkpoints(), {'2023-01-31': Decimal('900'), '2023-02-28': Decimal('870'),
+                                              '2023-03-31': Decimal('820'), '2023-04-30': Decimal('840.50')})
+
+        transaction.date = '2023-01-02'
+        transaction.amount = 10
+        transaction.save()
+        self.assertEqual(self.checkpoints(), {'2023-01-31': Decimal('890'), '2023-02-28': Decimal('890'),
+                                              '2023-03-31': Decimal('840'), '2023-04-30': Decimal('860.50')})
+
+        transaction.delete()
+        self.assertEqual(self.checkpoints(), {'2023-01-31': Decimal('900'), '2023-02-28': Decimal('900'),
+                                              '2023-03-31': Decimal('850'), '2023-04-30': Decimal('870.50')})
+
+    def test_rebuild_checkpoints(self):
+        self.create_checkpoints()
+        BalanceCheckpoint.objects.filter(user=self.user).update(balance=0)
+        call_command('create_balance_checkpoints', until=datetime.date(2023, 4, 30), rebuild=True, stdout=StringIO())
+        self.assertEqual(self.checkpoints()['2023-04-30'], Decimal('870.50'))
+
+    ### Integration Tests ###
+
+    def test_balance_endpoint(self):
+        self.create_checkpoints(until='2023-02-28')
+        response = self.client.get(reverse('balance'), {'as_of': '2023-03-31'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'as_of': '2023-03-31', 'balance': '850.00'})
+
+        response = self.client.get(reverse('balance'))
+        self.user.refresh_from_db()
+        self.assertEqual(Decimal(response.data['balance']), self.user.balance)
+
+        response = self.client.get(reverse('balance'), {'as_of': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.urls = [reverse('transaction_list_create'), reverse('monthly-summary-report'), reverse('category-wise-expense-report')]
+
+    def create_transaction(self, category='Food', type='expense', amount=50, date=None, user=None):
+        if date is None:
+            date = datetime.date.today()
+        return Transaction.objects.create(user=user or self.user, category=intern_category((user or self.user).pk, category), type=type, amount=amount, date=date)
+
+    def age_last_write(self, seconds=10):
+        User.objects.filter(pk=self.user.pk).update(transactions_changed_at=F('transactions_changed_at') - datetime.timedelta(seconds=seconds))
+
+    ### Unit Tests ###
+
+    def test_unchanged_poll_returns_304_after_one_lookup(self):
+        self.create_transaction(type='income', amount=100)
+        self.age_last_write()
+
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(response['ETag'].startswith('W/"'))
+            self.assertIn('Last-Modified', response)
+
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response.content, b'')
+
+    def test_writes_change_etag(self):
+        transaction = self.create_transaction(type='income', amount=100)
+        etag = self.client.get(self.urls[0])['ETag']
+
+        transaction.category = intern_category(self.user.pk, 'Salary')
+        transaction.save()
+        response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_is_per_user(self):
+        other = User.objects.create_user(username='otheruser', password='testpassword')
+        etag = self.client.get(self.urls[1])['ETag']
+        other_client = APIClient()
+        other_client.force_authenticate(user=other)
+
+        response = other_client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.create_transaction(type='income', amount=100, user=other)
+        self.assertEqual(self.client.get(self.urls[1], HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_if_modified_since(self):
+        self.create_transaction(type='income', amount=100)
+        self.age_last_write()
+        last_modified = self.client.get(self.urls[2])['Last-Modified']
+
+        response = self.client.get(self.urls[2], HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_no_last_modified_within_a_second_of_a_write(self):
+        self.create_transaction(type='income', amount=100)
+        self.age_last_write(seconds=0.5)
+        response = self.client.get(self.urls[2])
+        self.assertNotIn('Last-Modified', response)
+
+        # A later write in the same second must not be hidden behind an If-Modified-Since of the earlier one
+        last_modified = http_date(int(User.objects.get(pk=self.user.pk).transactions_changed_at.timestamp()))
+        self.create_transaction(amount=10)
+        self.assertEqual(self.client.get(self.urls[2], HTTP_IF_MODIFIED_SINCE=last_modified).status_code, status.HTTP_200_OK)
+
+    def test_series_ending_today_revalidates_by_date(self):
+        self.create_transaction(type='income', amount=100)
+        self.age_last_write()
+        url = reverse('series-report')
+        response = self.client.get(url)
+        self.assertIn(datetime.date.today().isoformat(), response['ETag'])
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with unittest.mock.patch('django.utils.timezone.localdate', return_value=datetime.date.today() + datetime.timedelta(days=1)):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_200_OK)
+
+        self.assertIn('Last-Modified', self.client.get(url + '?to=2023-12-31'))
+
+    ### Integration Tests ###
+
+    def test_async_views_answer_conditional_gets(self):
+        self.create_transaction(type='income', amount=100)
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        get = async_to_sync(self.async_client.get)
+
+        for url in self.urls:
+            etag = self.client.get(url)['ETag']
+            response = get(url, headers={**headers, 'If-None-Match': etag})
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.create_transaction(amount=10)
+        response = get(self.urls[0], headers={**headers, 'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], self.client.get(self.urls[0])['ETag'])
+
+
+class TransactionPartitionTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+
+    def create_transaction(self, date, amount=50):
+        return Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, 'Food'), type='expense', amount=amount, date=date)
+
+    def partition_rows(self, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT id FROM {table}')
+            return [row[0] for row in cursor.fetchall()]
+
+    ### Unit Tests ###
+
+    def test_add_months(self):
+        self.assertEqual(add_months(datetime.date(2023, 11, 15), 1), datetime.date(2023, 12, 1))
+        self.assertEqual(add_months(datetime.date(2023, 11, 15), 2), datetime.date(2024, 1, 1))
+        self.assertEqual(add_months(datetime.date(2023, 1, 31), -1), datetime.date(2022, 12, 1))
+
+    def test_rebuilds_keep_detached_months(self):
+        for date in ('1990-04-10', '1990-05-10', '1990-06-10'):
+            self.create_transaction(date, amount=10)
+        create_balance_checkpoints(self.user.pk, datetime.date(1990, 6, 30))
+        # What detaching the April and May partitions leaves in the table
+        Transaction.objects.filter(date__lt='1990-06-01')._raw_delete(connection.alias)
+        since = datetime.date(1990, 6, 1)
+
+        self.assertEqual(diff_monthly_summary(self.user.pk, since), [])
+        rebuild_monthly_summary(self.user.pk, since)
+        self.assertEqual(MonthlySummary.objects.filter(user=self.user).count(), 3)
+        create_balance_checkpoints(self.user.pk, datetime.date(1990, 6, 30), rebuild=True, since=since)
+        self.assertEqual(balance_as_of(self.user.pk, datetime.date(1990, 6, 30)), Decimal('-30'))
+        self.assertEqual(balance_as_of(self.user.pk, datetime.date(1990, 5, 31)), Decimal('-20'))
+
+    @unittest.skipIf(connection.vendor == 'postgresql', 'The table is partitioned on PostgreSQL')
+    def test_manage_partitions_needs_a_partitioned_table(self):
+        with self.assertRaises(CommandError):
+            call_command('manage_partitions', stdout=StringIO())
+
+    ### Integration Tests ###
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'Declarative partitioning needs PostgreSQL')
+    def test_rows_outside_the_partitions_move_out_of_the_default_partition(self):
+        month = datetime.date(1990, 5, 1)
+        transaction = self.create_transaction(month)
+        self.assertEqual(self.partition_rows(DEFAULT_PARTITION), [transaction.pk])
+
+        self.assertEqual(ensure_partitions(month, month), [month])
+        self.assertEqual(self.partition_rows(DEFAULT_PARTITION), [])
+        self.assertEqual(self.partition_rows(partition_name(month)), [transaction.pk])
+        self.assertEqual(ensure_partitions(month, month), [])
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'Declarative partitioning needs PostgreSQL')
+    def test_orm_writes_across_partitions(self):
+        first, second = datetime.date(1990, 5, 1), datetime.date(1990, 6, 1)
+        ensure_partitions(first, second)
+        transaction = self.create_transaction(first)
+
+        transaction.date = second
+        transaction.amount = 20
+        transaction.save()
+        self.assertEqual(self.partition_rows(partition_name(second)), [transaction.pk])
+        self.assertEqual(Transaction.objects.get(pk=transaction.pk).amount, Decimal('20.00'))
+
+        transaction.delete()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, 0)
+        self.assertFalse(Transaction.objects.exists())
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'Declarative partitioning needs PostgreSQL')
+    def test_manage_partitions_creates_ahead_and_detaches(self):
+        old = datetime.date(1990, 5, 1)
+        self.create_transaction(old)
+        call_command('manage_partitions', '--ahead', '6', '--from', '1990-05-01', '--detach-before', '1990-06-01',
+                     '--archive-schema', 'transactions_archive', stdout=StringIO())
+
+        months = [lower for _, lower, _ in partitions()]
+        self.assertNotIn(old, months)
+        self.assertIn(add_months(datetime.date.today(), 6), months)
+        self.assertFalse(Transaction.objects.filter(date=old).exists())
+        self.assertEqual(len(self.partition_rows('transactions_archive.' + partition_name(old))), 1)
+
+        # The detached expense stays counted, and the rollup commands leave its month alone
+        self.assertEqual(detached_before(), datetime.date(1990, 6, 1))
+        self.assertEqual(balance_as_of(self.user.pk, datetime.date(1990, 7, 1)), Decimal('-50'))
+        call_command('rebuild_monthly_summary', stdout=StringIO())
+        call_command('create_balance_checkpoints', '--rebuild', stdout=StringIO())
+        call_command('check_monthly_summary', stdout=StringIO())
+        self.assertEqual(balance_as_of(self.user.pk, datetime.date(1990, 7, 1)), Decimal('-50'))
+        self.assertTrue(MonthlySummary.objects.filter(user=self.user, year=1990, month=5).exists())
+
+
+class TransactionBatchCreateTests(TestCase):
+
+    def setUp(self):
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('transaction_list_create')
+
+    def post(self, rows):
+        return self.client.post(self.url, rows, format='json')
+
+    ### Unit Tests ###
+
+    def test_income_earlier_in_the_batch_funds_a_later_expense(self):
+        response = self.post([
+            {'category': 'Salary', 'type': 'income', 'amount': '100.00', 'date': '2023-07-01'},
+            {'category': 'Food', 'type': 'expense', 'amount': '60.00', 'date': '2023-07-02'},
+            {'category': 'Rent', 'type': 'expense', 'amount': '40.00', 'date': '2023-07-03'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([row['category'] for row in response.data], ['Salary', 'Food', 'Rent'])
+        self.assertEqual(sorted(row['pk'] for row in response.data), sorted(Transaction.objects.values_list('pk', flat=True)))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, 0)
+        self.assertEqual(self.user.transactions_version, 1)
+
+    def test_overdrawing_batch_is_rejected_as_a_whole(self):
+        response = self.post([
+            {'category': 'Food', 'type': 'expense', 'amount': '10.00', 'date': '2023-07-01'},
+            {'category': 'Salary', 'type': 'income', 'amount': '100.00', 'date': '2023-07-02'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0]['non_field_errors'][0], 'Expense amount is greater than balance')
+        self.assertEqual(response.data[1], {})
+        self.assertFalse(Transaction.objects.exists())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, 0)
+
+    def test_invalid_row_rejects_the_batch(self):
+        response = self.post([
+            {'category': 'Salary', 'type': 'income', 'amount': '100.00', 'date': '2023-07-01'},
+            {'category': 'Food', 'type': 'refund', 'amount': '10.00', 'date': '2023-07-02'},
+        ])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('type', response.data[1])
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_empty_and_oversized_batches_are_rejected(self):
+        self.assertEqual(self.post([]).status_code, status.HTTP_400_BAD_REQUEST)
+
+        with unittest.mock.patch('transactions.views.TransactionListCreateView.batch_max_size', 2):
+            row = {'category': 'Salary', 'type': 'income', 'amount': '1.00', 'date': '2023-07-01'}
+            self.assertEqual(self.post([row] * 3).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertFalse(Transaction.objects.exists())
+
+    ### Integration Tests ###
+
+    def test_batch_is_inserted_with_one_statement_and_one_balance_update(self):
+        rows = [{'category': 'Salary', 'type': 'income', 'amount': '10.00', 'date': f'2023-07-{day:02d}'} for day in range(1, 21)]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(rows)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        statements = [query['sql'] for query in queries.captured_queries]
+        self.assertEqual(len([sql for sql in statements if sql.startswith('INSERT INTO "transactions_transaction"')]), 1)
+        self.assertEqual(len([sql for sql in statements if sql.startswith('UPDATE "authentication_user"')]), 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.balance, Decimal('200.00'))
+        self.assertEqual(MonthlySummary.objects.get(user=self.user, year=2023, month=7, type='income').transaction_count, 20)
+        self.assertEqual(balance_as_of(self.user.pk, datetime.date(2023, 7, 10)), Decimal('100.00'))
+
+
+class CategoryTests(TestCase):
+
+    def setUp(self):
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.user.balance = 1000
+        self.user.save()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('transaction_list_create')
+        self.addCleanup(category_cache.clear)
+
+    def post(self, category, type='expense', amount='10.00'):
+        return self.client.post(self.url, {'category': category, 'type': type, 'amount': amount, 'date': '2023-07-01'}, format='json')
+
+    ### Unit Tests ###
+
+    def test_names_are_unique_per_user_ignoring_case(self):
+        other = User.objects.create_user(username='otheruser', password='testpassword')
+        food = intern_category(self.user.pk, 'Food')
+
+        self.assertEqual(intern_category(self.user.pk, 'FOOD').pk, food.pk)
+        self.assertNotEqual(intern_category(other.pk, 'food').pk, food.pk)
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 1)
+
+        with self.assertRaises(IntegrityError):
+            Category.objects.create(user=self.user, name='fOOd')
+
+    def test_committed_categories_are_interned_without_queries(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            food = intern_category(self.user.pk, 'Food')
+
+        with self.assertNumQueries(0):
+            category = intern_category(self.user.pk, 'food')
+
+        self.assertEqual((category.pk, category.name, category.user_id), (food.pk, 'Food', self.user.pk))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            intern_category(self.user.pk, 'FOOD')
+
+        self.assertEqual(callbacks, [])
+
+    def test_cache_evicts_least_recently_used_categories(self):
+        with unittest.mock.patch('transactions.categories.CATEGORY_CACHE_SIZE', 2), self.captureOnCommitCallbacks(execute=True):
+            intern_category(self.user.pk, 'Food')
+            intern_category(self.user.pk, 'Rent')
+            intern_category(self.user.pk, 'Food')
+            intern_category(self.user.pk, 'Travel')
+
+        self.assertEqual(list(category_cache), [(self.user.pk, 'food'), (self.user.pk, 'travel')])
+
+    ### Integration Tests ###
+
+    def test_api_accepts_and_returns_names(self):
+        response = self.post('Food')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['category'], 'Food')
+
+        # Later spellings reuse the category and are returned as first stored
+        response = self.post('food')
+        self.assertEqual(response.data['category'], 'Food')
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 1)
+
+        url = reverse('transaction_retrieve_update_destroy', kwargs={'pk': response.data['pk']})
+        response = self.client.patch(url, {'category': 'Rent'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).data['category'], 'Rent')
+        self.assertEqual(self.post('x' * 101).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_filter_and_report_use_the_category_key(self):
+        for category, amount in [('Food', '10.00'), ('rent', '30.00'), ('FOOD', '5.00'), ('Travel', '1.00')]:
+            self.post(category, amount=amount)
+        self.post('Salary', type='income')
+
+        response = self.client.get(self.url + '?category=food')
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual({row['category'] for row in response.data['results']}, {'Food'})
+        self.assertEqual(self.client.get(self.url + '?category=Unknown').data['count'], 0)
+
+        response = self.client.get(reverse('category-wise-expense-report'))
+        self.assertEqual([(row['category'], row['total_expense']) for row in response.data],
+                         [('Food', Decimal('15.00')), ('rent', Decimal('30.00')), ('Travel', Decimal('1.00'))])
+
+    def test_import_interns_names(self):
+        content = 'amount,type,category,date\n500,income,Salary,2023-06-01\n20,expense,Food,2023-06-05\n5,expense,food,2023-06-06\n'
+        response = self.client.post(reverse('transaction_import'), {'file': SimpleUploadedFile('history.csv', content.encode())}, format='multipart')
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(sorted(Category.objects.filter(user=self.user).values_list('name', flat=True)), ['Food', 'Salary'])
+
+
+class TransactionSeriesReportTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.user)}'}
+        self.url = reverse('series-report')
+
+    def create_transaction(self, date, amount=10, type='expense', category='Food', user=None):
+        user = user or self.user
+        return Transaction.objects.create(user=user, category=intern_category(user.pk, category), type=type, amount=amount, date=date)
+
+    def series(self, query):
+        response = self.client.get(self.url + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['bucket'], row['income'], row['expense'], row['count']) for row in response.data['results']]
+
+    ### Unit Tests ###
+
+    def test_buckets_are_zero_filled(self):
+        self.create_transaction('2023-01-15', amount=500, type='income')
+        self.create_transaction('2023-01-20', amount=20)
+        self.create_transaction('2023-03-02', amount=30)
+
+        response = self.client.get(self.url + '?from=2023-01-01&to=2023-04-30')
+        self.assertEqual((response.data['granularity'], response.data['from'], response.data['to']), ('month', '2023-01-01', '2023-04-30'))
+        self.assertEqual(self.series('?from=2023-01-01&to=2023-04-30'), [
+            ('2023-01-01', Decimal('500'), Decimal('20'), 2),
+            ('2023-02-01', Decimal('0'), Decimal('0'), 0),
+            ('2023-03-01', Decimal('0'), Decimal('30'), 1),
+            ('2023-04-01', Decimal('0'), Decimal('0'), 0),
+        ])
+
+    def test_week_and_quarter_buckets(self):
+        # Sunday and Monday fall into different ISO weeks
+        self.create_transaction('2023-07-02', amount=5)
+        self.create_transaction('2023-07-03', amount=7)
+        self.create_transaction('2023-12-31', amount=9)
+
+        self.assertEqual(self.series('?granularity=week&from=2023-06-28&to=2023-07-10'), [
+            ('2023-06-26', Decimal('0'), Decimal('5'), 1),
+            ('2023-07-03', Decimal('0'), Decimal('7'), 1),
+            ('2023-07-10', Decimal('0'), Decimal('0'), 0),
+        ])
+        self.assertEqual([row[0] for row in self.series('?granularity=quarter&from=2023-02-10&to=2023-12-31')],
+                         ['2023-01-01', '2023-04-01', '2023-07-01', '2023-10-01'])
+        self.assertEqual(self.series('?granularity=year&from=2023-01-01&to=2023-12-31'), [('2023-01-01', Decimal('0'), Decimal('21'), 3)])
+
+    def test_filters_and_user_scope(self):
+        other = User.objects.create_user(username='otheruser', password='testpassword')
+        self.create_transaction('2023-05-01', amount=40, type='income', category='Salary')
+        self.create_transaction('2023-05-02', amount=10, category='Food')
+        self.create_transaction('2023-05-03', amount=15, category='food')
+        self.create_transaction('2023-05-04', amount=99, category='Rent')
+        self.create_transaction('2023-05-05', amount=1000, user=other)
+
+        self.assertEqual(self.series('?from=2023-05-01&to=2023-05-31'), [('2023-05-01', Decimal('40'), Decimal('124'), 4)])
+        self.assertEqual(self.series('?from=2023-05-01&to=2023-05-31&type=income'), [('2023-05-01', Decimal('40'), Decimal('0'), 1)])
+        self.assertEqual(self.series('?from=2023-05-01&to=2023-05-31&category=FOOD'), [('2023-05-01', Decimal('0'), Decimal('25'), 2)])
+
+    def test_invalid_queries(self):
+        for query in ('?from=2023-02-01&to=2023-01-01', '?granularity=hour', '?granularity=day&from=2000-01-01&to=2023-01-01', '?type=gift'):
+            self.assertEqual(self.client.get(self.url + query).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_ranges_at_the_ends_of_the_calendar(self):
+        self.assertEqual([row[0] for row in self.series('?granularity=week&from=0001-01-01&to=0001-01-03')], ['0001-01-01'])
+        self.assertEqual([row[0] for row in self.series('?granularity=year&to=9999-12-31')], ['9995-01-01', '9996-01-01', '9997-01-01', '9998-01-01', '9999-01-01'])
+        self.assertEqual(self.client.get(self.url + '?granularity=year&to=0002-06-01').data['from'], '0001-01-01')
+        self.assertEqual(self.series('?granularity=quarter&from=9999-12-01&to=9999-12-31')[0][0], '9999-10-01')
+
+    def test_bucket_limit_is_checked_without_listing_buckets(self):
+        with unittest.mock.patch('transactions.series.bucket_starts') as bucket_starts:
+            response = self.client.get(self.url + '?granularity=day&from=0001-01-02&to=9999-12-30')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        bucket_starts.assert_not_called()
+        self.assertEqual(self.client.get(self.url + '?granularity=week&from=2023-01-01&to=2042-01-01').status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url + '?granularity=week&from=2023-01-01&to=2043-01-01').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_default_window_ends_today(self):
+        today = datetime.date.today()
+        response = self.client.get(self.url + '?granularity=day')
+        self.assertEqual(response.data['to'], today.isoformat())
+        self.assertEqual(len(response.data['results']), 31)
+        self.assertEqual(len(self.client.get(self.url).data['results']), 12)
+
+    ### Integration Tests ###
+
+    def test_one_aggregate_query(self):
+        for day in range(1, 29):
+            self.create_transaction(datetime.date(2022, 2, day), amount=day)
+
+        self.client.get(self.url + '?granularity=day&from=2022-01-01&to=2022-12-31')
+        # The ETag lookup of conditional_on_transactions and the bucketed aggregate
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url + '?granularity=day&from=2022-01-01&to=2022-12-31&type=expense')
+
+        self.assertEqual(len(response.data['results']), 365)
+        self.assertEqual(len([query for query in queries if 'GROUP BY' in query['sql']]), 1)
+        self.assertLessEqual(len(queries), 2)
+
+    def test_async_view_matches_sync_view(self):
+        self.create_transaction('2023-01-15', amount=500, type='income')
+        self.create_transaction('2023-03-02', amount=30)
+
+        for query in ('?from=2023-01-01&to=2023-04-30', '?granularity=week&from=2023-01-01&to=2023-03-31&category=Food', '?from=2023-05-01&to=2023-01-01'):
+            sync_response = self.client.get(self.url + query)
+            async_response = async_to_sync(self.async_client.get)(self.url + query, headers=self.headers)
+            self.assertEqual(async_response.status_code, sync_response.status_code)
+            self.assertEqual(async_response.json(), json.loads(sync_response.render().content))
+
+
+class ReportJobTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        STORES['local'].buckets.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('report_job_list_create')
+        for category, type, amount, date in [('Salary', 'income', 500, '2023-01-10'), ('Food', 'expense', 20, '2023-01-15'), ('Rent', 'expense', 100, '2023-03-01')]:
+            Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, category), type=type, amount=amount, date=date)
+
+    def queue(self, report, params=None):
+        response = self.client.post(self.url, {'report': report, 'params': params or {}}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response
+
+    def result(self, job_id):
+        return json.loads(self.client.get(reverse('report_job_detail', kwargs={'pk': job_id})).render().content)
+
+    ### Unit Tests ###
+
+    def test_queue_validates_report_and_params(self):
+        response = self.queue('series', {'granularity': 'quarter', 'to': '2023-12-31'})
+        self.assertEqual(response['Location'], 'http://testserver' + reverse('report_job_detail', kwargs={'pk': response.data['pk']}))
+        self.assertEqual(response.data['status'], 'pending')
+        # Defaults are resolved when the job is queued
+        self.assertEqual(response.data['params'], {'granularity': 'quarter', 'from': '2022-01-01', 'to': '2023-12-31'})
+        self.assertEqual(self.queue('monthly_summary', {'ignored': 1}).data['params'], {})
+
+        for data in ({'report': 'unknown'}, {'report': 'series', 'params': {'granularity': 'hour'}}, {'report': 'series', 'params': {'from': '2023-02-01', 'to': '2023-01-01'}}):
+            self.assertEqual(self.client.post(self.url, data, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(ReportJob.objects.count(), 2)
+
+    def test_claim_skips_running_jobs_and_reclaims_stale_ones(self):
+        first, second = ReportJob.objects.create(user=self.user, report='monthly_summary'), ReportJob.objects.create(user=self.user, report='monthly_summary')
+
+        self.assertEqual(claim_job().pk, first.pk)
+        self.assertEqual(claim_job().pk, second.pk)
+        self.assertIsNone(claim_job())
+
+        # A job whose worker stopped is run again, until it used up its attempts
+        ReportJob.objects.filter(pk=first.pk).update(started_at=make_aware(datetime.datetime(2023, 1, 1)))
+        self.assertEqual(claim_job().attempts, 2)
+        ReportJob.objects.filter(pk=first.pk).update(started_at=make_aware(datetime.datetime(2023, 1, 1)), attempts=MAX_ATTEMPTS)
+        self.assertIsNone(claim_job())
+        self.assertEqual(ReportJob.objects.get(pk=first.pk).status, 'failed')
+
+    def test_failures_are_stored(self):
+        job = ReportJob.objects.create(user=self.user, report='series', params={'granularity': 'hour'})
+        run_next_job()
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('granularity', job.error)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_results_of_reclaimed_jobs_are_discarded(self):
+        job = ReportJob.objects.create(user=self.user, report='monthly_summary')
+        job = claim_job()
+        # Another worker claimed the job after this one's claim lapsed
+        ReportJob.objects.filter(pk=job.pk).update(attempts=F('attempts') + 1)
+
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.attempts), ('running', None, 2))
+
+    ### Integration Tests ###
+
+    def test_results_match_inline_reports(self):
+        jobs = {
+            reverse('monthly-summary-report'): self.queue('monthly_summary').data['pk'],
+            reverse('category-wise-expense-report'): self.queue('category_wise_expense').data['pk'],
+            reverse('series-report') + '?granularity=month&from=2023-01-01&to=2023-04-30': self.queue('series', {'from': '2023-01-01', 'to': '2023-04-30'}).data['pk'],
+        }
+        self.assertIsNone(self.result(jobs[reverse('monthly-summary-report')])['result'])
+
+        while run_next_job():
+            pass
+
+        for url, job_id in jobs.items():
+            job = self.result(job_id)
+            self.assertEqual((job['status'], job['attempts']), ('done', 1))
+            self.assertEqual(job['result'], json.loads(self.client.get(url).render().content))
+
+    def test_jobs_are_scoped_to_their_user(self):
+        job_id = self.queue('monthly_summary').data['pk']
+        other = User.objects.create_user(username='otheruser', password='testpassword')
+        ReportJob.objects.create(user=other, report='monthly_summary')
+
+        response = self.client.get(self.url)
+        self.assertEqual([job['pk'] for job in response.data['results']], [job_id])
+        self.assertNotIn('result', response.data['results'][0])
+
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(reverse('report_job_detail', kwargs={'pk': job_id})).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ReportJobWorkerTests(TransactionTestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpassword')
+        Transaction.objects.create(user=self.user, category=intern_category(self.user.pk, 'Food'), type='income', amount=10, date='2023-01-10')
+
+    def test_worker_drains_the_queue(self):
+        ReportJob.objects.bulk_create([ReportJob(user=self.user, report='monthly_summary') for _ in range(3)])
+        out = StringIO()
+        call_command('run_report_jobs', '--once', '--threads', '1', stdout=out)
+        self.assertIn('Ran 3 report jobs', out.getvalue())
+        self.assertEqual(list(ReportJob.objects.values_list('status', flat=True).distinct()), ['done'])
+
+    def test_running_jobs_renew_their_claim(self):
+        ReportJob.objects.create(user=self.user, report='slow')
+        job = claim_job()
+
+        with unittest.mock.patch.dict(REPORTS, {'slow': lambda user_id, params: time.sleep(0.3) or {}}):
+            self.assertTrue(run_job(job, datetime.timedelta(seconds=0.15)))
+
+        stored = ReportJob.objects.get(pk=job.pk)
+        self.assertEqual(stored.status, 'done')
+        self.assertGreater(stored.started_at, job.started_at)
+
+    def test_worker_threads_survive_database_errors(self):
+        out, err = StringIO(), StringIO()
+
+        with unittest.mock.patch('transactions.management.commands.run_report_jobs.claim_job', side_effect=[OperationalError('connection lost'), None]):
+            call_command('run_report_jobs', '--once', '--threads', '1', '--poll-interval', '0.01', stdout=out, stderr=err)
+
+        self.assertIn('connection lost', err.getvalue())
+        self.assertIn('Ran 0 report jobs', out.getvalue())
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'Claiming with SKIP LOCKED needs row-level locking')
+    def test_parallel_workers_run_each_job_once(self):
+        ReportJob.objects.bulk_create([ReportJob(user=self.user, report='category_wise_expense') for _ in range(40)])
+        call_command('run_report_jobs', '--once', '--threads', '8', stdout=StringIO())
+        self.assertEqual(set(ReportJob.objects.values_list('status', 'attempts').distinct()), {('done', 1)})
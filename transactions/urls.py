@@ -1,11 +1,18 @@
 from django.urls import path
-from .views import TransactionListCreateView, TransactionRetrieveUpdateDestroyView, monthly_summary_report, \
-    category_wise_expense_report
+from .views import TransactionListCreateView, TransactionRetrieveUpdateDestroyView, TransactionImportView, \
+    TransactionExportView, monthly_summary_report, category_wise_expense_report, \
+    ReportJobListCreateView, ReportJobRetrieveView, transaction_series_report, balance_as_of_date
 
 
 urlpatterns = [
     path('transactions/', TransactionListCreateView.as_view(), name='transaction_list_create'),
+    path('transactions/export/', TransactionExportView.as_view(), name='transaction_export'),
+    path('transactions/import/', TransactionImportView.as_view(), name='transaction_import'),
     path('transactions/<int:pk>/', TransactionRetrieveUpdateDestroyView.as_view(), name='transaction_retrieve_update_destroy'),
+    path('balance/', balance_as_of_date, name='balance'),
     path('reports/monthly-summary/', monthly_summary_report, name='monthly-summary-report'),
     path('reports/category-wise-expense/', category_wise_expense_report, name='category-wise-expense-report'),
+    path('reports/series/', transaction_series_report, name='series-report'),
+    path('reports/jobs/', ReportJobListCreateView.as_view(), name='report_job_list_create'),
+    path('reports/jobs/<int:pk>/', ReportJobRetrieveView.as_view(), name='report_job_detail'),
 ]
@@ -1,13 +1,32 @@
-from rest_framework import generics, permissions, pagination, status
-from .models import Transaction
-from .serializers import TransactionSerializer
+import base64
+import datetime
+from rest_framework import generics, permissions, pagination, parsers, status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.reverse import reverse
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .models import ReportJob, Transaction
+from .serializers import TRANSACTION_VALUES, BalanceSerializer, ReportJobResultSerializer, ReportJobSerializer, SeriesSerializer, TransactionSerializer, TransactionImportSerializer, transaction_rows
+from .importers import ROW_READERS, import_transactions
+from .exporters import EXPORT_VALUES, EXPORTERS
+from .filters import filter_transactions
+from .reports import cached_category_wise_expense, monthly_summary
+from .balance import locked_balance
+from .checkpoints import balance_as_of
+from .series import series_response, transaction_series
+from .conditional import conditional_on_transactions
 from rest_framework.response import Response
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 from .permissions import IsOwner
-from django.db.models import Sum
-from django.db.models.functions import Lower
-from rest_framework.decorators import api_view, permission_classes
+from django.core.paginator import InvalidPage, Page
+from django.db import transaction
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
+from cash_management.db.routers import read_from_replica
+from cash_management.throttling import ReportThrottle, WriteThrottle
 
 
 class CustomPagination(pagination.PageNumberPagination):
@@ -28,79 +47,320 @@ class CustomPagination(pagination.PageNumberPagination):
             'results': data
         })
 
+    async def apaginate_queryset(self, queryset, request):
+        """
+        Counterpart of paginate_queryset for the async views, runs the count and the page query with the async ORM
+        """
+        page_size = self.get_page_size(request)
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
 
-class TransactionListCreateView(generics.ListCreateAPIView):
+        try:
+            number = paginator.validate_number(page_number)
+
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        bottom = (number - 1) * page_size
+        self.page = Page([item async for item in queryset[bottom:bottom + page_size]], number, paginator)
+        self.request = request
+        return list(self.page)
+
+
+class KeysetCursorPagination(pagination.BasePagination):
+    """
+    Keyset pagination over (-date, -pk) with an opaque cursor, pages are read without a COUNT query or an OFFSET scan
+    and stay stable while rows are being inserted
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def encode_cursor(self, position):
+        date, pk = position
+        return base64.urlsafe_b64encode(f'{date.isoformat()}:{pk}'.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            date, pk = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().split(':')
+            return datetime.date.fromisoformat(date), int(pk)
+
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_position(self, item):
+        # Pages hold values_list rows of TRANSACTION_VALUES, which start with the pk and end with the date
+        pk, *_, date = item
+        return date, pk
+
+    def get_page_size(self, request):
+        try:
+            return max(int(request.query_params[self.page_size_query_param]), 1)
+
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def page_queryset(self, queryset, request):
+        # One row past the page tells whether there is a next page
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+
+        if cursor:
+            date, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(Q(date__lt=date) | Q(date=date, pk__lt=pk))
+
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, page):
+        self.has_next = len(page) > self.page_size
+        self.page = page[:self.page_size]
+        return self.page
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request):
+        return self.set_page([item async for item in self.page_queryset(queryset, request)])
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, 'page')
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.get_position(self.page[-1])))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'page_size': self.page_size,
+            'next': self.get_next_link(),
+            'results': data
+        })
+
+
+def get_list_paginator(query_params, default_class):
+    cursor_mode = query_params.get('pagination') == 'cursor' or 'cursor' in query_params
+    return KeysetCursorPagination() if cursor_mode else default_class()
+
+
+class TransactionFilterMixin:
+    """
+    Mixin to scope transactions to the requesting user, apply the category, type and date filters and order by date
+    """
+    category_param_config = openapi.Parameter('category', in_=openapi.IN_QUERY, description='Filter by category', type=openapi.TYPE_STRING)
+    type_param_config = openapi.Parameter('type', in_=openapi.IN_QUERY, description='Filter by type', type=openapi.TYPE_STRING)
+    date_from_param_config = openapi.Parameter('date_from', in_=openapi.IN_QUERY, description='Filter by date from', type=openapi.FORMAT_DATE)
+    date_to_param_config = openapi.Parameter('date_to', in_=openapi.IN_QUERY, description='Filter by date to', type=openapi.FORMAT_DATE)
+    filter_param_configs = [category_param_config, type_param_config, date_from_param_config, date_to_param_config]
+
+    def get_queryset(self):
+        return filter_transactions(super().get_queryset(), self.request.user, self.request.query_params)
+
+
+class TransactionListCreateView(TransactionFilterMixin, generics.ListCreateAPIView):
     """
     get: List all transactions for requesting user and order by date or custom user filter by date, category, type
-    post: Create a new transaction for requesting user
+    post: Create a new transaction for requesting user, or a batch of them from a JSON array
     """
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [WriteThrottle]
     pagination_class = CustomPagination
-    category_param_config = openapi.Parameter('category', in_=openapi.IN_QUERY, description='Filter by category', type=openapi.TYPE_STRING)
-    type_param_config = openapi.Parameter('type', in_=openapi.IN_QUERY, description='Filter by type', type=openapi.TYPE_STRING)
-    date_from_param_config = openapi.Parameter('date_from', in_=openapi.IN_QUERY, description='Filter by date from', type=openapi.FORMAT_DATE)
-    date_to_param_config = openapi.Parameter('date_to', in_=openapi.IN_QUERY, description='Filter by date to', type=openapi.FORMAT_DATE)
+    # JSON is needed for batches, form posts keep working for single transactions
+    parser_classes = [parsers.JSONParser, parsers.FormParser, parsers.MultiPartParser]
+    pagination_param_config = openapi.Parameter('pagination', in_=openapi.IN_QUERY, description='Pass cursor for keyset pagination without a total count',
+                                                type=openapi.TYPE_STRING, enum=['page', 'cursor'])
+    cursor_param_config = openapi.Parameter('cursor', in_=openapi.IN_QUERY, description='Cursor from the next link of a cursor page', type=openapi.TYPE_STRING)
+    batch_max_size = 1000
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = get_list_paginator(self.request.query_params, self.pagination_class)
+
+        return self._paginator
 
     def post(self, request, *args, **kwargs):
-        serializer = self.serializer_class(data=request.data, context={'request': request})
-        serializer.is_valid(raise_exception=True)
-        serializer.save(user=request.user)
+        # The balance stays locked from the validation to the insert, a JSON array is created as one batch
+        if isinstance(request.data, list):
+            serializer = self.serializer_class(data=request.data, many=True, allow_empty=False, max_length=self.batch_max_size,
+                                               context={'request': request})
+        else:
+            serializer = self.serializer_class(data=request.data, context={'request': request})
+
+        with transaction.atomic():
+            serializer.is_valid(raise_exception=True)
+            serializer.save(user=request.user)
+
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-    @swagger_auto_schema(manual_parameters=[category_param_config, type_param_config, date_from_param_config, date_to_param_config])
+    @swagger_auto_schema(manual_parameters=[*TransactionFilterMixin.filter_param_configs, pagination_param_config, cursor_param_config])
+    @method_decorator(read_from_replica)
+    @method_decorator(conditional_on_transactions)
     def get(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
+        # Rows are read as tuples and formatted like serializer_class without building model instances
+        queryset = self.get_queryset().values_list(*TRANSACTION_VALUES)
         page = self.paginate_queryset(queryset)
 
         if page is not None:
-            serializer = self.serializer_class(page, many=True)
-            return self.get_paginated_response(serializer.data)
+            return self.get_paginated_response(transaction_rows(page))
 
-        serializer = self.serializer_class(queryset, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
-    
-    def get_queryset(self):
-        translations = super().get_queryset().filter(user=self.request.user)
-        category = self.request.query_params.get('category', None)
-        type = self.request.query_params.get('type', None)
-        date_from = self.request.query_params.get('date_from', None)
-        date_to = self.request.query_params.get('date_to', None)
+        return Response(transaction_rows(queryset), status=status.HTTP_200_OK)
 
-        if category:
-            translations = translations.filter(category=category)
 
-        if type:
-            translations = translations.filter(type=type)
+class TransactionRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+    queryset = Transaction.objects.select_related('category')
+    serializer_class = TransactionSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOwner]
+    throttle_classes = [WriteThrottle]
+    lookup_field = 'pk'
 
-        if date_from and date_to:
-            translations = translations.filter(date__range=[date_from, date_to])
-            
-        return translations.order_by('-date')
+    def update(self, request, *args, **kwargs):
+        # The balance stays locked from the expense check to the save
+        with transaction.atomic():
+            return super().update(request, *args, **kwargs)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # The user row is locked before the transaction row, in the order updates lock them
+            locked_balance(instance.user_id)
+            instance.delete()
 
-class TransactionRetrieveUpdateDestroyView(generics.RetrieveUpdateDestroyAPIView):
+
+class TransactionExportView(TransactionFilterMixin, generics.GenericAPIView):
+    """
+    get: Stream all transactions for requesting user as CSV or NDJSON, with the same filters as the transaction list
+    """
     queryset = Transaction.objects.all()
-    serializer_class = TransactionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    chunk_size = 2000
+    export_format_param_config = openapi.Parameter('export_format', in_=openapi.IN_QUERY, description='Export format, csv by default',
+                                                   type=openapi.TYPE_STRING, enum=list(EXPORTERS))
+
+    @swagger_auto_schema(manual_parameters=[*TransactionFilterMixin.filter_param_configs, export_format_param_config])
+    def get(self, request):
+        export_format = export_format_of(request, EXPORTERS)
+        content_type, write_rows = EXPORTERS[export_format]
+        rows = self.get_queryset().values_list(*EXPORT_VALUES).iterator(chunk_size=self.chunk_size)
+        return export_response(write_rows(rows), content_type, export_format)
+
+
+def export_format_of(request, exporters):
+    export_format = request.query_params.get('export_format', 'csv')
+
+    if export_format not in exporters:
+        raise ValidationError({'export_format': f"Choose one of {', '.join(exporters)}"})
+
+    return export_format
+
+
+def export_response(content, content_type, export_format):
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="transactions.{export_format}"'
+    return response
+
+
+class TransactionImportView(generics.GenericAPIView):
+    """
+    post: Import transactions for requesting user from a CSV or NDJSON file, rows are validated and inserted in chunks
+    """
+    serializer_class = TransactionImportSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [WriteThrottle]
+    parser_classes = [parsers.MultiPartParser]
+    chunk_size = 1000
+
+    def post(self, request):
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        rows = ROW_READERS[serializer.validated_data['file_format']](serializer.validated_data['file'])
+        created, failed, errors = import_transactions(request.user, rows, chunk_size=self.chunk_size)
+        return Response({'created': created, 'failed': failed, 'errors': errors}, status=status.HTTP_200_OK)
+
+
+class ReportJobListCreateView(generics.ListCreateAPIView):
+    """
+    get: List the report jobs of requesting user, newest first, without their results
+    post: Queue a report for the run_report_jobs worker and return its job, poll the job until it is done or failed
+    """
+    serializer_class = ReportJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [ReportThrottle]
+    parser_classes = [parsers.JSONParser, parsers.FormParser, parsers.MultiPartParser]
+
+    def get_queryset(self):
+        return ReportJob.objects.filter(user=self.request.user).defer('result').order_by('-created_at')
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save(user=request.user)
+        location = reverse('report_job_detail', kwargs={'pk': job.pk}, request=request)
+        return Response(serializer.data, status=status.HTTP_202_ACCEPTED, headers={'Location': location})
+
+
+class ReportJobRetrieveView(generics.RetrieveAPIView):
+    """
+    get: Return a report job of requesting user with its result once done
+    """
+    queryset = ReportJob.objects.all()
+    serializer_class = ReportJobResultSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
     lookup_field = 'pk'
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes([ReportThrottle])
+@read_from_replica
+@conditional_on_transactions
 def monthly_summary_report(request):
-    monthly_summary = Transaction.objects.values('date__year', 'date__month', 'type')\
-                                         .annotate(total_amount=Sum('amount'))\
-                                         .order_by('date__year', 'date__month')
-    return Response(monthly_summary)
+    return Response(monthly_summary(request.user.pk))
 
 
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
+@throttle_classes([ReportThrottle])
+@read_from_replica
+@conditional_on_transactions
 def category_wise_expense_report(request):
-    category_wise_expenses = Transaction.objects.filter(type='expense') \
-                                                .values('category') \
-                                                .annotate(total_expense=Sum('amount')) \
-                                                .order_by(Lower('category'))
-    return Response(category_wise_expenses)
+    return Response(cached_category_wise_expense(request.user.pk))
+
+
+def series_window(request):
+    # Without to the series ends today, so its response changes at midnight without a write
+    return None if request.query_params.get('to') else timezone.localdate().isoformat()
+
+
+def series_query(request):
+    """
+    Return the validated series query of the request as arguments of transaction_series
+    """
+    serializer = SeriesSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    return serializer.series_arguments(request.user.pk)
+
+
+@swagger_auto_schema(method='get', query_serializer=SeriesSerializer)
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+@throttle_classes([ReportThrottle])
+@read_from_replica
+@conditional_on_transactions(window=series_window)
+def transaction_series_report(request):
+    query = series_query(request)
+    return Response(series_response(query, transaction_series(*query)))
+
+
+@swagger_auto_schema(method='get', query_serializer=BalanceSerializer, responses={200: BalanceSerializer})
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def balance_as_of_date(request):
+    serializer = BalanceSerializer(data=request.query_params)
+    serializer.is_valid(raise_exception=True)
+    as_of = serializer.validated_data.get('as_of') or timezone.localdate()
+    return Response(BalanceSerializer({'as_of': as_of, 'balance': balance_as_of(request.user.pk, as_of)}).data)